@@ -0,0 +1,416 @@
+import asyncio
+import contextvars
+import math
+import threading
+import time
+from collections import OrderedDict
+from contextlib import contextmanager, asynccontextmanager, ContextDecorator
+from config import Config
+import metrics
+
+# Client à l'origine du travail en cours (suit la requête dans les étapes du pipeline)
+_current_client = contextvars.ContextVar('admission_client', default='background')
+
+
+class AdmissionRejected(Exception):
+    """Requête refusée avant traitement (429), `retry_after` en secondes"""
+
+    def __init__(self, reason, retry_after):
+        super().__init__(reason)
+        self.reason = reason
+        self.retry_after = max(1, int(math.ceil(retry_after)))
+
+
+def parse_keys(spec):
+    """'clé1,clé2' -> {clé1, clé2}"""
+    return {key.strip() for key in (spec or '').split(',') if key.strip()}
+
+
+API_KEYS = parse_keys(Config.ADMISSION_API_KEYS)
+
+
+def parse_weights(spec):
+    """'client=poids,client2=poids' -> {client: poids}"""
+    weights = {}
+    for item in (spec or '').split(','):
+        name, _, weight = item.partition('=')
+        if name.strip() and weight.strip():
+            weights[name.strip()] = float(weight)
+    return weights
+
+
+def client_id(api_key, forwarded_for, remote_addr):
+    """
+    Identifiant du client: clé d'API (en-tête X-API-Key) si elle figure dans ADMISSION_API_KEYS,
+    sinon adresse IP. Derrière un proxy de confiance (ADMISSION_TRUST_FORWARDED), l'adresse est
+    le dernier élément de X-Forwarded-For, ajouté par le proxy: les précédents viennent du client.
+    Une clé inconnue ou un X-Forwarded-For non fiable ne créent donc pas de nouveau seau.
+    """
+    api_key = (api_key or '').strip()
+    if api_key and api_key in API_KEYS:
+        return api_key
+    if Config.ADMISSION_TRUST_FORWARDED and forwarded_for:
+        hop = forwarded_for.split(',')[-1].strip()
+        if hop:
+            return hop
+    return remote_addr or 'unknown'
+
+
+def current_client():
+    return _current_client.get()
+
+
+class RateLimiter:
+    """
+    Seaux à jetons par client: `rate` jetons par seconde, au plus `burst` d'avance.
+    Les seaux pleins (client inactif) sont oubliés au-delà de `max_clients`.
+    """
+
+    def __init__(self, rate, burst, max_clients=10000):
+        self.rate = rate
+        self.burst = burst
+        self.max_clients = max_clients
+        self._lock = threading.Lock()
+        self._buckets = OrderedDict()
+
+    def take(self, client, cost=1.0):
+        """Consomme `cost` jetons ou lève AdmissionRejected avec le délai avant qu'ils soient disponibles"""
+        wait = self.try_take(client, cost)
+        if wait:
+            raise AdmissionRejected('rate_limited', wait)
+
+    def try_take(self, client, cost=1.0):
+        """Consomme `cost` jetons et retourne 0, ou retourne le délai (s) avant qu'ils soient disponibles"""
+        if not self.rate:
+            return 0.0
+        now = time.monotonic()
+        with self._lock:
+            tokens, updated = self._buckets.pop(client, (self.burst, now))
+            tokens = min(self.burst, tokens + (now - updated) * self.rate)
+            if tokens < cost:
+                self._buckets[client] = (tokens, now)
+                return (cost - tokens) / self.rate
+            self._buckets[client] = (tokens - cost, now)
+            while len(self._buckets) > self.max_clients:
+                self._buckets.popitem(last=False)
+            return 0.0
+
+    def stats(self):
+        with self._lock:
+            return {'clients': len(self._buckets), 'rate_per_second': self.rate, 'burst': self.burst}
+
+
+class _Ticket:
+    """Place demandée dans la file d'un FairScheduler (réveil par thread ou par boucle asyncio)"""
+
+    __slots__ = ('client', 'start', 'tag', 'event', 'loop', 'future', 'granted', 'rejected')
+
+    def __init__(self, client, start, tag, loop=None):
+        self.client = client
+        self.start = start
+        self.tag = tag
+        self.loop = loop
+        self.event = None if loop else threading.Event()
+        self.future = loop.create_future() if loop else None
+        self.granted = False
+        self.rejected = False
+
+    def wake(self):
+        if self.loop is None:
+            self.event.set()
+        else:
+            self.loop.call_soon_threadsafe(_resolve, self.future)
+
+
+def _resolve(future):
+    if not future.done():
+        future.set_result(None)
+
+
+class FairScheduler:
+    """
+    `slots` places partagées entre clients par file équitable pondérée (start-time fair queuing):
+    chaque demande reçoit une étiquette virtuelle `début + coût / poids`, la plus petite est
+    servie en premier. Un client qui occupe déjà des places passe donc derrière un nouveau venu.
+
+    `max_queue`: au-delà, la demande la moins prioritaire est refusée (éventuellement une demande
+    déjà en file, évincée au profit d'un client moins servi). `max_wait`: attente maximale (None = illimitée).
+    Utilisable depuis des threads (acquire) comme depuis une boucle asyncio (aacquire).
+    """
+
+    def __init__(self, name, slots, max_queue=None, max_wait=None, weights=None):
+        self.name = name
+        self.slots = slots
+        self.max_queue = max_queue
+        self.max_wait = max_wait
+        self.weights = weights or {}
+        self._lock = threading.Lock()
+        self._queue = []
+        self._in_use = 0
+        self._virtual_time = 0.0
+        self._last_finish = {}
+        self._avg_service = 1.0
+        self.granted = 0
+        self.rejected = 0
+        self.timeouts = 0
+
+    def retry_after(self):
+        """Estimation du délai avant qu'une place se libère pour une nouvelle demande"""
+        return self._avg_service * (len(self._queue) + 1) / self.slots
+
+    def _enqueue(self, client, cost, loop=None):
+        """Place libre: None (accordée immédiatement); sinon ticket en file. Lève AdmissionRejected si la file est pleine."""
+        with self._lock:
+            if not self._queue and not self._in_use:
+                # File au repos: l'historique des clients n'a plus d'importance
+                self._last_finish.clear()
+                self._virtual_time = 0.0
+            start = max(self._virtual_time, self._last_finish.get(client, 0.0))
+            tag = start + cost / self.weights.get(client, 1.0)
+            if self._in_use < self.slots and not self._queue:
+                self._in_use += 1
+                self._last_finish[client] = tag
+                self.granted += 1
+                return None
+
+            if self.max_queue is not None and len(self._queue) >= self.max_queue:
+                worst = max(self._queue, key=lambda t: t.tag) if self._queue else None
+                if worst is None or worst.tag <= tag:
+                    self.rejected += 1
+                    raise AdmissionRejected('queue_full', self.retry_after())
+                self._queue.remove(worst)
+                worst.rejected = True
+                worst.wake()
+                self.rejected += 1
+
+            self._last_finish[client] = tag
+            ticket = _Ticket(client, start, tag, loop)
+            self._queue.append(ticket)
+            return ticket
+
+    def _grant_next(self):
+        """Une place se libère: elle passe à la plus petite étiquette en file (appelé sous verrou)"""
+        if not self._queue:
+            self._in_use -= 1
+            return
+        ticket = min(self._queue, key=lambda t: t.tag)
+        self._queue.remove(ticket)
+        self._virtual_time = max(self._virtual_time, ticket.start)
+        ticket.granted = True
+        self.granted += 1
+        ticket.wake()
+
+    def _abandon(self, ticket):
+        """Attente terminée sans place: retire le ticket (ou rend la place accordée entre-temps)"""
+        with self._lock:
+            if ticket.granted:
+                self._grant_next()
+            elif not ticket.rejected:
+                self._queue.remove(ticket)
+                self.timeouts += 1
+            return self.retry_after()
+
+    def acquire(self, client, cost=1.0):
+        ticket = self._enqueue(client, cost)
+        if ticket is None:
+            return
+        if not ticket.event.wait(self.max_wait):
+            with self._lock:
+                if ticket.granted:
+                    return
+            raise AdmissionRejected('timeout', self._abandon(ticket))
+        if ticket.rejected:
+            raise AdmissionRejected('evicted', self.retry_after())
+
+    async def aacquire(self, client, cost=1.0):
+        ticket = self._enqueue(client, cost, loop=asyncio.get_running_loop())
+        if ticket is None:
+            return
+        try:
+            await asyncio.wait_for(asyncio.shield(ticket.future), self.max_wait)
+        except asyncio.TimeoutError:
+            with self._lock:
+                if ticket.granted:
+                    return
+            raise AdmissionRejected('timeout', self._abandon(ticket))
+        except asyncio.CancelledError:
+            self._abandon(ticket)
+            raise
+        if ticket.rejected:
+            raise AdmissionRejected('evicted', self.retry_after())
+
+    def release(self, held_seconds=None):
+        with self._lock:
+            if held_seconds is not None:
+                self._avg_service = 0.8 * self._avg_service + 0.2 * held_seconds
+            self._grant_next()
+
+    @contextmanager
+    def slot(self, client, cost=1.0):
+        self.acquire(client, cost)
+        start = time.monotonic()
+        try:
+            yield
+        finally:
+            self.release(time.monotonic() - start)
+
+    @asynccontextmanager
+    async def aslot(self, client, cost=1.0):
+        await self.aacquire(client, cost)
+        start = time.monotonic()
+        try:
+            yield
+        finally:
+            self.release(time.monotonic() - start)
+
+    def stats(self):
+        with self._lock:
+            return {
+                'slots': self.slots,
+                'in_use': self._in_use,
+                'queued': len(self._queue),
+                'granted': self.granted,
+                'rejected': self.rejected,
+                'timeouts': self.timeouts,
+                'avg_service_seconds': round(self._avg_service, 3),
+            }
+
+
+class _StageSlot(ContextDecorator):
+    """
+    Place dans une étape du pipeline (context manager, décorateur, ou `async with`),
+    attribuée équitablement entre clients; sans effet si l'étape n'est pas limitée.
+    """
+
+    def __init__(self, scheduler):
+        self.scheduler = scheduler
+
+    def __enter__(self):
+        if self.scheduler:
+            self.scheduler.acquire(current_client())
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        if self.scheduler:
+            self.scheduler.release()
+        return False
+
+    async def __aenter__(self):
+        if self.scheduler:
+            await self.scheduler.aacquire(current_client())
+        return self
+
+    async def __aexit__(self, exc_type, exc, tb):
+        if self.scheduler:
+            self.scheduler.release()
+        return False
+
+
+class Admission:
+    """
+    Couche d'admission devant le pipeline (une limite à 0 la désactive):
+    - seau à jetons par client (429 immédiat au-delà du débit autorisé)
+    - places de traitement partagées par file équitable pondérée entre clients,
+      file bornée et attente bornée (429 + Retry-After plutôt qu'un timeout gunicorn)
+    - limites de concurrence par étape: téléchargement par plateforme
+      (session Instagram partagée), ffmpeg, Whisper
+    """
+
+    def __init__(self):
+        weights = parse_weights(Config.ADMISSION_CLIENT_WEIGHTS)
+        self.rate_limiter = RateLimiter(Config.ADMISSION_RATE_PER_MINUTE / 60.0, Config.ADMISSION_BURST)
+        self.requests = FairScheduler(
+            'requests', Config.ADMISSION_MAX_CONCURRENT,
+            max_queue=Config.ADMISSION_MAX_QUEUE, max_wait=Config.ADMISSION_MAX_WAIT, weights=weights,
+        ) if Config.ADMISSION_MAX_CONCURRENT > 0 else None
+        limits = {('download', platform): limit for platform, limit in Config.ADMISSION_DOWNLOAD_CONCURRENCY.items()}
+        limits[('ffmpeg', None)] = Config.ADMISSION_FFMPEG_CONCURRENCY
+        limits[('whisper', None)] = Config.ADMISSION_WHISPER_CONCURRENCY
+        self.stages = {
+            key: FairScheduler('/'.join(filter(None, key)), limit, weights=weights)
+            for key, limit in limits.items() if limit > 0
+        }
+
+    def stage(self, name, platform=None):
+        """Place dans l'étape `name` (téléchargement: par plateforme), à utiliser avec `with` ou `async with`"""
+        return _StageSlot(self.stages.get((name, platform)))
+
+    @contextmanager
+    def admit(self, client, queued=True):
+        """
+        Admission d'une requête: jetons du client puis, si `queued`, une place de traitement.
+        Lève AdmissionRejected (429) sans rien exécuter.
+        """
+        self._check_rate(client)
+        token = _current_client.set(client)
+        try:
+            if not queued or self.requests is None:
+                metrics.admission_decisions.inc(result='admitted')
+                yield
+                return
+            try:
+                self.requests.acquire(client)
+            except AdmissionRejected as e:
+                metrics.admission_decisions.inc(result=e.reason)
+                raise
+            metrics.admission_decisions.inc(result='admitted')
+            start = time.monotonic()
+            try:
+                yield
+            finally:
+                self.requests.release(time.monotonic() - start)
+        finally:
+            _current_client.reset(token)
+
+    @asynccontextmanager
+    async def aadmit(self, client, queued=True):
+        """Version asynchrone de admit (serveur ASGI): l'attente en file ne bloque aucun thread"""
+        self._check_rate(client)
+        token = _current_client.set(client)
+        try:
+            if not queued or self.requests is None:
+                metrics.admission_decisions.inc(result='admitted')
+                yield
+                return
+            try:
+                await self.requests.aacquire(client)
+            except AdmissionRejected as e:
+                metrics.admission_decisions.inc(result=e.reason)
+                raise
+            metrics.admission_decisions.inc(result='admitted')
+            start = time.monotonic()
+            try:
+                yield
+            finally:
+                self.requests.release(time.monotonic() - start)
+        finally:
+            _current_client.reset(token)
+
+    def charge(self, client, cost=1.0):
+        """
+        Jetons d'un travail supplémentaire de la requête (une URL d'un lot): 0 si consommés,
+        sinon délai (s) avant qu'ils soient disponibles; le travail attend plutôt que d'être refusé
+        """
+        return self.rate_limiter.try_take(client, cost)
+
+    def _check_rate(self, client):
+        try:
+            self.rate_limiter.take(client)
+        except AdmissionRejected as e:
+            metrics.admission_decisions.inc(result=e.reason)
+            raise
+
+    def stats(self):
+        return {
+            'rate_limit': self.rate_limiter.stats(),
+            'requests': self.requests.stats() if self.requests else None,
+            'stages': {scheduler.name: scheduler.stats() for scheduler in self.stages.values()},
+        }
+
+
+admission = Admission()
+
+
+def stage(name, platform=None):
+    """Raccourci vers admission.stage (décorateur des fonctions ffmpeg, `with` autour du téléchargement et de Whisper)"""
+    return admission.stage(name, platform)
@@ -1,27 +1,447 @@
 import os
 import json
-from flask import Flask, render_template, request, jsonify, send_file
+import queue
+import contextvars
+import functools
+import threading
+import time
+from flask import Flask, Response, render_template, request, jsonify, send_file
+from werkzeug.wsgi import ClosingIterator
 from instagram_downloader import InstagramDownloader
 from tiktok_downloader import TikTokDownloader
 from vimeo_downloader import VimeoDownloader
 from transcriber import AudioTranscriber
+from transcript_cache import TranscriptCache
+from transcript_index import TranscriptIndex
+from video_info_cache import VideoInfoCache, DeadLinkError
+from job_queue import JobQueue, check_webhook_url
+from batch_transcriber import BatchTranscriber
+from single_flight import SingleFlight, SharedFileReleaser
+from stream_proxy import open_upstream, iter_upstream
+from workspace import workspaces
+from ydl_pool import ydl_pool
+from http_client import get_session
+from startup import LazyObject, Warmup
+from workspace import tree_size
+from admission import admission, client_id, current_client, AdmissionRejected
+from url_resolver import parse_url, resolve_url
+from transcript_formats import MIMETYPES, render
+from resilience import CircuitOpenError
+import metrics
 from config import Config
 
 app = Flask(__name__)
 app.config.from_object(Config)
 
-# Initialisation des modules
-instagram_downloader = InstagramDownloader()
-tiktok_downloader = TikTokDownloader()
-vimeo_downloader = VimeoDownloader()
-transcriber = AudioTranscriber()
+def create_fingerprint_index():
+    """Index des empreintes audio (numpy n'est importé qu'au premier usage ou au préchauffage)"""
+    from audio_fingerprint import FingerprintIndex
+    return FingerprintIndex()
+
+# Initialisation des modules: les composants lourds (yt-dlp, SDK OpenAI, numpy) sont construits
+# au premier usage pour que le worker réponde dès son démarrage, et préchauffés en arrière-plan
+instagram_downloader = LazyObject(InstagramDownloader)
+tiktok_downloader = LazyObject(TikTokDownloader)
+vimeo_downloader = LazyObject(VimeoDownloader)
+transcriber = LazyObject(AudioTranscriber)
+transcript_cache = TranscriptCache()
+transcript_index = TranscriptIndex() if Config.TRANSCRIPT_INDEX_ENABLED else None
+fingerprint_index = LazyObject(create_fingerprint_index, 'FingerprintIndex') if Config.FINGERPRINT_ENABLED else None
+video_info_cache = VideoInfoCache()
+# Coalescence des requêtes concurrentes sur une même vidéo
+transcription_flight = SingleFlight()
+download_flight = SingleFlight()
+shared_files = SharedFileReleaser(remove=workspaces.release)
+# Janitor: dossiers de travail orphelins et budget disque global
+workspaces.start_janitor()
+
+DOWNLOADERS = {
+    'Instagram': instagram_downloader,
+    'TikTok': tiktok_downloader,
+    'Vimeo': vimeo_downloader,
+}
+
+def resolve_downloader(url):
+    """
+    Détermine la plateforme d'une URL sans accès réseau (analyse unique, aiguillage par hôte),
+    retourne (downloader, plateforme) ou (None, None)
+    """
+    resolved = parse_url(url)
+    if resolved is None:
+        return None, None
+    return DOWNLOADERS[resolved.platform], resolved.platform
+
+def resolve_video(url):
+    """
+    Forme canonique d'une URL (liens courts résolus une fois puis mis en cache),
+    retourne (downloader, ResolvedUrl) ou (None, None)
+    """
+    resolved = resolve_url(url)
+    if resolved is None:
+        return None, None
+    return DOWNLOADERS[resolved.platform], resolved
+
+def identify_video(url):
+    """
+    Clé canonique d'une vidéo pour le dédoublonnage, retourne (plateforme, clé) ou (None, None)
+    """
+    _, resolved = resolve_video(url)
+    if resolved is None:
+        return None, None
+    return resolved.platform, resolved.key
+
+def get_video_info(url):
+    """
+    Métadonnées d'une vidéo (titre, durée, auteur, compteurs) sans téléchargement,
+    servies depuis le cache mémoire. Lève ValueError pour une URL non prise en charge
+    et DeadLinkError pour un lien mort.
+
+    Returns:
+        tuple: (dict des métadonnées, plateforme, True si servi depuis le cache)
+    """
+    downloader, resolved = resolve_video(url)
+    if downloader is None:
+        raise ValueError("URL invalide. Veuillez utiliser une URL Instagram, TikTok ou Vimeo valide.")
+    with metrics.platform(resolved.platform):
+        info, cached = video_info_cache.get(resolved.key, lambda: downloader.get_video_info(resolved.canonical_url))
+    return info, resolved.platform, cached
+
+def check_duration(url, route_long=False):
+    """
+    Contrôle la durée annoncée avant de télécharger le moindre octet.
+    Retourne None pour poursuivre, sinon un couple (payload JSON, code HTTP):
+    404 lien mort, 413 vidéo trop longue, 202 bascule en job asynchrone (`route_long`).
+    """
+    try:
+        info, _, _ = get_video_info(url)
+    except DeadLinkError as e:
+        return {
+            'success': False,
+            'error': f'Vidéo indisponible: {str(e)}',
+            'url': url
+        }, 404
+    except Exception:
+        return None  # Métadonnées indisponibles: le téléchargement tranchera
+    
+    duration = info.get('duration') or 0
+    if Config.MAX_VIDEO_DURATION and duration > Config.MAX_VIDEO_DURATION:
+        return {
+            'success': False,
+            'error': f'Vidéo trop longue ({duration:.0f} s, maximum {Config.MAX_VIDEO_DURATION} s)',
+            'duration': duration,
+            'url': url
+        }, 413
+    if route_long and Config.TRANSCRIBE_SYNC_MAX_DURATION and duration > Config.TRANSCRIBE_SYNC_MAX_DURATION:
+        job_id = job_queue.submit(url)
+        return {
+            'success': True,
+            'job_id': job_id,
+            'status': JobQueue.QUEUED,
+            'status_url': f'/jobs/{job_id}',
+            'duration': duration,
+            'url': url
+        }, 202
+    return None
+
+def run_transcription(url, progress=None, route_long=False):
+    """
+    Pipeline complet cache → téléchargement → Whisper → nettoyage.
+    Retourne un couple (payload JSON, code HTTP), partagé par /transcribe, les jobs et le flux SSE.
+    `progress(événement, données)` reçoit l'avancement (appelant qui exécute réellement le pipeline).
+    `route_long`: une vidéo au-delà de TRANSCRIBE_SYNC_MAX_DURATION devient un job asynchrone.
+    """
+    resolved, target = prepare_transcription(url, route_long)
+    if resolved:
+        return resolved
+    downloader, platform, cache_key, media_url = target
+    
+    # Les requêtes concurrentes pour la même vidéo partagent un seul téléchargement + transcription
+    with metrics.platform(platform):
+        (payload, status_code), _ = transcription_flight.do(
+            cache_key,
+            lambda: download_and_transcribe(downloader, media_url, cache_key, progress)
+        )
+    return dict(payload, url=url), status_code
+
+def prepare_transcription(url, route_long=False):
+    """
+    Étapes préalables au téléchargement: validation, cache des transcriptions, durée.
+    Retourne (réponse, None) si la requête est déjà résolue (erreur, cache, job),
+    sinon (None, (downloader, plateforme, clé de cache, URL canonique)).
+    """
+    # Déterminer le type de plateforme et valider l'URL
+    start = time.perf_counter()
+    downloader, resolved = resolve_video(url)
+    platform = resolved.platform if resolved else None
+    metrics.stage_duration.observe(time.perf_counter() - start, stage='validation', platform=platform or 'invalid')
+    if downloader is None:
+        return ({
+            'success': False,
+            'error': "URL invalide. Veuillez utiliser une URL Instagram, TikTok ou Vimeo valide."
+        }, 400), None
+    
+    # Étape 0: Recherche dans le cache des transcriptions (aucun téléchargement ni appel Whisper)
+    cache_key = resolved.key
+    try:
+        cached = transcript_cache.get(cache_key)
+    except Exception:
+        cached = None  # Le cache ne doit jamais bloquer la transcription
+    metrics.cache_requests.inc(platform=platform, result='hit' if cached else 'miss')
+    if cached:
+        return ({
+            'success': True,
+            'transcript': cached['text'],
+            'language': cached['language'],
+            'url': url,
+            'cached': True
+        }, 200), None
+    
+    # Étape 0 bis: durée lue dans les métadonnées (limite, bascule en job) avant tout téléchargement
+    if Config.MAX_VIDEO_DURATION or (route_long and Config.TRANSCRIBE_SYNC_MAX_DURATION):
+        rejected = check_duration(url, route_long)
+        if rejected:
+            return rejected, None
+    
+    return None, (downloader, platform, cache_key, resolved.canonical_url)
+
+def download_and_transcribe(downloader, url, cache_key=None, progress=None):
+    """
+    Télécharge l'audio, le transcrit, nettoie puis alimente le cache.
+    Retourne un couple (payload JSON, code HTTP).
+    """
+    # Étape 1: Téléchargement de la vidéo
+    try:
+        with admission.stage('download', metrics.current_platform()):
+            audio_file_path = downloader.download_video(url, progress=progress)
+        if not audio_file_path or not os.path.exists(audio_file_path):
+            raise Exception("Impossible de télécharger la vidéo")
+    except Exception as e:
+        return {
+            'success': False,
+            'error': f'Erreur de téléchargement: {str(e)}'
+        }, 500
+    
+    # Étape 2: Empreinte audio, un repost de la même bande son réutilise la transcription
+    fingerprint = identify_audio(audio_file_path)
+    if fingerprint and fingerprint[3]:
+        return reuse_fingerprint_match(audio_file_path, fingerprint[3], url, cache_key)
+
+    # Étape 3: Transcription avec Whisper (nouvelles tentatives et disjoncteur dans le transcriber,
+    # pas de second envoi complet ici)
+    whisper_start = time.perf_counter()
+    try:
+        # Utilisation de la transcription avec détection de langue
+        result = transcriber.transcribe_with_language_detection(audio_file_path, progress=progress)
+        transcript_text = result['text']
+        detected_language = result.get('language', 'Non détectée')
+        
+    except Exception as e:
+        with metrics.timed('cleanup'):
+            workspaces.release(audio_file_path)
+        return transcription_error(e)
+    whisper_seconds = time.perf_counter() - whisper_start
+    
+    # Étape 4: Nettoyage du dossier de travail de la requête
+    with metrics.timed('cleanup'):
+        workspaces.release(audio_file_path)
+    
+    # Étape 5: Mise en cache pour les prochaines requêtes sur la même vidéo ou ses reposts, indexation
+    remember_transcript(cache_key, fingerprint, transcript_text, detected_language, whisper_seconds,
+                        url=url, result=result)
+    
+    return {
+        'success': True,
+        'transcript': transcript_text,
+        'language': detected_language,
+        'url': url,
+        'cached': False
+    }, 200
+
+def reuse_fingerprint_match(audio_file_path, match, url, cache_key=None):
+    """Réponse pour un repost reconnu par son empreinte: transcription stockée, sans Whisper"""
+    with metrics.timed('cleanup'):
+        workspaces.release(audio_file_path)
+    metrics.whisper_seconds_saved.inc(match['whisper_seconds'], platform=metrics.current_platform())
+    # Horodatages de la vidéo d'origine, repris pour les formats de sous-titres
+    timing = {}
+    if match.get('cache_key'):
+        try:
+            timing = transcript_cache.get(match['cache_key']) or {}
+        except Exception:
+            pass
+    if cache_key:
+        try:
+            transcript_cache.set(cache_key, match['transcript'], match['language'], timing.get('segments'),
+                                 timing.get('words'), timing.get('duration'))
+        except Exception:
+            pass
+    index_transcript(cache_key or url, url, match['transcript'], match['language'],
+                     timing.get('segments'), timing.get('duration'))
+    return {
+        'success': True,
+        'transcript': match['transcript'],
+        'language': match['language'],
+        'url': url,
+        'cached': True,
+        'match': 'fingerprint'
+    }, 200
+
+def transcription_error(e):
+    """Réponse d'échec de la transcription: 503 si le disjoncteur de l'API Whisper est ouvert"""
+    if isinstance(e, CircuitOpenError):
+        return {
+            'success': False,
+            'error': f'Service de transcription indisponible: {str(e)}',
+            'retry_after': round(e.retry_in)
+        }, 503
+    return {
+        'success': False,
+        'error': f'Erreur de transcription: {str(e)}'
+    }, 500
+
+def remember_transcript(cache_key, fingerprint, transcript_text, detected_language, whisper_seconds,
+                        url=None, result=None):
+    """
+    Alimente le cache des transcriptions (avec les segments et mots horodatés de `result`,
+    réponse verbose_json), l'index des empreintes et l'index de recherche, erreurs non bloquantes
+    """
+    result = result or {}
+    if cache_key:
+        try:
+            transcript_cache.set(cache_key, transcript_text, detected_language, result.get('segments'),
+                                 result.get('words'), result.get('duration'))
+        except Exception:
+            pass
+    if fingerprint:
+        try:
+            fingerprint_index.add(fingerprint[0], fingerprint[1], fingerprint[2], transcript_text,
+                                  detected_language, cache_key, whisper_seconds)
+        except Exception as e:
+            print(f"Indexation de l'empreinte impossible: {str(e)}")
+    index_transcript(cache_key or url, url, transcript_text, detected_language,
+                     result.get('segments'), result.get('duration'))
+
+def index_transcript(video_key, url, transcript_text, language, segments=None, duration=None):
+    """Programme l'indexation plein texte (écriture différée, par lots)"""
+    if transcript_index is None:
+        return
+    try:
+        transcript_index.add(video_key, transcript_text, language, segments, url=url,
+                             platform=metrics.current_platform(), duration=duration)
+    except Exception as e:
+        print(f"Indexation de la transcription impossible: {str(e)}")
+
+def identify_audio(audio_file_path):
+    """
+    Calcule l'empreinte de l'audio téléchargé et cherche un quasi-doublon déjà transcrit.
+    Retourne (sous-empreintes, masque, durée, correspondance ou None), ou None si
+    l'empreinte est désactivée ou a échoué (la transcription se fait alors normalement).
+    """
+    if fingerprint_index is None:
+        return None
+    from audio_fingerprint import fingerprint_file
+
+    start = time.perf_counter()
+    try:
+        with metrics.timed('fingerprint'):
+            hashes, usable, duration = fingerprint_file(audio_file_path)
+            match = fingerprint_index.lookup(hashes, usable, duration) if len(hashes) else None
+    except Exception as e:
+        print(f"Empreinte audio impossible: {str(e)}")
+        return None
+    finally:
+        metrics.fingerprint_seconds.inc(time.perf_counter() - start, platform=metrics.current_platform())
+    metrics.fingerprint_lookups.inc(platform=metrics.current_platform(), result='match' if match else 'miss')
+    return hashes, usable, duration, match
+
+job_queue = JobQueue(run_transcription)
+batch_transcriber = BatchTranscriber(run_transcription, identify_video)
+
+# Préchauffage en arrière-plan (thread du worker): la première requête ne paie pas les imports lourds
+warmup = Warmup()
+warmup.step('http', get_session)
+warmup.step('yt_dlp', ydl_pool.warm_up)
+warmup.step('downloaders', lambda: [downloader.get() for downloader in DOWNLOADERS.values()])
+warmup.step('transcriber', lambda: transcriber.warm_up())
+if fingerprint_index is not None:
+    warmup.step('fingerprint', fingerprint_index.get)
+if Config.WARMUP_ENABLED:
+    warmup.start()
+
+# Jauges évaluées à chaque lecture de /metrics
+metrics.gauge('jobs_in_flight', 'Jobs de transcription en attente ou en cours',
+              lambda: {(status,): count for status, count in job_queue.counts().items()}, ('status',))
+metrics.gauge('transcriptions_in_flight', 'Transcriptions en cours (après coalescence)',
+              lambda: transcription_flight.stats()['in_flight'])
+metrics.gauge('download_folder_bytes', 'Espace disque occupé par DOWNLOAD_FOLDER',
+              lambda: tree_size(Config.DOWNLOAD_FOLDER) if os.path.isdir(Config.DOWNLOAD_FOLDER) else 0)
+
+def too_many_requests(rejected):
+    """Réponse 429 immédiate avec Retry-After (seau du client vide, file pleine ou attente trop longue)"""
+    response = jsonify({
+        'success': False,
+        'error': 'Trop de requêtes, réessayez plus tard',
+        'reason': rejected.reason,
+        'retry_after': rejected.retry_after
+    })
+    response.headers['Retry-After'] = str(rejected.retry_after)
+    return response, 429
+
+def admitted(queued=True):
+    """
+    Décorateur de route: jetons du client et, si `queued`, une place de traitement attribuée
+    équitablement entre clients. Les routes qui répondent avant la fin du traitement
+    (flux, jobs) ne consomment que des jetons.
+    """
+    def decorator(view):
+        @functools.wraps(view)
+        def wrapper(*args, **kwargs):
+            client = client_id(request.headers.get('X-API-Key'), request.headers.get('X-Forwarded-For'), request.remote_addr)
+            try:
+                with admission.admit(client, queued=queued):
+                    return view(*args, **kwargs)
+            except AdmissionRejected as e:
+                return too_many_requests(e)
+        return wrapper
+    return decorator
 
 @app.route('/')
 def index():
     """Page d'accueil avec le formulaire"""
     return render_template('index.html')
 
+def output_options(args, data):
+    """Format de sortie (?format=text|srt|vtt|json, ou champ 'format') et horodatage par mot (?words=1)"""
+    output_format = (args.get('format') or data.get('format') or '').lower() or None
+    words = str(args.get('words', data.get('words', ''))).lower() in ('1', 'true')
+    return output_format, words
+
+def unknown_format(output_format):
+    return {
+        'success': False,
+        'error': f"Format inconnu: {output_format} (formats: {', '.join(MIMETYPES)})"
+    }
+
+def transcript_document(url, payload):
+    """
+    Transcription complète d'une réponse réussie (segments, mots) pour les formats de sortie,
+    lue dans le cache; à défaut d'horodatages, le texte seul
+    """
+    _, key = identify_video(url)
+    try:
+        document = transcript_cache.get(key) if key else None
+    except Exception:
+        document = None
+    return document or {
+        'text': payload.get('transcript'),
+        'language': payload.get('language'),
+        'duration': None,
+        'segments': [],
+        'words': []
+    }
+
 @app.route('/transcribe', methods=['POST'])
+@admitted()
 def transcribe_social_video():
     """Endpoint principal pour transcription des vidéos Instagram et TikTok"""
     try:
@@ -35,65 +455,230 @@ def transcribe_social_video():
                 'error': 'URL manquante'
             }), 400
         
-        # Déterminer le type de plateforme et valider l'URL
-        if instagram_downloader.validate_instagram_url(url):
-            downloader = instagram_downloader
-            platform = 'Instagram'
-        elif tiktok_downloader.validate_tiktok_url(url):
-            downloader = tiktok_downloader
-            platform = 'TikTok'
-        elif vimeo_downloader.validate_vimeo_url(url):
-            downloader = vimeo_downloader
-            platform = 'Vimeo'
-        else:
+        output_format, words = output_options(request.args, data)
+        if output_format and output_format not in MIMETYPES:
+            return jsonify(unknown_format(output_format)), 400
+        
+        payload, status_code = run_transcription(url, route_long=True)
+        if output_format and status_code == 200:
+            # Rendu depuis les segments en cache, sans nouvel appel Whisper
+            document = transcript_document(url, payload)
+            return Response(render(document, output_format, words), mimetype=MIMETYPES[output_format])
+        return jsonify(payload), status_code
+        
+    except Exception as e:
+        return jsonify({
+            'success': False,
+            'error': f'Erreur générale: {str(e)}'
+        }), 500
+
+@app.route('/transcribe/batch', methods=['POST'])
+@admitted(queued=False)
+def transcribe_batch():
+    """
+    Transcription d'une liste d'URLs ({"urls": [...]}), résultats diffusés en NDJSON
+    (une ligne JSON par URL, dès qu'elle est traitée; erreurs rapportées par élément)
+    """
+    data = request.get_json(silent=True) or {}
+    urls = data.get('urls')
+    if not isinstance(urls, list) or not urls or not all(isinstance(url, str) for url in urls):
+        return jsonify({
+            'success': False,
+            'error': 'Liste d\'URLs manquante'
+        }), 400
+    if len(urls) > Config.BATCH_MAX_URLS:
+        return jsonify({
+            'success': False,
+            'error': f'Trop d\'URLs (maximum {Config.BATCH_MAX_URLS})'
+        }), 400
+    
+    # Chaque URL traitée coûte un jeton au client, et ses éléments restent les siens
+    # dans les files équitables (le flux est produit après la sortie de l'admission)
+    client = current_client()
+    items = batch_transcriber.run(urls, context=contextvars.copy_context(),
+                                  charge=lambda: admission.charge(client))
+    
+    def generate():
+        for item in items:
+            yield json.dumps(item, ensure_ascii=False) + '\n'
+    
+    return Response(
+        generate(),
+        mimetype='application/x-ndjson',
+        headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'}
+    )
+
+@app.route('/transcribe/stream', methods=['GET'])
+@admitted(queued=False)
+def stream_transcription():
+    """Transcription diffusée en Server-Sent Events (progression puis texte morceau par morceau)"""
+    url = request.args.get('url')
+    if not url:
+        return jsonify({
+            'success': False,
+            'error': 'URL manquante'
+        }), 400
+    
+    downloader, _ = resolve_downloader(url)
+    if downloader is None:
+        return jsonify({
+            'success': False,
+            'error': "URL invalide. Veuillez utiliser une URL Instagram, TikTok ou Vimeo valide."
+        }), 400
+    
+    events = queue.Queue()
+    
+    def progress(event, data):
+        events.put((event, data))
+    
+    def worker():
+        try:
+            payload, _ = run_transcription(url, progress=progress)
+        except Exception as e:
+            payload = {
+                'success': False,
+                'error': f'Erreur générale: {str(e)}'
+            }
+        events.put(('done' if payload.get('success') else 'error', payload))
+        events.put(None)
+    
+    # Le pipeline continue même si le client se déconnecte (le résultat alimente le cache)
+    threading.Thread(target=contextvars.copy_context().run, args=(worker,), daemon=True).start()
+    
+    def sse(event, data):
+        return f'event: {event}\ndata: {json.dumps(data)}\n\n'
+    
+    def generate():
+        yield sse('status', {'stage': 'started', 'url': url})
+        while True:
+            try:
+                item = events.get(timeout=Config.SSE_HEARTBEAT_SECONDS)
+            except queue.Empty:
+                # Commentaire SSE: garde la connexion active sans événement côté client
+                yield ': keep-alive\n\n'
+                continue
+            if item is None:
+                return
+            yield sse(*item)
+    
+    return Response(generate(), mimetype='text/event-stream', headers={
+        'Cache-Control': 'no-cache',
+        'X-Accel-Buffering': 'no'
+    })
+
+@app.route('/info', methods=['GET'])
+@admitted(queued=False)
+def video_info():
+    """Métadonnées d'une vidéo (titre, durée, auteur, compteurs) sans téléchargement"""
+    url = request.args.get('url')
+    if not url:
+        return jsonify({
+            'success': False,
+            'error': 'URL manquante'
+        }), 400
+    
+    try:
+        info, platform, cached = get_video_info(url)
+    except ValueError as e:
+        return jsonify({
+            'success': False,
+            'error': str(e)
+        }), 400
+    except DeadLinkError as e:
+        return jsonify({
+            'success': False,
+            'error': f'Vidéo indisponible: {str(e)}'
+        }), 404
+    except Exception as e:
+        return jsonify({
+            'success': False,
+            'error': str(e)
+        }), 502
+    
+    return jsonify(dict(info, success=True, platform=platform, url=url, cached=cached))
+
+@app.route('/search', methods=['GET'])
+@admitted(queued=False)
+def search_transcripts():
+    """
+    Recherche plein texte dans les transcriptions (?q=, classement BM25),
+    avec extraits surlignés et horodatages des segments correspondants
+    """
+    query = (request.args.get('q') or '').strip()
+    if not query:
+        return jsonify({
+            'success': False,
+            'error': 'Paramètre q manquant'
+        }), 400
+    if transcript_index is None:
+        return jsonify({
+            'success': False,
+            'error': 'Index de recherche désactivé'
+        }), 503
+    
+    try:
+        limit = min(max(int(request.args.get('limit', 20)), 1), 100)
+        offset = max(int(request.args.get('offset', 0)), 0)
+    except ValueError:
+        return jsonify({
+            'success': False,
+            'error': 'Paramètres limit/offset invalides'
+        }), 400
+    
+    try:
+        results = transcript_index.search(query, limit=limit, offset=offset)
+    except Exception as e:
+        return jsonify({
+            'success': False,
+            'error': f'Erreur de recherche: {str(e)}'
+        }), 500
+    
+    return jsonify({
+        'success': True,
+        'query': query,
+        'results': results,
+        'count': len(results)
+    })
+
+@app.route('/jobs', methods=['POST'])
+@admitted(queued=False)
+def create_transcription_job():
+    """Crée un job de transcription asynchrone et retourne immédiatement son identifiant"""
+    try:
+        data = request.get_json()
+        url = data.get('url')
+        webhook_url = data.get('webhook_url')
+        
+        if not url:
             return jsonify({
                 'success': False,
-                'error': "URL invalide. Veuillez utiliser une URL Instagram, TikTok ou Vimeo valide."
+                'error': 'URL manquante'
             }), 400
         
-        # Étape 1: Téléchargement de la vidéo
-        try:
-            audio_file_path = downloader.download_video(url)
-            if not audio_file_path or not os.path.exists(audio_file_path):
-                raise Exception("Impossible de télécharger la vidéo")
-        except Exception as e:
+        # Validation immédiate pour ne pas mettre en file une URL invalide
+        downloader, _ = resolve_downloader(url)
+        if downloader is None:
             return jsonify({
                 'success': False,
-                'error': f'Erreur de téléchargement: {str(e)}'
-            }), 500
+                'error': "URL invalide. Veuillez utiliser une URL Instagram, TikTok ou Vimeo valide."
+            }), 400
         
-        # Étape 2: Transcription avec Whisper
-        try:
-            # Utilisation de la transcription avec détection de langue
-            result = transcriber.transcribe_with_language_detection(audio_file_path)
-            transcript_text = result['text']
-            detected_language = result.get('language', 'Non détectée')
-            
-        except Exception as e:
-            # Si la transcription avec détection de langue échoue, essaie la version simple
+        if webhook_url:
             try:
-                transcript_text = transcriber.transcribe_audio(audio_file_path)
-                detected_language = 'Auto-détectée'
-            except Exception as e2:
+                check_webhook_url(webhook_url)
+            except ValueError as e:
                 return jsonify({
                     'success': False,
-                    'error': f'Erreur de transcription: {str(e2)}'
-                }), 500
+                    'error': str(e)
+                }), 400
         
-        # Étape 3: Nettoyage des fichiers temporaires
-        try:
-            if os.path.exists(audio_file_path):
-                os.remove(audio_file_path)
-        except Exception:
-            pass  # Ignore les erreurs de nettoyage
-        
-        # Retour du résultat
+        job_id = job_queue.submit(url, webhook_url=webhook_url)
         return jsonify({
             'success': True,
-            'transcript': transcript_text,
-            'language': detected_language,
-            'url': url
-        })
+            'job_id': job_id,
+            'status': JobQueue.QUEUED,
+            'status_url': f'/jobs/{job_id}'
+        }), 202
         
     except Exception as e:
         return jsonify({
@@ -101,13 +686,72 @@ def transcribe_social_video():
             'error': f'Erreur générale: {str(e)}'
         }), 500
 
-@app.route('/download', methods=['POST'])
+@app.route('/jobs/<job_id>', methods=['GET'])
+def get_transcription_job(job_id):
+    """Retourne l'état (et le résultat si terminé) d'un job de transcription"""
+    job = job_queue.get(job_id)
+    if job is None:
+        return jsonify({
+            'success': False,
+            'error': 'Job introuvable'
+        }), 404
+    
+    return jsonify(dict(job, success=True))
+
+VIDEO_MIMETYPES = {
+    '.mp4': 'video/mp4',
+    '.webm': 'video/webm',
+    '.mkv': 'video/x-matroska',
+    '.mov': 'video/quicktime',
+}
+
+def proxy_direct_download(downloader, platform, url):
+    """
+    Relaie le flux progressif depuis l'URL directe (Range/reprise pris en charge).
+    Retourne None si le flux nécessite une fusion ou si la source est indisponible,
+    auquel cas l'appelant se replie sur le téléchargement disque.
+    """
+    media = downloader.get_direct_media(url)
+    if not media:
+        return None
+    
+    try:
+        upstream = open_upstream(media, request.headers.get('Range'))
+    except Exception:
+        return None
+    
+    headers, mimetype = proxy_headers(platform, media, upstream.headers)
+    return Response(
+        iter_upstream(upstream),
+        status=upstream.status_code,
+        mimetype=mimetype,
+        headers=headers,
+        direct_passthrough=True
+    )
+
+def proxy_headers(platform, media, upstream_headers):
+    """En-têtes relayés au client pour un flux direct, retourne (en-têtes, mimetype)"""
+    ext = f".{media.get('ext') or 'mp4'}"
+    headers = {
+        'Accept-Ranges': 'bytes',
+        'Content-Disposition': f'attachment; filename="{platform.lower()}_video{ext}"',
+    }
+    for name in ('Content-Length', 'Content-Range'):
+        if upstream_headers.get(name):
+            headers[name] = upstream_headers[name]
+    return headers, VIDEO_MIMETYPES.get(ext, 'application/octet-stream')
+
+@app.route('/download', methods=['GET', 'POST'])
+@admitted()
 def download_social_video():
     """Endpoint pour télécharger les vidéos Instagram et TikTok"""
     try:
-        # Récupération de l'URL depuis la requête JSON
-        data = request.get_json()
-        url = data.get('url')
+        # Récupération de l'URL depuis la requête JSON (POST) ou la query string (GET, reprise via Range)
+        if request.method == 'GET':
+            url = request.args.get('url')
+        else:
+            data = request.get_json()
+            url = data.get('url')
         
         if not url:
             return jsonify({
@@ -116,26 +760,31 @@ def download_social_video():
             }), 400
         
         # Déterminer le type de plateforme et valider l'URL
-        if instagram_downloader.validate_instagram_url(url):
-            downloader = instagram_downloader
-            platform = 'Instagram'
-        elif tiktok_downloader.validate_tiktok_url(url):
-            downloader = tiktok_downloader
-            platform = 'TikTok'
-        elif vimeo_downloader.validate_vimeo_url(url):
-            downloader = vimeo_downloader
-            platform = 'Vimeo'
-        else:
+        downloader, resolved = resolve_video(url)
+        if downloader is None:
             return jsonify({
                 'success': False,
                 'error': "URL invalide. Veuillez utiliser une URL Instagram, TikTok ou Vimeo valide."
             }), 400
+        platform = resolved.platform
         
-        # Téléchargement de la vidéo (sans extraction audio)
-        try:
-            video_file_path = downloader.download_video_only(url)
-            if not video_file_path or not os.path.exists(video_file_path):
+        # Mode proxy: flux progressif relayé directement au client, sans passage par le disque
+        if Config.DOWNLOAD_PROXY_ENABLED:
+            proxied = proxy_direct_download(downloader, platform, resolved.canonical_url)
+            if proxied is not None:
+                return proxied
+            metrics.count_fallback('download_disk', platform)
+        
+        # Téléchargement de la vidéo (sans extraction audio), partagé entre requêtes concurrentes
+        def fetch_video():
+            with metrics.platform(platform), admission.stage('download', platform):
+                path = downloader.download_video_only(resolved.canonical_url)
+            if not path or not os.path.exists(path):
                 raise Exception("Impossible de télécharger la vidéo")
+            return path
+        
+        try:
+            video_file_path, participants = download_flight.do(resolved.key, fetch_video)
         except Exception as e:
             return jsonify({
                 'success': False,
@@ -147,13 +796,7 @@ def download_social_video():
             # Détecter l'extension et choisir le bon mimetype
             _, ext = os.path.splitext(video_file_path)
             ext = ext.lower() or '.mp4'
-            mimetypes = {
-                '.mp4': 'video/mp4',
-                '.webm': 'video/webm',
-                '.mkv': 'video/x-matroska',
-                '.mov': 'video/quicktime',
-            }
-            mime = mimetypes.get(ext, 'application/octet-stream')
+            mime = VIDEO_MIMETYPES.get(ext, 'application/octet-stream')
 
             response = send_file(
                 video_file_path,
@@ -162,24 +805,18 @@ def download_social_video():
                 mimetype=mime
             )
             
-            # Programmer la suppression du fichier après l'envoi
-            @response.call_on_close
-            def cleanup():
-                try:
-                    if os.path.exists(video_file_path):
-                        os.remove(video_file_path)
-                except Exception:
-                    pass
+            # Programmer la suppression du fichier après le dernier envoi
+            # (call_on_close n'est jamais appelé en mode direct_passthrough de send_file)
+            response.response = ClosingIterator(
+                response.response,
+                lambda: shared_files.release(video_file_path, participants)
+            )
             
             return response
             
         except Exception as e:
             # Nettoyage en cas d'erreur
-            try:
-                if os.path.exists(video_file_path):
-                    os.remove(video_file_path)
-            except Exception:
-                pass
+            shared_files.release(video_file_path, participants)
             
             return jsonify({
                 'success': False,
@@ -195,11 +832,62 @@ def download_social_video():
 @app.route('/health')
 def health_check():
     """Endpoint de vérification de santé de l'application"""
-    return jsonify({
+    return jsonify(health_status())
+
+def health_status():
+    """État du service (partagé par les serveurs WSGI et ASGI)"""
+    return {
         'status': 'OK',
         'service': 'Social Media Tool',
-        'version': '1.0.0'
-    })
+        'version': '1.0.0',
+        'coalescing': {
+            'transcribe': transcription_flight.stats(),
+            'download': download_flight.stats()
+        },
+        'disk': workspaces.usage(),
+        'ydl_pool': ydl_pool.stats(),
+        'vimeo_strategies': vimeo_downloader.strategies.stats() if vimeo_downloader.loaded else None,
+        'fingerprint': fingerprint_stats(),
+        'video_info_cache': video_info_cache.stats(),
+        'admission': admission.stats(),
+        'search_index': transcript_index.stats() if transcript_index else {'enabled': False},
+        'whisper': transcriber.stats() if transcriber.loaded else None,
+        'warmup': warmup.status() if Config.WARMUP_ENABLED else {'enabled': False}
+    }
+
+@app.route('/ready')
+def readiness_check():
+    """Disponibilité: 200 une fois le préchauffage terminé, 503 pendant (sonde de déploiement)"""
+    payload, status_code = readiness_status()
+    return jsonify(payload), status_code
+
+def readiness_status():
+    """Réponse de /ready (partagée par les serveurs WSGI et ASGI), couple (payload, code HTTP)"""
+    if not Config.WARMUP_ENABLED:
+        # Sans préchauffage, tout se charge au premier usage: prêt dès l'import
+        return {'ready': True, 'warmup': {'enabled': False}}, 200
+    status = warmup.status()
+    return {'ready': status['ready'], 'warmup': status}, 200 if status['ready'] else 503
+
+def fingerprint_stats():
+    """Coût cumulé des empreintes audio comparé à la latence Whisper évitée"""
+    if fingerprint_index is None:
+        return {'enabled': False}
+    if not fingerprint_index.loaded:
+        return {'enabled': True, 'loaded': False}
+    return dict(
+        fingerprint_index.stats(),
+        enabled=True,
+        lookups=int(metrics.fingerprint_lookups.total()),
+        matches=int(metrics.fingerprint_lookups.total(result='match')),
+        fingerprint_seconds=round(metrics.fingerprint_seconds.total(), 3),
+        whisper_seconds_saved=round(metrics.whisper_seconds_saved.total(), 3)
+    )
+
+@app.route('/metrics')
+def metrics_endpoint():
+    """Métriques au format texte Prometheus (latences par étape, cache, erreurs, replis, jauges)"""
+    return Response(metrics.registry.render(), mimetype='text/plain; version=0.0.4')
 
 @app.errorhandler(404)
 def not_found(error):
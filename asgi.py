@@ -0,0 +1,427 @@
+import asyncio
+import contextvars
+import functools
+import io
+import json
+import os
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import aclosing
+from urllib.parse import parse_qs
+import app as wsgi
+import metrics
+from admission import admission, client_id, AdmissionRejected
+from async_http import close_async_client
+from config import Config
+from single_flight import AsyncSingleFlight
+from stream_proxy import aopen_upstream, aiter_upstream
+
+# Point d'entrée ASGI (uvicorn asgi:app), à côté de app:app (WSGI).
+# /transcribe, /download, /health et /ready sont servis nativement en asynchrone: l'attente réseau
+# (API Whisper, config du player Vimeo, flux direct) ne mobilise aucun thread, et le travail
+# bloquant (yt-dlp, ffmpeg, SQLite) est confiné à un pool borné. Les autres routes passent
+# par l'application Flask, exécutée sur un pool de threads dédié.
+
+# Pool borné pour le travail bloquant des routes asynchrones
+blocking_executor = ThreadPoolExecutor(max_workers=Config.ASGI_BLOCKING_WORKERS, thread_name_prefix='asgi-blocking')
+# Pool des routes Flask relayées (équivalent des threads gunicorn)
+wsgi_executor = ThreadPoolExecutor(max_workers=Config.ASGI_WSGI_THREADS, thread_name_prefix='asgi-wsgi')
+transcription_flight = AsyncSingleFlight()
+download_flight = AsyncSingleFlight()
+
+_END = object()
+
+
+def run_blocking(fn, *args, executor=None, **kwargs):
+    """Exécute `fn` dans le pool borné (contexte copié: la plateforme suit dans les métriques)"""
+    call = functools.partial(fn, *args, **kwargs)
+    return asyncio.get_running_loop().run_in_executor(
+        executor or blocking_executor, contextvars.copy_context().run, call
+    )
+
+
+class Request:
+    """Requête HTTP ASGI minimale (méthode, chemin, en-têtes, query string, corps)"""
+
+    def __init__(self, scope, receive):
+        self.scope = scope
+        self.receive = receive
+        self.method = scope['method']
+        self.path = scope['path']
+        self.headers = {name.decode('latin-1').lower(): value.decode('latin-1') for name, value in scope['headers']}
+        query = parse_qs(scope.get('query_string', b'').decode('latin-1'))
+        self.args = {name: values[0] for name, values in query.items()}
+        self._body = None
+
+    async def body(self):
+        if self._body is None:
+            chunks = []
+            while True:
+                message = await self.receive()
+                chunks.append(message.get('body', b''))
+                if not message.get('more_body'):
+                    break
+            self._body = b''.join(chunks)
+        return self._body
+
+    async def json(self):
+        """Corps JSON décodé, None s'il est absent ou invalide"""
+        try:
+            return json.loads(await self.body() or b'null')
+        except ValueError:
+            return None
+
+
+async def send_json(send, payload, status=200, headers=None):
+    body = json.dumps(payload).encode('utf-8')
+    extra = [(name.lower().encode('latin-1'), str(value).encode('latin-1')) for name, value in (headers or {}).items()]
+    await send({
+        'type': 'http.response.start',
+        'status': status,
+        'headers': [(b'content-type', b'application/json'), (b'content-length', str(len(body)).encode())] + extra,
+    })
+    await send({'type': 'http.response.body', 'body': body})
+
+
+async def send_stream(send, status, headers, chunks):
+    """Envoie une réponse dont le corps provient d'un itérateur asynchrone de blocs"""
+    await send({
+        'type': 'http.response.start',
+        'status': status,
+        'headers': [(name.lower().encode('latin-1'), str(value).encode('latin-1')) for name, value in headers.items()],
+    })
+    async with aclosing(chunks):
+        async for chunk in chunks:
+            await send({'type': 'http.response.body', 'body': chunk, 'more_body': True})
+    await send({'type': 'http.response.body', 'body': b''})
+
+
+def release_audio(audio_file_path):
+    with metrics.timed('cleanup'):
+        wsgi.workspaces.release(audio_file_path)
+
+
+async def run_transcription(url, route_long=False):
+    """Équivalent asynchrone de app.run_transcription (mêmes étapes préalables, même cache)"""
+    resolved, target = await run_blocking(wsgi.prepare_transcription, url, route_long)
+    if resolved:
+        return resolved
+    downloader, platform, cache_key, media_url = target
+
+    # Les requêtes concurrentes pour la même vidéo attendent le même traitement
+    with metrics.platform(platform):
+        (payload, status_code), _ = await transcription_flight.do(
+            cache_key,
+            lambda: download_and_transcribe(downloader, media_url, cache_key)
+        )
+    return dict(payload, url=url), status_code
+
+
+async def download_and_transcribe(downloader, url, cache_key=None):
+    """Équivalent asynchrone de app.download_and_transcribe"""
+    # Étape 1: Téléchargement (yt-dlp, bloquant)
+    try:
+        async with admission.stage('download', metrics.current_platform()):
+            audio_file_path = await run_blocking(downloader.download_video, url)
+        if not audio_file_path or not os.path.exists(audio_file_path):
+            raise Exception("Impossible de télécharger la vidéo")
+    except Exception as e:
+        return {
+            'success': False,
+            'error': f'Erreur de téléchargement: {str(e)}'
+        }, 500
+
+    # Étape 2: Empreinte audio
+    fingerprint = await run_blocking(wsgi.identify_audio, audio_file_path)
+    if fingerprint and fingerprint[3]:
+        return await run_blocking(wsgi.reuse_fingerprint_match, audio_file_path, fingerprint[3], url, cache_key)
+
+    # Étape 3: Transcription, attendue sans bloquer de thread (client OpenAI asynchrone)
+    whisper_start = time.perf_counter()
+    try:
+        result = await wsgi.transcriber.atranscribe_with_language_detection(audio_file_path, blocking_executor)
+        transcript_text = result['text']
+        detected_language = result.get('language', 'Non détectée')
+    except Exception as e:
+        await run_blocking(release_audio, audio_file_path)
+        return wsgi.transcription_error(e)
+    whisper_seconds = time.perf_counter() - whisper_start
+
+    # Étapes 4 et 5: nettoyage puis cache et index des empreintes
+    await run_blocking(release_audio, audio_file_path)
+    await run_blocking(wsgi.remember_transcript, cache_key, fingerprint, transcript_text, detected_language, whisper_seconds,
+                       url=url, result=result)
+
+    return {
+        'success': True,
+        'transcript': transcript_text,
+        'language': detected_language,
+        'url': url,
+        'cached': False
+    }, 200
+
+
+async def transcribe(request, send):
+    data = await request.json()
+    url = data.get('url') if isinstance(data, dict) else None
+    if not url:
+        return await send_json(send, {
+            'success': False,
+            'error': 'URL manquante'
+        }, 400)
+
+    output_format, words = wsgi.output_options(request.args, data)
+    if output_format and output_format not in wsgi.MIMETYPES:
+        return await send_json(send, wsgi.unknown_format(output_format), 400)
+
+    try:
+        payload, status_code = await run_transcription(url, route_long=True)
+        if output_format and status_code == 200:
+            document = await run_blocking(wsgi.transcript_document, url, payload)
+            headers = {'Content-Type': wsgi.MIMETYPES[output_format]}
+            return await send_stream(send, 200, headers, arender(document, output_format, words))
+    except Exception as e:
+        payload, status_code = {
+            'success': False,
+            'error': f'Erreur générale: {str(e)}'
+        }, 500
+    await send_json(send, payload, status_code)
+
+
+async def arender(document, output_format, words):
+    """Blocs du rendu (transcript_formats.render) pour send_stream"""
+    for chunk in wsgi.render(document, output_format, words):
+        yield chunk
+
+
+async def proxy_direct_download(request, send, downloader, platform, url):
+    """
+    Relaie le flux progressif via le client HTTP asynchrone. Retourne False si le flux
+    nécessite une fusion ou si la source est indisponible (repli sur le disque).
+    """
+    try:
+        if hasattr(downloader, 'aget_direct_media'):
+            media = await downloader.aget_direct_media(url)
+        else:
+            # Résolution yt-dlp: bloquante, confinée au pool borné
+            media = await run_blocking(downloader.get_direct_media, url)
+        if not media:
+            return False
+        upstream = await aopen_upstream(media, request.headers.get('range'))
+    except Exception:
+        return False
+
+    headers, mimetype = wsgi.proxy_headers(platform, media, upstream.headers)
+    headers['Content-Type'] = mimetype
+    await send_stream(send, upstream.status_code, headers, aiter_upstream(upstream))
+    return True
+
+
+async def iter_file(path):
+    """Lecture d'un fichier par blocs dans le pool borné"""
+    with open(path, 'rb') as handle:
+        while True:
+            chunk = await run_blocking(handle.read, Config.DOWNLOAD_PROXY_CHUNK_SIZE)
+            if not chunk:
+                return
+            yield chunk
+
+
+async def download(request, send):
+    if request.method == 'GET':
+        url = request.args.get('url')
+    else:
+        data = await request.json()
+        url = data.get('url') if isinstance(data, dict) else None
+
+    if not url:
+        return await send_json(send, {
+            'success': False,
+            'error': 'URL manquante'
+        }, 400)
+
+    # Forme canonique (un lien court peut demander une redirection réseau, résolue hors boucle)
+    downloader, resolved = await run_blocking(wsgi.resolve_video, url)
+    if downloader is None:
+        return await send_json(send, {
+            'success': False,
+            'error': "URL invalide. Veuillez utiliser une URL Instagram, TikTok ou Vimeo valide."
+        }, 400)
+    platform = resolved.platform
+
+    # Mode proxy: flux relayé sans passage par le disque ni thread bloqué
+    if Config.DOWNLOAD_PROXY_ENABLED:
+        if await proxy_direct_download(request, send, downloader, platform, resolved.canonical_url):
+            return
+        metrics.count_fallback('download_disk', platform)
+
+    # Repli disque, partagé avec les autres requêtes sur la même vidéo
+    def fetch_video():
+        with metrics.platform(platform), admission.stage('download', platform):
+            path = downloader.download_video_only(resolved.canonical_url)
+        if not path or not os.path.exists(path):
+            raise Exception("Impossible de télécharger la vidéo")
+        return path
+
+    try:
+        # Coalescence sur la boucle: seul le premier appelant occupe un thread du pool borné
+        video_file_path, participants = await download_flight.do(resolved.key, lambda: run_blocking(fetch_video))
+    except Exception as e:
+        return await send_json(send, {
+            'success': False,
+            'error': f'Erreur de téléchargement: {str(e)}'
+        }, 500)
+
+    try:
+        _, ext = os.path.splitext(video_file_path)
+        ext = ext.lower() or '.mp4'
+        headers = {
+            'Content-Type': wsgi.VIDEO_MIMETYPES.get(ext, 'application/octet-stream'),
+            'Content-Length': os.path.getsize(video_file_path),
+            'Content-Disposition': f'attachment; filename="{platform.lower()}_video{ext}"',
+        }
+    except Exception as e:
+        await run_blocking(wsgi.shared_files.release, video_file_path, participants)
+        return await send_json(send, {
+            'success': False,
+            'error': f'Erreur lors de l\'envoi du fichier: {str(e)}'
+        }, 500)
+
+    try:
+        await send_stream(send, 200, headers, iter_file(video_file_path))
+    finally:
+        # Suppression après le dernier envoi (ou l'abandon du client)
+        await run_blocking(wsgi.shared_files.release, video_file_path, participants)
+
+
+async def health(request, send):
+    status = await run_blocking(wsgi.health_status)
+    status['coalescing']['transcribe_async'] = transcription_flight.stats()
+    status['coalescing']['download_async'] = download_flight.stats()
+    await send_json(send, status)
+
+
+async def ready(request, send):
+    payload, status_code = wsgi.readiness_status()
+    await send_json(send, payload, status_code)
+
+
+def admitted(handler, queued=True):
+    """
+    Équivalent asynchrone de app.admitted: 429 + Retry-After immédiat si le client a épuisé
+    ses jetons ou si la file est pleine; l'attente d'une place ne bloque aucun thread.
+    """
+    @functools.wraps(handler)
+    async def wrapper(request, send):
+        client = client_id(request.headers.get('x-api-key'), request.headers.get('x-forwarded-for'),
+                           (request.scope.get('client') or ('',))[0])
+        try:
+            async with admission.aadmit(client, queued=queued):
+                return await handler(request, send)
+        except AdmissionRejected as e:
+            await send_json(send, {
+                'success': False,
+                'error': 'Trop de requêtes, réessayez plus tard',
+                'reason': e.reason,
+                'retry_after': e.retry_after
+            }, 429, headers={'Retry-After': e.retry_after})
+    return wrapper
+
+
+ROUTES = {
+    ('POST', '/transcribe'): admitted(transcribe),
+    # Le flux /download est servi dans le handler: il ne consomme que des jetons
+    # (le repli disque reste borné par l'étape de téléchargement de sa plateforme)
+    ('GET', '/download'): admitted(download, queued=False),
+    ('POST', '/download'): admitted(download, queued=False),
+    ('GET', '/health'): health,
+    ('GET', '/ready'): ready,
+}
+
+
+def build_environ(scope, body):
+    """Environnement WSGI (PEP 3333) d'une requête ASGI"""
+    server = scope.get('server') or ('localhost', 80)
+    client = scope.get('client') or ('', 0)
+    environ = {
+        'REQUEST_METHOD': scope['method'],
+        'SCRIPT_NAME': scope.get('root_path', '').encode('utf-8').decode('latin-1'),
+        'PATH_INFO': scope['path'].encode('utf-8').decode('latin-1'),
+        'QUERY_STRING': scope.get('query_string', b'').decode('latin-1'),
+        'SERVER_NAME': server[0],
+        'SERVER_PORT': str(server[1]),
+        'REMOTE_ADDR': client[0],
+        'SERVER_PROTOCOL': f"HTTP/{scope.get('http_version', '1.1')}",
+        'wsgi.version': (1, 0),
+        'wsgi.url_scheme': scope.get('scheme', 'http'),
+        'wsgi.input': io.BytesIO(body),
+        'wsgi.errors': sys.stderr,
+        'wsgi.multithread': True,
+        'wsgi.multiprocess': False,
+        'wsgi.run_once': False,
+    }
+    for name, value in scope['headers']:
+        name = name.decode('latin-1').upper().replace('-', '_')
+        value = value.decode('latin-1')
+        if name in ('CONTENT_TYPE', 'CONTENT_LENGTH'):
+            environ[name] = value
+            continue
+        key = f'HTTP_{name}'
+        environ[key] = f'{environ[key]},{value}' if key in environ else value
+    return environ
+
+
+async def call_wsgi(request, send):
+    """Relaie la requête à l'application Flask; le corps est itéré bloc par bloc (SSE, NDJSON)"""
+    environ = build_environ(request.scope, await request.body())
+    started = {}
+
+    def start_response(status, headers, exc_info=None):
+        started['status'] = int(status.split(' ', 1)[0])
+        started['headers'] = [(name.lower().encode('latin-1'), value.encode('latin-1')) for name, value in headers]
+        return lambda data: None
+
+    iterable = await run_blocking(wsgi.app, environ, start_response, executor=wsgi_executor)
+    iterator = iter(iterable)
+    sent_start = False
+    try:
+        while True:
+            chunk = await run_blocking(next, iterator, _END, executor=wsgi_executor)
+            if chunk is _END:
+                break
+            if not sent_start:
+                await send({'type': 'http.response.start', 'status': started['status'], 'headers': started['headers']})
+                sent_start = True
+            if chunk:
+                await send({'type': 'http.response.body', 'body': chunk, 'more_body': True})
+    finally:
+        close = getattr(iterable, 'close', None)
+        if close is not None:
+            await run_blocking(close, executor=wsgi_executor)
+    if not sent_start:
+        await send({'type': 'http.response.start', 'status': started['status'], 'headers': started['headers']})
+    await send({'type': 'http.response.body', 'body': b''})
+
+
+async def lifespan(receive, send):
+    while True:
+        message = await receive()
+        if message['type'] == 'lifespan.startup':
+            await send({'type': 'lifespan.startup.complete'})
+        elif message['type'] == 'lifespan.shutdown':
+            await close_async_client()
+            await send({'type': 'lifespan.shutdown.complete'})
+            return
+
+
+async def app(scope, receive, send):
+    """Application ASGI: routes asynchrones natives, le reste relayé à Flask"""
+    if scope['type'] == 'lifespan':
+        return await lifespan(receive, send)
+    if scope['type'] != 'http':
+        return
+
+    request = Request(scope, receive)
+    handler = ROUTES.get((request.method, request.path), call_wsgi)
+    await handler(request, send)
@@ -0,0 +1,38 @@
+import asyncio
+from config import Config
+
+# Un client par boucle d'événements (un AsyncClient ne peut pas changer de boucle)
+_clients = {}
+
+
+def get_async_client():
+    """
+    Client HTTP asynchrone partagé (keep-alive) pour le serveur ASGI: des centaines de
+    connexions en attente réseau ne mobilisent aucun thread.
+    """
+    loop = asyncio.get_running_loop()
+    client = _clients.get(loop)
+    if client is None:
+        import httpx2
+
+        client = httpx2.AsyncClient(
+            limits=httpx2.Limits(
+                max_connections=Config.ASYNC_HTTP_MAX_CONNECTIONS,
+                max_keepalive_connections=Config.HTTP_POOL_HOSTS * Config.HTTP_POOL_SIZE_PER_HOST,
+            ),
+            timeout=httpx2.Timeout(
+                Config.DOWNLOAD_PROXY_READ_TIMEOUT,
+                connect=Config.DOWNLOAD_PROXY_CONNECT_TIMEOUT,
+            ),
+            proxy=getattr(Config, 'HTTP_PROXY_URL', '') or None,
+            follow_redirects=True,
+        )
+        _clients[loop] = client
+    return client
+
+
+async def close_async_client():
+    """Ferme le client de la boucle courante (arrêt du serveur ASGI)"""
+    client = _clients.pop(asyncio.get_running_loop(), None)
+    if client is not None:
+        await client.aclose()
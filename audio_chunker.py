@@ -0,0 +1,131 @@
+import os
+import re
+import subprocess
+from config import Config
+from admission import stage
+
+_DURATION_RE = re.compile(r'Duration:\s*(\d+):(\d+):(\d+(?:\.\d+)?)')
+_SILENCE_START_RE = re.compile(r'silence_start:\s*(-?\d+(?:\.\d+)?)')
+_SILENCE_END_RE = re.compile(r'silence_end:\s*(-?\d+(?:\.\d+)?)')
+
+
+@stage('ffmpeg')
+def _run_ffmpeg(args):
+    """Exécute ffmpeg et retourne sa sortie d'erreur (où ffmpeg écrit ses diagnostics)"""
+    try:
+        proc = subprocess.run(
+            ['ffmpeg', '-hide_banner', '-nostdin'] + args,
+            stdout=subprocess.DEVNULL,
+            stderr=subprocess.PIPE,
+            text=True,
+            errors='replace',
+        )
+    except OSError as e:
+        # ffmpeg absent: les appelants se replient sur un envoi en un seul morceau
+        return 127, str(e)
+    return proc.returncode, proc.stderr
+
+
+def probe_duration(path):
+    """
+    Retourne la durée du fichier audio en secondes (0.0 si inconnue)
+    """
+    _, stderr = _run_ffmpeg(['-i', path])
+    match = _DURATION_RE.search(stderr)
+    if not match:
+        return 0.0
+    hours, minutes, seconds = match.groups()
+    return int(hours) * 3600 + int(minutes) * 60 + float(seconds)
+
+
+def detect_silences(path, noise_db=None, min_silence=None):
+    """
+    Détecte les plages de silence avec le filtre ffmpeg silencedetect
+
+    Returns:
+        list: [(début, fin), ...] en secondes
+    """
+    noise_db = Config.TRANSCRIPTION_SILENCE_DB if noise_db is None else noise_db
+    min_silence = Config.TRANSCRIPTION_SILENCE_MIN_SECONDS if min_silence is None else min_silence
+    _, stderr = _run_ffmpeg([
+        '-i', path,
+        '-vn',
+        '-af', f'silencedetect=noise={noise_db}dB:d={min_silence}',
+        '-f', 'null', '-',
+    ])
+
+    silences = []
+    start = None
+    for line in stderr.splitlines():
+        match = _SILENCE_START_RE.search(line)
+        if match:
+            start = max(0.0, float(match.group(1)))
+            continue
+        match = _SILENCE_END_RE.search(line)
+        if match and start is not None:
+            silences.append((start, float(match.group(1))))
+            start = None
+    return silences
+
+
+def plan_chunks(duration, silences, target_seconds):
+    """
+    Découpe [0, durée] en morceaux d'environ `target_seconds`, en coupant au milieu
+    du silence le plus proche avant la cible (coupe franche si aucun silence exploitable).
+
+    Returns:
+        list: [(début, fin), ...] contigus et ordonnés
+    """
+    if duration <= 0 or duration <= target_seconds:
+        return [(0.0, duration)]
+
+    cut_points = [(start + end) / 2 for start, end in silences]
+    chunks = []
+    start = 0.0
+    while duration - start > target_seconds:
+        target = start + target_seconds
+        # Une coupe trop précoce produirait des morceaux minuscules: on ignore la première moitié
+        candidates = [c for c in cut_points if start + target_seconds / 2 <= c <= target]
+        end = max(candidates) if candidates else target
+        chunks.append((start, end))
+        start = end
+    chunks.append((start, duration))
+    return chunks
+
+
+def split_audio(path, chunks, output_folder):
+    """
+    Extrait chaque morceau sans ré-encodage (-c copy) dans `output_folder`
+
+    Returns:
+        list: chemins des fichiers, dans l'ordre des morceaux
+    """
+    ext = os.path.splitext(path)[1] or '.m4a'
+    paths = []
+    for index, (start, end) in enumerate(chunks):
+        chunk_path = os.path.join(output_folder, f'chunk_{index:04d}{ext}')
+        returncode, stderr = _run_ffmpeg([
+            '-y', '-loglevel', 'error',
+            '-ss', f'{start:.3f}',
+            '-t', f'{end - start:.3f}',
+            '-i', path,
+            '-vn', '-c', 'copy',
+            chunk_path,
+        ])
+        if returncode != 0:
+            raise Exception(f"Erreur lors du découpage audio: {stderr.strip()}")
+        paths.append(chunk_path)
+    return paths
+
+
+def target_chunk_seconds(path, duration):
+    """
+    Durée cible d'un morceau: Config.TRANSCRIPTION_CHUNK_SECONDS, réduite si nécessaire
+    pour que chaque morceau reste sous la limite d'upload de l'API.
+    """
+    target = float(Config.TRANSCRIPTION_CHUNK_SECONDS)
+    size = os.path.getsize(path)
+    if duration > 0 and size > Config.TRANSCRIPTION_MAX_UPLOAD_BYTES:
+        # Marge de 10% pour les variations de débit au sein du fichier
+        target = min(target, duration * Config.TRANSCRIPTION_MAX_UPLOAD_BYTES / size * 0.9)
+    return target
@@ -0,0 +1,348 @@
+import os
+import sqlite3
+import subprocess
+import threading
+import time
+from collections import Counter
+import numpy as np
+from config import Config
+from audio_chunker import _DURATION_RE
+from admission import stage
+
+# Paramètres de l'empreinte (inspirée de Haitsma & Kalker): 32 bits par trame,
+# différences d'énergie entre bandes voisines et trames consécutives
+SAMPLE_RATE = 8000
+FRAME_SIZE = 2048
+HOP_SIZE = 512
+BANDS = 33
+MIN_FREQ = 300.0
+MAX_FREQ = 2000.0
+# Trames exploitables minimales (environ 2 s) pour indexer, chercher ou comparer une empreinte
+MIN_FRAMES = 32
+
+
+@stage('ffmpeg')
+def decode_pcm(path, max_seconds=None):
+    """
+    Décode au plus `max_seconds` d'audio en PCM mono 8 kHz (float32) via ffmpeg
+
+    Returns:
+        tuple: (numpy.ndarray des échantillons, durée totale du fichier en s);
+        échantillons vides si le décodage échoue
+    """
+    max_seconds = Config.FINGERPRINT_MAX_SECONDS if max_seconds is None else max_seconds
+    args = ['ffmpeg', '-hide_banner', '-nostdin', '-i', path]
+    if max_seconds:
+        args += ['-t', str(max_seconds)]
+    args += ['-vn', '-ac', '1', '-ar', str(SAMPLE_RATE), '-f', 's16le', '-']
+    try:
+        proc = subprocess.run(args, stdout=subprocess.PIPE, stderr=subprocess.PIPE)
+    except OSError:
+        return np.zeros(0, dtype=np.float32), 0.0
+    samples = np.frombuffer(proc.stdout, dtype=np.int16).astype(np.float32) / 32768.0
+
+    duration = len(samples) / SAMPLE_RATE
+    match = _DURATION_RE.search(proc.stderr.decode('utf-8', 'replace'))
+    if match:
+        hours, minutes, seconds = match.groups()
+        duration = int(hours) * 3600 + int(minutes) * 60 + float(seconds)
+    return samples, duration
+
+
+def _band_edges():
+    """Indices FFT des bornes des bandes (espacement logarithmique)"""
+    edges = np.geomspace(MIN_FREQ, MAX_FREQ, BANDS + 1)
+    return np.round(edges * FRAME_SIZE / SAMPLE_RATE).astype(int)
+
+
+_EDGES = _band_edges()
+_WINDOW = np.hanning(FRAME_SIZE).astype(np.float32)
+
+
+def compute_fingerprint(samples):
+    """
+    Calcule l'empreinte d'un signal PCM: une valeur 32 bits par trame (uint32).
+    Les trames silencieuses sont exclues de l'index via le masque retourné.
+
+    Returns:
+        tuple: (numpy.ndarray uint32 des sous-empreintes, numpy.ndarray bool des trames exploitables)
+    """
+    if len(samples) < FRAME_SIZE + HOP_SIZE:
+        return np.zeros(0, dtype=np.uint32), np.zeros(0, dtype=bool)
+
+    count = 1 + (len(samples) - FRAME_SIZE) // HOP_SIZE
+    strides = (samples.strides[0] * HOP_SIZE, samples.strides[0])
+    frames = np.lib.stride_tricks.as_strided(samples, shape=(count, FRAME_SIZE), strides=strides)
+    spectrum = np.abs(np.fft.rfft(frames * _WINDOW, axis=1)) ** 2
+
+    # Énergie par bande (sommes cumulées pour éviter une boucle Python par bande)
+    cumulative = np.cumsum(spectrum, axis=1)
+    energies = cumulative[:, _EDGES[1:] - 1] - cumulative[:, _EDGES[:-1] - 1]
+
+    # Bit = signe de la dérivée temporelle de la différence entre bandes voisines
+    band_diff = energies[:, :-1] - energies[:, 1:]
+    bits = (band_diff[1:] - band_diff[:-1]) > 0
+    weights = (1 << np.arange(31, -1, -1, dtype=np.uint64))
+    hashes = (bits.astype(np.uint64) * weights).sum(axis=1).astype(np.uint32)
+
+    loudness = energies.sum(axis=1)
+    threshold = max(float(np.median(loudness)) * 0.01, 1e-6)
+    usable = (loudness[1:] > threshold) & (hashes != 0) & (hashes != 0xFFFFFFFF)
+    return hashes, usable
+
+
+def fingerprint_file(path):
+    """Empreinte d'un fichier audio, retourne (sous-empreintes, masque, durée totale en s)"""
+    samples, duration = decode_pcm(path)
+    hashes, usable = compute_fingerprint(samples)
+    return hashes, usable, duration
+
+
+def bit_error_rate(a, b):
+    """Proportion de bits différents entre deux séquences de sous-empreintes de même longueur"""
+    if len(a) == 0:
+        return 1.0
+    differing = np.unpackbits(np.bitwise_xor(a, b).view(np.uint8)).sum()
+    return float(differing) / (len(a) * 32)
+
+
+def bit_entropy(hashes, usable):
+    """
+    Entropie moyenne (bits) de chacun des 32 bits sur les trames exploitables: proche de 1
+    pour un signal riche (parole, musique), faible pour un son tonal ou quasi constant dont
+    les bits biaisés coïncident avec ceux de n'importe quel autre son du même type
+    """
+    frames = hashes[usable]
+    if len(frames) == 0:
+        return 0.0
+    ones = np.unpackbits(frames.view(np.uint8)).reshape(-1, 32).mean(axis=0)
+    ones = np.clip(ones, 1e-12, 1 - 1e-12)
+    return float(np.mean(-(ones * np.log2(ones) + (1 - ones) * np.log2(1 - ones))))
+
+
+def is_informative(hashes, usable):
+    """Empreinte assez longue et variée pour être comparée (Config.FINGERPRINT_MIN_ENTROPY)"""
+    return int(usable.sum()) >= MIN_FRAMES and bit_entropy(hashes, usable) >= Config.FINGERPRINT_MIN_ENTROPY
+
+
+def _aligned_ber(query, query_usable, stored, stored_usable, offset):
+    """
+    Taux d'erreur binaire entre deux empreintes au décalage donné (position stockée =
+    position requête + décalage), sur les seules trames exploitables des deux côtés;
+    1.0 si le recouvrement est inférieur à 80 % ou trop peu de trames sont comparables
+    """
+    begin = max(0, -offset)
+    end = min(len(query), len(stored) - offset)
+    if end - begin < max(min(len(query), len(stored)) * 0.8, MIN_FRAMES):
+        return 1.0
+    both = query_usable[begin:end] & stored_usable[begin + offset:end + offset]
+    if both.sum() < MIN_FRAMES:
+        return 1.0
+    return bit_error_rate(query[begin:end][both], stored[begin + offset:end + offset][both])
+
+
+def _hash_offset(query, query_usable, stored, stored_usable, max_shift):
+    """
+    Décalage porté par le plus de sous-empreintes identiques entre requête et empreinte
+    stockée (au moins deux) dans la fenêtre ±max_shift, None sans alignement crédible.
+    Un seul décalage est ensuite vérifié: prendre le minimum du taux d'erreur sur toute
+    la fenêtre ferait passer des audios différents sous le seuil.
+    """
+    positions = {}
+    for position in np.nonzero(stored_usable)[0]:
+        positions.setdefault(int(stored[position]), []).append(int(position))
+    votes = Counter()
+    for query_position in np.nonzero(query_usable)[0]:
+        for position in positions.get(int(query[query_position]), ()):
+            offset = position - int(query_position)
+            if abs(offset) <= max_shift:
+                votes[offset] += 1
+    if not votes:
+        return None
+    offset, count = votes.most_common(1)[0]
+    return offset if count >= 2 else None
+
+
+class FingerprintIndex:
+    """
+    Index SQLite des empreintes audio pour la recherche de quasi-doublons.
+
+    Chaque sous-empreinte exploitable est indexée (table inversée hash -> (empreinte, position));
+    une recherche vote pour les couples (empreinte, décalage) puis vérifie les meilleurs
+    candidats par taux d'erreur binaire sur la zone alignée. Les empreintes peu informatives
+    (sons tonaux, quasi constants, trop courts) ne sont ni indexées ni recherchées.
+    """
+
+    def __init__(self, db_path=None, max_entries=None, ttl=None):
+        self.db_path = db_path or Config.TRANSCRIPT_CACHE_PATH
+        self.max_entries = Config.TRANSCRIPT_CACHE_MAX_ENTRIES if max_entries is None else max_entries
+        self.ttl = Config.TRANSCRIPT_CACHE_TTL if ttl is None else ttl
+        self._lock = threading.Lock()
+
+        folder = os.path.dirname(self.db_path)
+        if folder:
+            os.makedirs(folder, exist_ok=True)
+
+        self._conn = sqlite3.connect(self.db_path, check_same_thread=False, isolation_level=None)
+        self._conn.execute('PRAGMA journal_mode=WAL')
+        self._conn.execute('PRAGMA synchronous=NORMAL')
+        self._conn.execute(
+            'CREATE TABLE IF NOT EXISTS fingerprints ('
+            ' id INTEGER PRIMARY KEY AUTOINCREMENT,'
+            ' cache_key TEXT,'
+            ' transcript TEXT NOT NULL,'
+            ' language TEXT,'
+            ' duration REAL NOT NULL,'
+            ' whisper_seconds REAL NOT NULL,'
+            ' fingerprint BLOB NOT NULL,'
+            ' mask BLOB NOT NULL,'
+            ' created_at REAL NOT NULL'
+            ')'
+        )
+        self._conn.execute(
+            'CREATE TABLE IF NOT EXISTS fingerprint_hashes ('
+            ' hash INTEGER NOT NULL,'
+            ' fingerprint_id INTEGER NOT NULL,'
+            ' position INTEGER NOT NULL'
+            ')'
+        )
+        self._conn.execute('CREATE INDEX IF NOT EXISTS idx_fingerprint_hashes ON fingerprint_hashes (hash)')
+        self._conn.execute('CREATE INDEX IF NOT EXISTS idx_fingerprint_hashes_id ON fingerprint_hashes (fingerprint_id)')
+        self._conn.execute('CREATE INDEX IF NOT EXISTS idx_fingerprints_duration ON fingerprints (duration)')
+
+    def add(self, hashes, usable, duration, transcript, language=None, cache_key=None, whisper_seconds=0.0):
+        """Indexe l'empreinte d'un audio transcrit avec sa transcription (sauf empreinte peu informative)"""
+        if len(hashes) == 0 or not is_informative(hashes, usable):
+            return
+        now = time.time()
+        positions = np.nonzero(usable)[0]
+        with self._lock:
+            self._conn.execute('BEGIN')
+            try:
+                cursor = self._conn.execute(
+                    'INSERT INTO fingerprints (cache_key, transcript, language, duration, whisper_seconds, fingerprint, mask, created_at) '
+                    'VALUES (?, ?, ?, ?, ?, ?, ?, ?)',
+                    (cache_key, transcript, language, duration, whisper_seconds, hashes.tobytes(),
+                     np.packbits(usable).tobytes(), now)
+                )
+                fingerprint_id = cursor.lastrowid
+                self._conn.executemany(
+                    'INSERT INTO fingerprint_hashes (hash, fingerprint_id, position) VALUES (?, ?, ?)',
+                    ((int(hashes[position]), fingerprint_id, int(position)) for position in positions)
+                )
+                self._evict(now)
+                self._conn.execute('COMMIT')
+            except Exception:
+                self._conn.execute('ROLLBACK')
+                raise
+
+    def lookup(self, hashes, usable, duration):
+        """
+        Cherche un audio quasi identique (même durée à la tolérance près, taux d'erreur
+        binaire sous Config.FINGERPRINT_MAX_BER).
+
+        Les candidats viennent de deux sources: le vote sur un échantillon des sous-empreintes
+        (rapide, suffisant pour un simple réencodage) et les empreintes de durée voisine, dont
+        le décalage est voté sur toutes les sous-empreintes (quand l'échantillon n'en retrouve
+        que peu: changement de volume, bitrate très bas). Chaque candidat n'est vérifié qu'à
+        son décalage voté, sur les trames exploitables des deux côtés.
+
+        Returns:
+            dict: {'transcript', 'language', 'cache_key', 'whisper_seconds', 'ber'} ou None
+        """
+        positions = np.nonzero(usable)[0]
+        if len(positions) == 0 or not is_informative(hashes, usable):
+            return None
+
+        tolerance = max(2.0, duration * Config.FINGERPRINT_DURATION_TOLERANCE)
+        max_shift = int(tolerance * SAMPLE_RATE / HOP_SIZE)
+
+        # Échantillon des sous-empreintes de la requête pour le vote
+        step = max(1, len(positions) // Config.FINGERPRINT_QUERY_FRAMES)
+        query = {}
+        for position in positions[::step]:
+            query.setdefault(int(hashes[position]), []).append(int(position))
+
+        votes = Counter()
+        values = list(query)
+        with self._lock:
+            for start in range(0, len(values), 500):
+                batch = values[start:start + 500]
+                rows = self._conn.execute(
+                    f'SELECT hash, fingerprint_id, position FROM fingerprint_hashes '
+                    f'WHERE hash IN ({",".join("?" * len(batch))})',
+                    batch
+                ).fetchall()
+                for value, fingerprint_id, position in rows:
+                    for query_position in query[value]:
+                        votes[(fingerprint_id, position - query_position)] += 1
+
+            neighbours = self._conn.execute(
+                'SELECT id FROM fingerprints WHERE duration BETWEEN ? AND ? '
+                'ORDER BY ABS(duration - ?) LIMIT ?',
+                (duration - tolerance, duration + tolerance, duration, Config.FINGERPRINT_CANDIDATES)
+            ).fetchall()
+
+        # Empreinte -> décalage voté sur l'échantillon, None pour un voisin de durée à aligner
+        candidates = {}
+        for (fingerprint_id, offset), count in votes.most_common(Config.FINGERPRINT_CANDIDATES):
+            if count >= 2:
+                candidates.setdefault(fingerprint_id, offset)
+        for (fingerprint_id,) in neighbours:
+            candidates.setdefault(fingerprint_id, None)
+
+        now = time.time()
+        best = None
+        for fingerprint_id, offset in candidates.items():
+            with self._lock:
+                row = self._conn.execute(
+                    'SELECT transcript, language, cache_key, whisper_seconds, duration, fingerprint, mask, created_at '
+                    'FROM fingerprints WHERE id = ?',
+                    (fingerprint_id,)
+                ).fetchone()
+            if row is None:
+                continue
+            transcript, language, cache_key, whisper_seconds, stored_duration, blob, mask, created_at = row
+            if self.ttl and now - created_at > self.ttl:
+                continue
+            if abs(stored_duration - duration) > tolerance:
+                continue
+
+            stored = np.frombuffer(blob, dtype=np.uint32)
+            # Masque des trames exploitables (bits compactés)
+            stored_usable = np.unpackbits(np.frombuffer(mask, dtype=np.uint8), count=len(stored)).astype(bool)
+            if offset is None:
+                offset = _hash_offset(hashes, usable, stored, stored_usable, max_shift)
+                if offset is None:
+                    continue
+            ber = _aligned_ber(hashes, usable, stored, stored_usable, offset)
+            if ber <= Config.FINGERPRINT_MAX_BER and (best is None or ber < best['ber']):
+                best = {
+                    'transcript': transcript,
+                    'language': language,
+                    'cache_key': cache_key,
+                    'whisper_seconds': whisper_seconds,
+                    'ber': round(ber, 4),
+                }
+        return best
+
+    def stats(self):
+        with self._lock:
+            entries = self._conn.execute('SELECT COUNT(*) FROM fingerprints').fetchone()[0]
+            hashes = self._conn.execute('SELECT COUNT(*) FROM fingerprint_hashes').fetchone()[0]
+        return {'entries': entries, 'indexed_hashes': hashes}
+
+    def _evict(self, now):
+        """Supprime les empreintes expirées puis les plus anciennes au-delà de la limite"""
+        stale = []
+        if self.ttl:
+            stale += [row[0] for row in self._conn.execute(
+                'SELECT id FROM fingerprints WHERE created_at < ?', (now - self.ttl,)
+            )]
+        if self.max_entries:
+            stale += [row[0] for row in self._conn.execute(
+                'SELECT id FROM fingerprints ORDER BY id DESC LIMIT -1 OFFSET ?', (self.max_entries,)
+            )]
+        for fingerprint_id in set(stale):
+            self._conn.execute('DELETE FROM fingerprint_hashes WHERE fingerprint_id = ?', (fingerprint_id,))
+            self._conn.execute('DELETE FROM fingerprints WHERE id = ?', (fingerprint_id,))
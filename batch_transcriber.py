@@ -0,0 +1,141 @@
+import contextvars
+import threading
+from collections import deque, OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from config import Config
+
+
+class BatchTranscriber:
+    """
+    Transcription d'une liste d'URLs sur un pool de threads borné.
+
+    - dédoublonnage par identifiant canonique de vidéo (une seule transcription par vidéo)
+    - limite de concurrence par plateforme, partagée par tous les lots en cours
+      (évite de déclencher les protections anti-robot, Instagram en particulier)
+    - résultats produits au fil de l'eau, dans l'ordre de fin de traitement
+    """
+
+    def __init__(self, runner, identify, max_workers=None, platform_limits=None):
+        """
+        Args:
+            runner (callable): runner(url) -> (payload, status_code)
+            identify (callable): identify(url) -> (plateforme, clé canonique), (None, None) si URL invalide
+        """
+        self.runner = runner
+        self.identify = identify
+        self.max_workers = max_workers or Config.BATCH_MAX_WORKERS
+        self.platform_limits = dict(Config.BATCH_PLATFORM_CONCURRENCY if platform_limits is None else platform_limits)
+        self._lock = threading.Lock()
+        self._running = {}
+        # Réveil des lots en attente d'une place (une par lot, levée à chaque libération)
+        self._waiters = set()
+        self._executor = ThreadPoolExecutor(
+            max_workers=self.max_workers,
+            thread_name_prefix='batch'
+        )
+
+    def _try_acquire(self, platform):
+        """Réserve une place pour la plateforme si sa limite n'est pas atteinte"""
+        limit = self.platform_limits.get(platform) or self.max_workers
+        with self._lock:
+            running = self._running.get(platform, 0)
+            if running >= limit:
+                return False
+            self._running[platform] = running + 1
+            return True
+
+    def _release(self, platform):
+        with self._lock:
+            self._running[platform] -= 1
+            for wake in self._waiters:
+                wake.set()
+
+    def _run_item(self, platform, url):
+        try:
+            return self.runner(url)
+        except Exception as e:
+            return {
+                'success': False,
+                'error': f'Erreur générale: {str(e)}'
+            }, 500
+        finally:
+            self._release(platform)
+
+    def run(self, urls, context=None, charge=None):
+        """
+        Traite le lot et produit un dict par URL soumise:
+        {'index', 'url', 'status', ...payload} ou {'index', 'url', 'duplicate_of'}
+        pour une URL désignant une vidéo déjà présente dans le lot.
+
+        Args:
+            context (contextvars.Context): contexte de la requête (client de l'admission),
+                copié pour chaque élément; le générateur est consommé après la fin de la vue
+            charge (callable): charge() -> 0 si l'élément peut partir, sinon délai (s) avant
+                que les jetons du client le permettent (un jeton par URL traitée)
+        """
+        context = context or contextvars.copy_context()
+        # File d'attente par plateforme; une clé canonique n'est traitée qu'une fois
+        pending = OrderedDict()
+        first_index = {}
+        for index, url in enumerate(urls):
+            platform, key = self.identify(url)
+            if platform is None:
+                yield {
+                    'index': index,
+                    'url': url,
+                    'status': 400,
+                    'success': False,
+                    'error': "URL invalide. Veuillez utiliser une URL Instagram, TikTok ou Vimeo valide."
+                }
+                continue
+            if key in first_index:
+                yield {'index': index, 'url': url, 'duplicate_of': first_index[key]}
+                continue
+            first_index[key] = index
+            pending.setdefault(platform, deque()).append((index, url))
+
+        # Levé par la fin d'un élément du lot ou une place libérée par un autre lot
+        wake = threading.Event()
+        with self._lock:
+            self._waiters.add(wake)
+        futures = {}
+        try:
+            while pending or futures:
+                # Effacé avant l'examen des places et des éléments: un réveil ultérieur n'est pas perdu
+                wake.clear()
+                # Répartition tour à tour entre plateformes, dans la limite des places libres
+                # et des jetons du client
+                submitted = True
+                throttled = 0.0
+                while submitted and not throttled and pending and len(futures) < self.max_workers:
+                    submitted = False
+                    for platform in list(pending):
+                        if len(futures) >= self.max_workers or not self._try_acquire(platform):
+                            continue
+                        throttled = charge() if charge else 0.0
+                        if throttled:
+                            self._release(platform)
+                            break
+                        index, url = pending[platform].popleft()
+                        if not pending[platform]:
+                            del pending[platform]
+                        future = self._executor.submit(context.copy().run, self._run_item, platform, url)
+                        future.add_done_callback(lambda _: wake.set())
+                        futures[future] = (index, url)
+                        submitted = True
+
+                done = [future for future in futures if future.done()]
+                for future in done:
+                    index, url = futures.pop(future)
+                    payload, status_code = future.result()
+                    yield dict(payload, index=index, url=url, status=status_code)
+
+                if not done and (pending or futures):
+                    # Attente d'un élément terminé, d'une place libérée par un autre lot
+                    # ou des jetons du client (throttled)
+                    wake.wait(throttled or None)
+        finally:
+            with self._lock:
+                self._waiters.discard(wake)
+            # Client déconnecté: les éléments non lancés sont abandonnés, ceux en cours se terminent
+            pending.clear()
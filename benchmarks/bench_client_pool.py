@@ -0,0 +1,146 @@
+"""
+Benchmark: coût par requête des clients construits à chaque appel vs clients partagés.
+
+- yt-dlp: `yt_dlp.YoutubeDL(opts)` neuf à chaque extraction vs instance prêtée par `ydl_pool`
+- HTTP: `requests.get` (nouvelle connexion TLS à chaque appel) vs session keep-alive `get_session()`
+
+Un serveur HTTPS local (certificat auto-signé généré avec openssl) sert un média et un JSON
+de configuration, pour isoler le coût client du réseau.
+
+Usage:
+    python benchmarks/bench_client_pool.py --runs 50
+"""
+import argparse
+import os
+import ssl
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import requests
+import yt_dlp
+from ydl_pool import YoutubeDLPool
+from http_client import get_session
+
+
+class FixtureHandler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+    disable_nagle_algorithm = True
+    payload = b''
+    connections = 0
+    lock = threading.Lock()
+
+    def setup(self):
+        super().setup()
+        with FixtureHandler.lock:
+            FixtureHandler.connections += 1
+
+    def _send(self, body, content_type):
+        self.send_response(200)
+        self.send_header('Content-Type', content_type)
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        return body
+
+    def do_HEAD(self):
+        self._send(self.payload, 'video/mp4')
+
+    def do_GET(self):
+        if self.path.startswith('/config'):
+            self.wfile.write(self._send(b'{"request": {"files": {}}}', 'application/json'))
+        else:
+            self.wfile.write(self._send(self.payload, 'video/mp4'))
+
+    def log_message(self, *args):
+        pass
+
+
+class QuietServer(ThreadingHTTPServer):
+    daemon_threads = True
+
+    def handle_error(self, request, client_address):
+        pass
+
+
+def make_certificate(folder):
+    cert = os.path.join(folder, 'cert.pem')
+    key = os.path.join(folder, 'key.pem')
+    subprocess.run([
+        'openssl', 'req', '-x509', '-newkey', 'rsa:2048', '-nodes', '-days', '1',
+        '-subj', '/CN=127.0.0.1', '-addext', 'subjectAltName=IP:127.0.0.1',
+        '-keyout', key, '-out', cert,
+    ], check=True, capture_output=True)
+    return cert, key
+
+
+def measure(label, fn, runs):
+    FixtureHandler.connections = 0
+    fn()  # échauffement (imports paresseux, premier handshake)
+    FixtureHandler.connections = 0
+    start = time.perf_counter()
+    for _ in range(runs):
+        fn()
+    elapsed = time.perf_counter() - start
+    print(f'{label:<34} {elapsed / runs * 1000:8.2f} ms/requête  {FixtureHandler.connections / runs:5.2f} connexions/requête')
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--runs', type=int, default=50)
+    parser.add_argument('--size', type=int, default=64 * 1024, help='taille du média (octets)')
+    args = parser.parse_args()
+
+    FixtureHandler.payload = os.urandom(args.size)
+    with tempfile.TemporaryDirectory() as folder:
+        cert, key = make_certificate(folder)
+        server = QuietServer(('127.0.0.1', 0), FixtureHandler)
+        context = ssl.SSLContext(ssl.PROTOCOL_TLS_SERVER)
+        context.load_cert_chain(cert, key)
+        server.socket = context.wrap_socket(server.socket, server_side=True)
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+        base = f'https://127.0.0.1:{server.server_port}'
+
+        # --- yt-dlp: extraction (sans téléchargement) du média local
+        opts = {
+            'quiet': True,
+            'no_warnings': True,
+            'noprogress': True,
+            'force_generic_extractor': True,
+            'nocheckcertificate': True,
+            'outtmpl': os.path.join(folder, '%(id)s.%(ext)s'),
+            'http_headers': {'Referer': base},
+        }
+        media_url = f'{base}/fixture.mp4'
+        pool = YoutubeDLPool(max_idle_per_profile=4)
+
+        def fresh_ydl():
+            with yt_dlp.YoutubeDL(dict(opts)) as ydl:
+                ydl.extract_info(media_url, download=False)
+
+        def pooled_ydl():
+            with pool.lease(opts) as ydl:
+                ydl.extract_info(media_url, download=False)
+
+        print('yt-dlp extract_info (download=False)')
+        measure('  YoutubeDL() par appel', fresh_ydl, args.runs)
+        measure('  ydl_pool.lease()', pooled_ydl, args.runs)
+        print(f'  pool: {pool.stats()}')
+
+        # --- HTTP: config du player (petit JSON), comme VimeoDownloader._fetch_player_config
+        config_url = f'{base}/config'
+        session = get_session()
+
+        print('GET JSON (HTTPS)')
+        measure('  requests.get par appel', lambda: requests.get(config_url, verify=cert, timeout=10), args.runs)
+        measure('  get_session().get', lambda: session.get(config_url, verify=cert, timeout=10), args.runs)
+
+        server.shutdown()
+
+
+if __name__ == '__main__':
+    main()
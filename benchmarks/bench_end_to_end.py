@@ -0,0 +1,386 @@
+"""
+Benchmark de bout en bout hors ligne: débit et latences de /transcribe et /download.
+
+- un serveur HTTP local sert des médias de test (MP4 muxé, audio M4A) générés avec ffmpeg
+- un faux endpoint OpenAI (/v1/audio/transcriptions) répond avec une latence configurable;
+  le vrai client OpenAI de OpenAIWhisperBackend y est dirigé via OPENAI_BASE_URL
+- les URLs Instagram/TikTok/Vimeo sont redirigées vers les médias locaux
+  (extracteur générique yt-dlp, URLs directes pour le mode proxy de /download)
+- l'application tourne dans ce processus (serveur werkzeug multi-thread) et reçoit
+  les requêtes via HTTP avec la concurrence demandée
+
+Rapporte p50/p95/p99, requêtes par seconde, pic de RSS et pic d'occupation disque
+de DOWNLOAD_FOLDER.
+
+Usage:
+    python benchmarks/bench_end_to_end.py --requests 40 --concurrency 8 --whisper-latency 0.3
+    python benchmarks/bench_end_to_end.py --endpoint download --no-proxy
+    python benchmarks/bench_end_to_end.py --server asgi --requests 400 --concurrency 200 --whisper-latency 2
+    python benchmarks/bench_end_to_end.py --admission --clients 4 --concurrency 16 --endpoint transcribe
+"""
+import argparse
+import collections
+import itertools
+import json
+import os
+import re
+import resource
+import shutil
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from functools import partial
+from http.server import ThreadingHTTPServer, SimpleHTTPRequestHandler, BaseHTTPRequestHandler
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+import requests
+
+# Plateforme -> (gabarit d'URL publique, média servi)
+PLATFORMS = {
+    'Instagram': ('https://www.instagram.com/reel/BENCH{n}/', 'muxed.mp4'),
+    'TikTok': ('https://www.tiktok.com/@bench/video/{n}', 'muxed.mp4'),
+    'Vimeo': ('https://vimeo.com/{n}', 'audio.m4a'),
+}
+
+
+class QuietHandler(SimpleHTTPRequestHandler):
+    def log_message(self, *args):
+        pass
+
+
+class QuietServer(ThreadingHTTPServer):
+    daemon_threads = True
+    # Des centaines de connexions simultanées en mode ASGI
+    request_queue_size = 1024
+
+    def handle_error(self, request, client_address):
+        # La sonde de l'extracteur générique interrompt volontairement certaines réponses
+        pass
+
+
+class FakeWhisperHandler(BaseHTTPRequestHandler):
+    """Faux endpoint de transcription OpenAI (réponse text ou verbose_json)"""
+    latency = 0.0
+    calls = 0
+    lock = threading.Lock()
+
+    def do_POST(self):
+        body = self.rfile.read(int(self.headers.get('Content-Length') or 0))
+        with FakeWhisperHandler.lock:
+            FakeWhisperHandler.calls += 1
+        time.sleep(self.latency)
+
+        match = re.search(rb'name="response_format"\r\n\r\n(\w+)', body)
+        response_format = match.group(1).decode() if match else 'json'
+        text = 'Transcription de test'
+        if response_format == 'text':
+            payload, content_type = text.encode(), 'text/plain'
+        else:
+            payload = json.dumps({
+                'task': 'transcribe',
+                'text': text,
+                'language': 'french',
+                'duration': 1.0,
+                'segments': [{'id': 0, 'start': 0.0, 'end': 1.0, 'text': text}],
+            }).encode()
+            content_type = 'application/json'
+        self.send_response(200)
+        self.send_header('Content-Type', content_type)
+        self.send_header('Content-Length', str(len(payload)))
+        self.end_headers()
+        self.wfile.write(payload)
+
+    def log_message(self, *args):
+        pass
+
+
+def make_fixtures(folder, duration):
+    """Génère un MP4 muxé (H.264 + AAC) et un flux audio seul (AAC/M4A)"""
+    common = ['ffmpeg', '-hide_banner', '-loglevel', 'error', '-y']
+    subprocess.run(common + [
+        '-f', 'lavfi', '-i', f'sine=frequency=440:duration={duration}',
+        '-f', 'lavfi', '-i', f'testsrc=duration={duration}:size=640x360:rate=25',
+        '-c:v', 'libx264', '-preset', 'ultrafast', '-c:a', 'aac', '-b:a', '128k', '-shortest',
+        os.path.join(folder, 'muxed.mp4'),
+    ], check=True)
+    subprocess.run(common + [
+        '-f', 'lavfi', '-i', f'sine=frequency=440:duration={duration}',
+        '-c:a', 'aac', '-b:a', '128k',
+        os.path.join(folder, 'audio.m4a'),
+    ], check=True)
+
+
+def start_server(server):
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return f'http://127.0.0.1:{server.server_port}'
+
+
+def redirect_platforms(app_module, fixtures_url, proxy):
+    """Redirige les téléchargements des trois plateformes vers les médias locaux"""
+    import media_extraction
+    import instagram_downloader
+    import tiktok_downloader
+    import vimeo_downloader
+
+    def fixture_for(url):
+        _, platform = app_module.resolve_downloader(url)
+        if platform not in PLATFORMS:
+            return url
+        return f'{fixtures_url}/{PLATFORMS[platform][1]}'
+
+    original = media_extraction.extract_and_download
+
+    def local_extract_and_download(ydl_opts, url):
+        opts = dict(ydl_opts, force_generic_extractor=True, quiet=True, no_warnings=True, noprogress=True)
+        opts.pop('extractor_args', None)
+        opts.pop('cookiesfrombrowser', None)
+        return original(opts, fixture_for(url))
+
+    for module in (media_extraction, instagram_downloader, tiktok_downloader, vimeo_downloader):
+        if hasattr(module, 'extract_and_download'):
+            module.extract_and_download = local_extract_and_download
+
+    # Pas d'appel réseau pour la config du player Vimeo
+    app_module.vimeo_downloader._fetch_player_config = lambda video_id: {}
+
+    def direct_media(url):
+        if not proxy:
+            return None
+        return {'url': fixture_for(url).replace('audio.m4a', 'muxed.mp4'), 'http_headers': {}, 'ext': 'mp4', 'filesize': None}
+
+    async def adirect_media(url):
+        return direct_media(url)
+
+    for downloader in (app_module.instagram_downloader, app_module.tiktok_downloader, app_module.vimeo_downloader):
+        downloader.get_direct_media = direct_media
+        if hasattr(downloader, 'aget_direct_media'):
+            downloader.aget_direct_media = adirect_media
+
+
+class Sampler:
+    """Échantillonne le pic d'occupation disque de DOWNLOAD_FOLDER"""
+
+    def __init__(self, folder, interval=0.05):
+        from workspace import tree_size
+        self.tree_size = tree_size
+        self.folder = folder
+        self.interval = interval
+        self.peak_bytes = 0
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._loop, daemon=True)
+
+    def _loop(self):
+        while not self._stop.is_set():
+            if os.path.isdir(self.folder):
+                self.peak_bytes = max(self.peak_bytes, self.tree_size(self.folder))
+            self._stop.wait(self.interval)
+
+    def __enter__(self):
+        self._thread.start()
+        return self
+
+    def __exit__(self, *args):
+        self._stop.set()
+        self._thread.join()
+
+
+def limit_threads(wsgi_app, threads):
+    """Plafonne les requêtes WSGI simultanées, comme gunicorn -k gthread --threads N"""
+    slots = threading.BoundedSemaphore(threads)
+
+    def limited(environ, start_response):
+        with slots:
+            return list(wsgi_app(environ, start_response))
+
+    return limited
+
+
+def start_app_server(app_module, server_kind, wsgi_threads):
+    """Démarre l'application (werkzeug borné à `wsgi_threads`, ou uvicorn pour asgi:app), retourne (URL, arrêt)"""
+    if server_kind == 'asgi':
+        import socket
+        import uvicorn
+        import asgi
+
+        sock = socket.socket()
+        sock.bind(('127.0.0.1', 0))
+        server = uvicorn.Server(uvicorn.Config(asgi.app, log_level='warning', access_log=False, backlog=4096))
+        threading.Thread(target=server.run, kwargs={'sockets': [sock]}, daemon=True).start()
+        while not server.started:
+            time.sleep(0.05)
+
+        def stop():
+            server.should_exit = True
+
+        return f'http://127.0.0.1:{sock.getsockname()[1]}', stop
+
+    from werkzeug.serving import make_server, WSGIRequestHandler
+
+    class QuietRequestHandler(WSGIRequestHandler):
+        def log_request(self, *args, **kwargs):
+            pass
+
+    server = make_server('127.0.0.1', 0, limit_threads(app_module.app, wsgi_threads), threaded=True,
+                         request_handler=QuietRequestHandler)
+    server.socket.listen(4096)
+    return start_server(server), server.shutdown
+
+
+def percentile(values, fraction):
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    index = min(len(ordered) - 1, max(0, int(round(fraction * (len(ordered) - 1)))))
+    return ordered[index]
+
+
+def drive(label, base_url, make_request, total, concurrency, download_folder, warmup=0):
+    # Échauffement hors mesure (pools yt-dlp, imports paresseux, premières connexions)
+    for index in range(warmup):
+        make_request(base_url, -1 - index)
+
+    latencies = []
+    failures = []
+    lock = threading.Lock()
+
+    def one(index):
+        start = time.perf_counter()
+        try:
+            ok = make_request(base_url, index)
+        except Exception:
+            ok = False
+        elapsed = time.perf_counter() - start
+        with lock:
+            latencies.append(elapsed)
+            if not ok:
+                failures.append(index)
+
+    with Sampler(download_folder) as sampler:
+        start = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=concurrency) as pool:
+            list(pool.map(one, range(total)))
+        wall = time.perf_counter() - start
+
+    peak_rss_mb = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+    print(
+        f'{label:<12} {total:>5} req  c={concurrency:<3} '
+        f'p50 {percentile(latencies, 0.50) * 1000:7.0f} ms  '
+        f'p95 {percentile(latencies, 0.95) * 1000:7.0f} ms  '
+        f'p99 {percentile(latencies, 0.99) * 1000:7.0f} ms  '
+        f'{total / wall:6.2f} req/s  '
+        f'RSS max {peak_rss_mb:6.0f} MiB  '
+        f'disque max {sampler.peak_bytes / 1024 ** 2:7.1f} MiB  '
+        f'échecs {len(failures)}'
+    )
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--requests', type=int, default=24)
+    parser.add_argument('--concurrency', type=int, default=4)
+    parser.add_argument('--endpoint', choices=('transcribe', 'download', 'both'), default='both')
+    parser.add_argument('--whisper-latency', type=float, default=0.3, help='latence du faux Whisper (s)')
+    parser.add_argument('--duration', type=int, default=30, help='durée des médias de test (s)')
+    parser.add_argument('--same-video', action='store_true', help='toutes les requêtes visent la même vidéo (coalescence, cache)')
+    parser.add_argument('--warmup', type=int, default=len(PLATFORMS), help='requêtes d\'échauffement non mesurées')
+    parser.add_argument('--no-proxy', action='store_true', help='/download passe par le disque au lieu du mode proxy')
+    parser.add_argument('--fingerprint', action='store_true', help='active le dédoublonnage par empreinte audio')
+    parser.add_argument('--server', choices=('wsgi', 'asgi'), default='wsgi', help='app:app (werkzeug) ou asgi:app (uvicorn)')
+    parser.add_argument('--admission', action='store_true',
+                        help='garde la couche d\'admission configurée (désactivée sinon: un seul client local)')
+    parser.add_argument('--clients', type=int, default=1, help='nombre de clients distincts (clés X-API-Key)')
+    parser.add_argument('--wsgi-threads', type=int, default=8, help='requêtes WSGI simultanées (threads gunicorn)')
+    args = parser.parse_args()
+
+    if not shutil.which('ffmpeg'):
+        sys.exit('ffmpeg est requis pour ce benchmark')
+
+    with tempfile.TemporaryDirectory() as fixtures, tempfile.TemporaryDirectory() as workdir:
+        make_fixtures(fixtures, args.duration)
+        fixtures_url = start_server(QuietServer(('127.0.0.1', 0), partial(QuietHandler, directory=fixtures)))
+        FakeWhisperHandler.latency = args.whisper_latency
+        whisper_url = start_server(QuietServer(('127.0.0.1', 0), FakeWhisperHandler))
+
+        # Configuration lue à l'import de l'application: tout est isolé dans un dossier temporaire
+        os.chdir(workdir)
+        os.environ.update({
+            'OPENAI_API_KEY': 'sk-bench',
+            'OPENAI_BASE_URL': f'{whisper_url}/v1',
+            'TRANSCRIPTION_BACKEND': 'openai',
+            'TRANSCRIPT_CACHE_PATH': os.path.join(workdir, 'cache', 'transcripts.db'),
+            'JOBS_DB_PATH': os.path.join(workdir, 'cache', 'jobs.db'),
+            # Les médias de test partagent la même bande son: l'empreinte éviterait tout appel Whisper
+            'FINGERPRINT_ENABLED': '1' if args.fingerprint else '0',
+            # Clés des clients simulés, reconnues par l'admission
+            'ADMISSION_API_KEYS': ','.join(f'client-{n}' for n in range(args.clients)),
+        })
+        if not args.admission:
+            # Tout le trafic vient de 127.0.0.1: sans cela, le benchmark mesurerait les 429
+            os.environ.update({
+                'ADMISSION_RATE_PER_MINUTE': '0',
+                'ADMISSION_MAX_CONCURRENT': '0',
+                'ADMISSION_INSTAGRAM_DOWNLOADS': '0',
+                'ADMISSION_TIKTOK_DOWNLOADS': '0',
+                'ADMISSION_VIMEO_DOWNLOADS': '0',
+                'ADMISSION_FFMPEG_CONCURRENCY': '0',
+                'ADMISSION_WHISPER_CONCURRENCY': '0',
+            })
+        import app as app_module
+
+        redirect_platforms(app_module, fixtures_url, proxy=not args.no_proxy)
+        base_url, stop_server = start_app_server(app_module, args.server, args.wsgi_threads)
+        sessions = threading.local()
+        platforms = itertools.cycle(PLATFORMS.values())
+        counter = itertools.count(1)
+        counter_lock = threading.Lock()
+
+        def next_url():
+            with counter_lock:
+                template, _ = next(platforms)
+                n = 1 if args.same_video else next(counter)
+            return template.format(n=n)
+
+        rejected = collections.Counter()
+
+        def session():
+            if not hasattr(sessions, 'session'):
+                sessions.session = requests.Session()
+            return sessions.session
+
+        def post(base, path, index):
+            headers = {'X-API-Key': f'client-{index % args.clients}'}
+            response = session().post(f'{base}{path}', json={'url': next_url()}, headers=headers, timeout=600)
+            if response.status_code == 429:
+                rejected[path] += 1
+            return response
+
+        def transcribe(base, index):
+            response = post(base, '/transcribe', index)
+            return response.status_code == 200 and response.json().get('success')
+
+        def download(base, index):
+            response = post(base, '/download', index)
+            return response.status_code == 200 and len(response.content) > 0
+
+        download_folder = app_module.Config.DOWNLOAD_FOLDER
+        server_label = 'asgi:app (uvicorn)' if args.server == 'asgi' else f'app:app ({args.wsgi_threads} threads)'
+        print(f'{server_label}, médias de {args.duration} s, faux Whisper {args.whisper_latency * 1000:.0f} ms, '
+              f'/download en mode {"disque" if args.no_proxy else "proxy"}')
+        if args.endpoint in ('transcribe', 'both'):
+            drive('/transcribe', base_url, transcribe, args.requests, args.concurrency, download_folder, args.warmup)
+            print(f'{"":<12} appels Whisper: {FakeWhisperHandler.calls}, refus 429: {rejected["/transcribe"]}')
+        if args.endpoint in ('download', 'both'):
+            drive('/download', base_url, download, args.requests, args.concurrency, download_folder, args.warmup)
+            print(f'{"":<12} refus 429: {rejected["/download"]}')
+
+        stop_server()
+        os.chdir(ROOT)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,96 @@
+"""
+Benchmark: extraction yt-dlp en deux passages (extract_info + download) vs un seul passage.
+
+Un serveur HTTP local sert un média de test avec une latence artificielle par requête
+(simulant le scraping Instagram). On compte les requêtes reçues et le temps total.
+
+Usage:
+    python benchmarks/bench_extraction.py --runs 5 --latency 0.2
+"""
+import argparse
+import os
+import sys
+import tempfile
+import threading
+import time
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import yt_dlp
+from media_extraction import extract_and_download
+
+
+class FixtureHandler(BaseHTTPRequestHandler):
+    payload = b''
+    latency = 0.0
+    requests_seen = 0
+    lock = threading.Lock()
+
+    def _headers(self):
+        with FixtureHandler.lock:
+            FixtureHandler.requests_seen += 1
+        time.sleep(self.latency)
+        self.send_response(200)
+        self.send_header('Content-Type', 'video/mp4')
+        self.send_header('Content-Length', str(len(self.payload)))
+        self.end_headers()
+
+    def do_HEAD(self):
+        self._headers()
+
+    def do_GET(self):
+        self._headers()
+        self.wfile.write(self.payload)
+
+    def log_message(self, *args):
+        pass
+
+
+def legacy_download(opts, url):
+    """Ancien chemin: métadonnées puis téléchargement (deux extractions)"""
+    with yt_dlp.YoutubeDL(opts) as ydl:
+        info = ydl.extract_info(url, download=False)
+        ydl.download([url])
+        return info
+
+
+def measure(label, fn, opts, url, runs):
+    FixtureHandler.requests_seen = 0
+    start = time.perf_counter()
+    for _ in range(runs):
+        fn(opts, url)
+    elapsed = time.perf_counter() - start
+    print(f'{label:<22} {elapsed / runs * 1000:8.1f} ms/run  {FixtureHandler.requests_seen / runs:4.1f} requêtes HTTP/run')
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--runs', type=int, default=5)
+    parser.add_argument('--latency', type=float, default=0.2, help='latence par requête (s)')
+    parser.add_argument('--size', type=int, default=512 * 1024, help='taille du média (octets)')
+    args = parser.parse_args()
+
+    FixtureHandler.payload = os.urandom(args.size)
+    FixtureHandler.latency = args.latency
+    server = ThreadingHTTPServer(('127.0.0.1', 0), FixtureHandler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    url = f'http://127.0.0.1:{server.server_port}/fixture.mp4'
+
+    with tempfile.TemporaryDirectory() as folder:
+        opts = {
+            'quiet': True,
+            'no_warnings': True,
+            'noprogress': True,
+            'force_generic_extractor': True,
+            'overwrites': True,
+            'outtmpl': os.path.join(folder, '%(id)s.%(ext)s'),
+        }
+        measure('extract + download', legacy_download, opts, url, args.runs)
+        measure('extract_and_download', extract_and_download, opts, url, args.runs)
+
+    server.shutdown()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,156 @@
+"""
+Benchmark: empreintes audio pour le dédoublonnage des reposts.
+
+Sur des audios de test générés avec ffmpeg, mesure:
+- le coût de l'empreinte (décodage + calcul) par minute d'audio
+- la robustesse: une variante réencodée, à volume réduit, en bas débit ou rognée
+  doit retrouver l'original; un audio différent de même durée ne doit rien retrouver
+- la non-régression des faux positifs: des sons tonaux distincts (sinus 440/660 Hz,
+  glissandos) ne doivent pas se retrouver entre eux (code de sortie 1 sinon)
+- le temps de recherche dans un index de --entries empreintes
+- le bilan: coût de l'empreinte payé sur chaque requête comparé à la latence
+  Whisper évitée sur chaque repost (--whisper-seconds par minute d'audio)
+
+Usage:
+    python benchmarks/bench_fingerprint.py --minutes 2 --entries 500
+    python benchmarks/bench_fingerprint.py --whisper-seconds 6 --repost-rate 0.2
+"""
+import argparse
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+import numpy as np
+
+# Variante -> filtres/options ffmpeg appliqués à l'original
+VARIANTS = {
+    'réencodage AAC 64k': ['-c:a', 'aac', '-b:a', '64k'],
+    'MP3 22 kHz 32k': ['-ac', '1', '-ar', '22050', '-c:a', 'libmp3lame', '-b:a', '32k'],
+    'volume -6 dB': ['-af', 'volume=0.5', '-c:a', 'aac', '-b:a', '96k'],
+    'rognée de 0.7 s': ['-ss', '0.7', '-c:a', 'aac'],
+}
+
+
+def ffmpeg(*args):
+    subprocess.run(['ffmpeg', '-hide_banner', '-loglevel', 'error', '-y', *args], check=True)
+
+
+# Sons tonaux distincts (20 s): aucun ne doit retrouver l'un des autres
+TONAL = {
+    'sinus 440 Hz': 'sine=frequency=440:duration=20',
+    'sinus 660 Hz': 'sine=frequency=660:duration=20',
+    'glissando 200 Hz': "aevalsrc='0.5*sin(2*PI*(200*t+40*t*t))':d=20",
+    'glissando 300 Hz': "aevalsrc='0.5*sin(2*PI*(300*t+30*t*t))':d=20",
+}
+
+
+def make_source(path, seconds, seed):
+    """Bruit rose modulé: spectre large et variable, cas défavorable pour l'empreinte"""
+    ffmpeg('-f', 'lavfi', '-i', f'anoisesrc=color=pink:duration={seconds}:amplitude=0.3:seed={seed}',
+           '-af', 'tremolo=f=3:d=0.8', '-c:a', 'aac', '-b:a', '128k', path)
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--minutes', type=float, default=2, help='durée des audios de test (min)')
+    parser.add_argument('--entries', type=int, default=200, help='taille de l\'index pour la recherche')
+    parser.add_argument('--whisper-seconds', type=float, default=4.0, help='latence Whisper par minute d\'audio (s)')
+    parser.add_argument('--repost-rate', type=float, default=0.1, help='part des requêtes qui sont des reposts')
+    args = parser.parse_args()
+
+    if not shutil.which('ffmpeg'):
+        sys.exit('ffmpeg est requis pour ce benchmark')
+
+    seconds = int(args.minutes * 60)
+    with tempfile.TemporaryDirectory() as folder:
+        os.environ['TRANSCRIPT_CACHE_PATH'] = os.path.join(folder, 'transcripts.db')
+        from audio_fingerprint import FingerprintIndex, fingerprint_file, bit_entropy, SAMPLE_RATE, HOP_SIZE
+
+        original = os.path.join(folder, 'original.m4a')
+        other = os.path.join(folder, 'other.m4a')
+        make_source(original, seconds, seed=1)
+        make_source(other, seconds, seed=2)
+        variants = {}
+        for name, options in VARIANTS.items():
+            variants[name] = os.path.join(folder, f'variant{len(variants)}.{"mp3" if "libmp3lame" in options else "m4a"}')
+            if options[0] == '-ss':
+                ffmpeg(options[0], options[1], '-i', original, *options[2:], variants[name])
+            else:
+                ffmpeg('-i', original, *options, variants[name])
+
+        # Coût de l'empreinte (moyenne sur 3 passes, décodage inclus)
+        timings = []
+        for _ in range(3):
+            start = time.perf_counter()
+            hashes, usable, duration = fingerprint_file(original)
+            timings.append(time.perf_counter() - start)
+        cost = min(timings)
+        print(f'audio de {args.minutes:g} min: {len(hashes)} sous-empreintes ({len(hashes) * 4 / 1024:.1f} Kio), '
+              f'{cost * 1000:.0f} ms soit {cost / args.minutes * 1000:.0f} ms par minute d\'audio')
+
+        # Index peuplé d'empreintes aléatoires de même durée (pire cas pour le filtre de durée)
+        index = FingerprintIndex(db_path=os.path.join(folder, 'index.db'), max_entries=0, ttl=0)
+        rng = np.random.default_rng(0)
+        for n in range(args.entries):
+            noise = rng.integers(0, 2 ** 32, size=len(hashes), dtype=np.uint32)
+            index.add(noise, np.ones(len(noise), dtype=bool), duration + rng.uniform(-3, 3), f'bruit {n}')
+        index.add(hashes, usable, duration, 'original', 'french', 'original', args.whisper_seconds * args.minutes)
+
+        print(f'\n{"variante":<22} {"trouvée":>8} {"BER":>7} {"recherche":>10}')
+        lookups = []
+        unexpected = 0
+        for name, path in list(variants.items()) + [('audio différent', other)]:
+            query = fingerprint_file(path)
+            start = time.perf_counter()
+            match = index.lookup(*query)
+            lookups.append(time.perf_counter() - start)
+            found = bool(match and match['transcript'] == 'original')
+            expected = name != 'audio différent'
+            flag = '' if found == expected else '  <- inattendu'
+            unexpected += found != expected
+            print(f'{name:<22} {"oui" if found else "non":>8} {match["ber"] if match else "-":>7} '
+                  f'{lookups[-1] * 1000:8.1f} ms{flag}')
+
+        lookup = sum(lookups) / len(lookups)
+        per_request = cost + lookup
+        saved = args.repost_rate * args.whisper_seconds * args.minutes
+        print(f'\nindex de {args.entries + 1} empreintes, recherche moyenne {lookup * 1000:.1f} ms '
+              f'(fenêtre d\'alignement {SAMPLE_RATE / HOP_SIZE:.1f} trames/s)')
+        print(f'coût par requête {per_request * 1000:.0f} ms, Whisper évité par requête '
+              f'{saved * 1000:.0f} ms (reposts {args.repost_rate:.0%}, Whisper {args.whisper_seconds:g} s/min): '
+              f'{"rentable" if saved > per_request else "non rentable"} '
+              f'(seuil de rentabilité: {per_request / (args.whisper_seconds * args.minutes):.1%} de reposts)')
+
+        # Faux positifs: chaque son tonal est indexé puis cherché parmi les autres, avec le filtre
+        # d'entropie puis sans (seuls l'alignement et le seuil de BER protègent alors)
+        from config import Config
+        tonal = {}
+        for name, source in TONAL.items():
+            path = os.path.join(folder, f'tonal{len(tonal)}.m4a')
+            ffmpeg('-f', 'lavfi', '-i', source, '-c:a', 'aac', path)
+            tonal[name] = fingerprint_file(path)
+        for min_entropy in (Config.FINGERPRINT_MIN_ENTROPY, 0.0):
+            Config.FINGERPRINT_MIN_ENTROPY = min_entropy
+            tonal_index = FingerprintIndex(db_path=os.path.join(folder, f'tonal{min_entropy}.db'), max_entries=0, ttl=0)
+            for name, query in tonal.items():
+                tonal_index.add(*query, name)
+            print(f'\n{"son tonal":<22} {"entropie":>8} {"retrouve":>18}   (entropie minimale {min_entropy:g})')
+            for name, query in tonal.items():
+                match = tonal_index.lookup(*query)
+                wrong = bool(match and match['transcript'] != name)
+                unexpected += wrong
+                print(f'{name:<22} {bit_entropy(query[0], query[1]):8.2f} '
+                      f'{match["transcript"] if match else "-":>18}{"  <- faux positif" if wrong else ""}')
+
+    if unexpected:
+        sys.exit(f'{unexpected} résultat(s) inattendu(s)')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,194 @@
+"""
+Benchmark: téléchargement segmenté (plages d'octets / segments HLS en parallèle) vs flux unique.
+
+Un serveur HTTP local sert un MP4 factice (requêtes Range acceptées) et une playlist HLS
+découpée en segments, avec un débit plafonné par connexion (--throttle) pour reproduire
+un CDN qui limite chaque flux. Mesure:
+- le débit en flux unique (1 connexion) puis avec --connections connexions
+- la reprise: une première tentative coupée par le serveur au milieu du fichier,
+  puis une seconde qui repart du manifeste (octets retéléchargés affichés)
+Le contenu de chaque fichier obtenu est vérifié (SHA-256).
+
+Usage:
+    python benchmarks/bench_segmented_download.py --size 32 --throttle 2 --connections 1 4 8
+"""
+import argparse
+import hashlib
+import os
+import re
+import sys
+import tempfile
+import threading
+import time
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from segmented_download import SegmentedDownloader
+
+RANGE_RE = re.compile(r'bytes=(\d+)-(\d*)')
+HLS_SEGMENTS = 16
+
+
+class FixtureHandler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+    payload = b''
+    bytes_per_second = 0
+    # Coupe la connexion après ce nombre d'octets servis au total (0 = jamais)
+    fail_after = 0
+    served = 0
+    lock = threading.Lock()
+
+    def _body_for_path(self):
+        if self.path.startswith('/media.mp4'):
+            return self.payload, 'video/mp4'
+        if self.path.startswith('/master.m3u8'):
+            body = '#EXTM3U\n#EXT-X-STREAM-INF:BANDWIDTH=800000\nvideo.m3u8\n#EXT-X-STREAM-INF:BANDWIDTH=400000\nvideo.m3u8\n'
+            return body.encode(), 'application/vnd.apple.mpegurl'
+        if self.path.startswith('/video.m3u8'):
+            lines = ['#EXTM3U', '#EXT-X-TARGETDURATION:6']
+            for i in range(HLS_SEGMENTS):
+                lines += ['#EXTINF:6.0,', f'seg{i}.ts?token=abc']
+            lines.append('#EXT-X-ENDLIST')
+            return ('\n'.join(lines) + '\n').encode(), 'application/vnd.apple.mpegurl'
+        match = re.match(r'/seg(\d+)\.ts', self.path)
+        if match:
+            step = -(-len(self.payload) // HLS_SEGMENTS)
+            index = int(match.group(1))
+            return self.payload[index * step:(index + 1) * step], 'video/mp2t'
+        return None, None
+
+    def do_HEAD(self):
+        body, content_type = self._body_for_path()
+        if body is None:
+            self.send_error(404)
+            return
+        self.send_response(200)
+        self.send_header('Content-Type', content_type)
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+
+    def do_GET(self):
+        body, content_type = self._body_for_path()
+        if body is None:
+            self.send_error(404)
+            return
+        match = RANGE_RE.match(self.headers.get('Range', ''))
+        if match:
+            first = int(match.group(1))
+            last = min(int(match.group(2) or len(body) - 1), len(body) - 1)
+            self.send_response(206)
+            self.send_header('Content-Range', f'bytes {first}-{last}/{len(body)}')
+            body = body[first:last + 1]
+        else:
+            self.send_response(200)
+        self.send_header('Content-Type', content_type)
+        self.send_header('Content-Length', str(len(body)))
+        self.send_header('ETag', '"fixture"')
+        self.end_headers()
+        self._write_throttled(body)
+
+    def _write_throttled(self, body):
+        """Débit plafonné par connexion, par blocs de 64 Ko"""
+        start = time.monotonic()
+        sent = 0
+        for offset in range(0, len(body), 64 * 1024):
+            chunk = body[offset:offset + 64 * 1024]
+            with FixtureHandler.lock:
+                FixtureHandler.served += len(chunk)
+                broken = self.fail_after and FixtureHandler.served > self.fail_after
+            if broken:
+                self.close_connection = True
+                self.connection.shutdown(2)
+                return
+            self.wfile.write(chunk)
+            sent += len(chunk)
+            if self.bytes_per_second:
+                wait = sent / self.bytes_per_second - (time.monotonic() - start)
+                if wait > 0:
+                    time.sleep(wait)
+
+    def log_message(self, *args):
+        pass
+
+
+class QuietServer(ThreadingHTTPServer):
+    daemon_threads = True
+    request_queue_size = 128
+
+    def handle_error(self, request, client_address):
+        pass
+
+
+def sha256_of(path):
+    with open(path, 'rb') as f:
+        return hashlib.sha256(f.read()).hexdigest()
+
+
+def run(label, downloader, url, folder, expected, resume_key=None):
+    start = time.perf_counter()
+    events = []
+    path = downloader.download(
+        url, os.path.join(folder, 'out.%(ext)s'), resume_key=resume_key,
+        progress=lambda event, data: events.append(data),
+    )
+    elapsed = time.perf_counter() - start
+    ok = sha256_of(path) == expected
+    resumed = events[-1].get('resumed_bytes', 0) if events else 0
+    size = os.path.getsize(path)
+    os.remove(path)
+    print(f'{label:<34} {elapsed:7.2f} s  {size / elapsed / 1e6:7.2f} Mo/s  '
+          f'repris {resumed / 1e6:6.2f} Mo  contenu {"ok" if ok else "DIFFÉRENT"}')
+    return elapsed
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--size', type=int, default=32, help='taille du média (Mo)')
+    parser.add_argument('--throttle', type=float, default=2.0, help='débit par connexion (Mo/s, 0 = illimité)')
+    parser.add_argument('--connections', type=int, nargs='+', default=[1, 4, 8])
+    parser.add_argument('--segment', type=int, default=2, help='taille des plages (Mo)')
+    args = parser.parse_args()
+
+    FixtureHandler.payload = os.urandom(args.size * 1024 * 1024)
+    FixtureHandler.bytes_per_second = int(args.throttle * 1024 * 1024)
+    expected = hashlib.sha256(FixtureHandler.payload).hexdigest()
+    server = QuietServer(('127.0.0.1', 0), FixtureHandler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    base = f'http://127.0.0.1:{server.server_port}'
+    print(f'média {args.size} Mo, {args.throttle} Mo/s par connexion, plages de {args.segment} Mo\n')
+
+    with tempfile.TemporaryDirectory() as folder:
+        partial = os.path.join(folder, 'partial')
+
+        def downloader(connections, retries=3):
+            return SegmentedDownloader(
+                connections=connections, segment_bytes=args.segment * 1024 * 1024,
+                retries=retries, partial_folder=partial,
+            )
+
+        print('MP4 progressif (Range)')
+        for connections in args.connections:
+            run(f'  {connections} connexion(s)', downloader(connections), f'{base}/media.mp4', folder, expected)
+
+        print('HLS (playlist maître -> segments)')
+        for connections in args.connections:
+            run(f'  {connections} connexion(s)', downloader(connections), f'{base}/master.m3u8', folder, expected)
+
+        print('Reprise après coupure (MP4, 4 connexions)')
+        FixtureHandler.served = 0
+        FixtureHandler.fail_after = len(FixtureHandler.payload) // 2
+        start = time.perf_counter()
+        try:
+            downloader(4, retries=0).download(f'{base}/media.mp4', os.path.join(folder, 'out.%(ext)s'), resume_key='resume')
+            print('  la coupure n\'a pas eu lieu')
+        except Exception as e:
+            print(f'  1re tentative échouée après {time.perf_counter() - start:.2f} s: {e}')
+        FixtureHandler.fail_after = 0
+        run('  2e tentative (manifeste)', downloader(4), f'{base}/media.mp4', folder, expected, resume_key='resume')
+
+    server.shutdown()
+
+
+if __name__ == '__main__':
+    main()
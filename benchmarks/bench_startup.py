@@ -0,0 +1,161 @@
+"""
+Benchmark du démarrage à froid d'un worker.
+
+Mesure, sur --runs démarrages de processus neufs:
+- le temps d'import de l'application (`import app`, dans le processus) et les modules
+  les plus coûteux à l'import (python -X importtime)
+- le temps entre le lancement du serveur (gunicorn comme sur Render, ou uvicorn asgi:app)
+  et la première réponse 200 de /health, puis de /ready (fin du préchauffage)
+
+--baseline REV mesure aussi une révision git antérieure (extraite par git archive)
+pour comparer, par exemple avant le chargement paresseux des dépendances.
+
+Usage:
+    python benchmarks/bench_startup.py --runs 5
+    python benchmarks/bench_startup.py --server uvicorn --baseline HEAD~1
+"""
+import argparse
+import os
+import socket
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+import urllib.error
+import urllib.request
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+IMPORT_SNIPPET = 'import time; t = time.perf_counter(); import app; print(time.perf_counter() - t)'
+
+
+def environment(folder):
+    """Environnement du worker: bases SQLite temporaires, backend OpenAI par défaut (aucun appel émis)"""
+    return dict(
+        os.environ,
+        TRANSCRIPTION_BACKEND=os.environ.get('TRANSCRIPTION_BACKEND', 'openai'),
+        OPENAI_API_KEY=os.environ.get('OPENAI_API_KEY', 'sk-bench'),
+        TRANSCRIPT_CACHE_PATH=os.path.join(folder, 'cache.db'),
+        TRANSCRIPT_INDEX_PATH=os.path.join(folder, 'search.db'),
+        JOBS_DB_PATH=os.path.join(folder, 'jobs.db'),
+        PYTHONDONTWRITEBYTECODE='1',
+    )
+
+
+def import_seconds(source, env):
+    output = subprocess.run([sys.executable, '-c', IMPORT_SNIPPET], cwd=source, env=env,
+                            capture_output=True, text=True, check=True).stdout
+    return float(output.strip().splitlines()[-1])
+
+
+def heaviest_imports(source, env, count=8):
+    """Modules de premier niveau importés par app, triés par coût cumulé (µs)"""
+    stderr = subprocess.run([sys.executable, '-X', 'importtime', '-c', 'import app'], cwd=source, env=env,
+                            capture_output=True, text=True, check=True).stderr
+    rows = []
+    for line in stderr.splitlines():
+        if not line.startswith('import time:') or 'cumulative' in line:
+            continue
+        _, cumulative, name = line[len('import time:'):].split('|')
+        # Un niveau d'indentation sous app: dépendances directes de l'application
+        if name.startswith('   ') and not name.startswith('    '):
+            rows.append((int(cumulative), name.strip()))
+    return sorted(rows, reverse=True)[:count]
+
+
+def free_port():
+    with socket.socket() as sock:
+        sock.bind(('127.0.0.1', 0))
+        return sock.getsockname()[1]
+
+
+def wait_for(url, start, deadline):
+    """Interroge `url` jusqu'à une réponse 200, retourne le délai depuis `start` (None si jamais)"""
+    while time.monotonic() < deadline:
+        try:
+            with urllib.request.urlopen(url, timeout=1) as response:
+                if response.status == 200:
+                    return time.monotonic() - start
+        except (urllib.error.URLError, ConnectionError, OSError):
+            pass
+        time.sleep(0.01)
+    return None
+
+
+def server_startup(source, env, server, timeout):
+    port = free_port()
+    if server == 'gunicorn':
+        command = [sys.executable, '-m', 'gunicorn', '-w', '1', '-k', 'gthread', '--threads', '8',
+                   '-b', f'127.0.0.1:{port}', 'app:app']
+    else:
+        command = [sys.executable, '-m', 'uvicorn', 'asgi:app', '--host', '127.0.0.1', '--port', str(port)]
+    start = time.monotonic()
+    process = subprocess.Popen(command, cwd=source, env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    try:
+        deadline = start + timeout
+        health = wait_for(f'http://127.0.0.1:{port}/health', start, deadline)
+        # Révision sans /ready: seul /health est mesuré
+        ready = None
+        if health is not None and has_ready(port):
+            ready = wait_for(f'http://127.0.0.1:{port}/ready', start, deadline)
+        return health, ready
+    finally:
+        process.terminate()
+        try:
+            process.wait(timeout=10)
+        except subprocess.TimeoutExpired:
+            process.kill()
+
+
+def has_ready(port):
+    try:
+        urllib.request.urlopen(f'http://127.0.0.1:{port}/ready', timeout=1)
+        return True
+    except urllib.error.HTTPError as e:
+        return e.code != 404
+    except Exception:
+        return False
+
+
+def summarize(values):
+    values = [v for v in values if v is not None]
+    if not values:
+        return '      -'
+    return f'{statistics.median(values) * 1000:7.0f} ms (min {min(values) * 1000:.0f})'
+
+
+def measure(label, source, args):
+    with tempfile.TemporaryDirectory() as folder:
+        env = environment(folder)
+        imports = [import_seconds(source, env) for _ in range(args.runs)]
+        startups = [server_startup(source, env, args.server, args.timeout) for _ in range(args.runs)]
+        heaviest = heaviest_imports(source, env)
+
+    print(f'{label}')
+    print(f'  import app                {summarize(imports)}')
+    print(f'  1re réponse /health       {summarize([health for health, _ in startups])}')
+    print(f'  /ready (préchauffage)     {summarize([ready for _, ready in startups])}')
+    print('  imports les plus coûteux: ' + ', '.join(f'{name} {us / 1000:.0f} ms' for us, name in heaviest))
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--runs', type=int, default=5)
+    parser.add_argument('--server', choices=('gunicorn', 'uvicorn'), default='gunicorn')
+    parser.add_argument('--timeout', type=float, default=60, help='attente maximale du serveur (s)')
+    parser.add_argument('--baseline', help='révision git à comparer (ex: HEAD~1)')
+    args = parser.parse_args()
+
+    print(f'{args.runs} démarrage(s), serveur {args.server}\n')
+    measure('arbre de travail', ROOT, args)
+    if args.baseline:
+        with tempfile.TemporaryDirectory() as source:
+            archive = subprocess.run(['git', 'archive', args.baseline], cwd=ROOT, capture_output=True, check=True).stdout
+            subprocess.run(['tar', '-x', '-C', source], input=archive, check=True)
+            print()
+            measure(f'révision {args.baseline}', source, args)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,117 @@
+"""
+Benchmark: préparation audio pour Whisper, ancien pipeline (MP3 192 kbps via
+FFmpegExtractAudio) vs nouveau (flux audio seul + remux sans ré-encodage).
+
+Les médias de test sont générés localement avec ffmpeg puis servis par un serveur
+HTTP local (extracteur générique yt-dlp). Pour chaque plateforme on mesure les
+octets téléchargés, la taille envoyée à l'API et le temps total.
+
+Usage:
+    python benchmarks/bench_transcription_audio.py --duration 120
+"""
+import argparse
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from functools import partial
+from http.server import ThreadingHTTPServer, SimpleHTTPRequestHandler
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from media_extraction import extract_and_download, download_for_transcription
+
+# Flux retenus par chaque sélecteur de format, par plateforme:
+# Instagram et TikTok n'exposent en pratique que des flux muxés, Vimeo expose un flux audio DASH
+PLATFORMS = {
+    'Instagram': {'legacy': 'muxed.mp4', 'optimized': 'muxed.mp4'},
+    'TikTok': {'legacy': 'muxed.mp4', 'optimized': 'muxed.mp4'},
+    'Vimeo': {'legacy': 'audio.m4a', 'optimized': 'audio.m4a'},
+}
+
+LEGACY_POSTPROCESSORS = [{
+    'key': 'FFmpegExtractAudio',
+    'preferredcodec': 'mp3',
+    'preferredquality': '192',
+}]
+
+
+class QuietHandler(SimpleHTTPRequestHandler):
+    def log_message(self, *args):
+        pass
+
+
+class QuietServer(ThreadingHTTPServer):
+    def handle_error(self, request, client_address):
+        # La sonde de l'extracteur générique interrompt volontairement certaines réponses
+        pass
+
+
+def make_fixtures(folder, duration):
+    """Génère un MP4 muxé (H.264 + AAC) et un flux audio seul (AAC/M4A)"""
+    common = ['ffmpeg', '-hide_banner', '-loglevel', 'error', '-y']
+    subprocess.run(common + [
+        '-f', 'lavfi', '-i', f'sine=frequency=440:duration={duration}',
+        '-f', 'lavfi', '-i', f'testsrc=duration={duration}:size=640x360:rate=25',
+        '-c:v', 'libx264', '-preset', 'ultrafast', '-c:a', 'aac', '-b:a', '128k', '-shortest',
+        os.path.join(folder, 'muxed.mp4'),
+    ], check=True)
+    subprocess.run(common + [
+        '-f', 'lavfi', '-i', f'sine=frequency=440:duration={duration}',
+        '-c:a', 'aac', '-b:a', '128k',
+        os.path.join(folder, 'audio.m4a'),
+    ], check=True)
+
+
+def run_legacy(opts, url):
+    opts = dict(opts, format='best', postprocessors=LEGACY_POSTPROCESSORS)
+    _, path = extract_and_download(opts, url)
+    return path
+
+
+def run_optimized(opts, url):
+    return download_for_transcription(opts, url)
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--duration', type=int, default=120, help='durée des médias de test (s)')
+    args = parser.parse_args()
+
+    if not shutil.which('ffmpeg'):
+        sys.exit('ffmpeg est requis pour ce benchmark')
+
+    with tempfile.TemporaryDirectory() as fixtures, tempfile.TemporaryDirectory() as out:
+        make_fixtures(fixtures, args.duration)
+        server = QuietServer(('127.0.0.1', 0), partial(QuietHandler, directory=fixtures))
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+        base_url = f'http://127.0.0.1:{server.server_port}'
+
+        print(f'{"plateforme":<10} {"mode":<10} {"téléchargé":>12} {"envoyé":>12} {"temps":>10}')
+        for platform, fixtures_by_mode in PLATFORMS.items():
+            for mode, runner in (('legacy', run_legacy), ('optimized', run_optimized)):
+                fixture = fixtures_by_mode[mode]
+                opts = {
+                    'quiet': True,
+                    'no_warnings': True,
+                    'noprogress': True,
+                    'force_generic_extractor': True,
+                    'overwrites': True,
+                    'outtmpl': os.path.join(out, f'{platform}-{mode}.%(ext)s'),
+                }
+                start = time.perf_counter()
+                path = runner(opts, f'{base_url}/{fixture}')
+                elapsed = time.perf_counter() - start
+                downloaded = os.path.getsize(os.path.join(fixtures, fixture))
+                uploaded = os.path.getsize(path)
+                print(f'{platform:<10} {mode:<10} {downloaded / 1024:9.0f} KiB {uploaded / 1024:9.0f} KiB {elapsed * 1000:7.0f} ms')
+                os.remove(path)
+
+        server.shutdown()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,102 @@
+"""
+Benchmark: backends de transcription, API OpenAI vs modèle local (faster-whisper int8, CPU).
+
+Pour chaque backend on mesure, sur un audio de test généré avec ffmpeg:
+- la latence d'un fichier seul, ramenée à la minute d'audio
+- le débit sous concurrence: minutes d'audio transcrites par minute réelle
+
+Le backend OpenAI est dirigé vers le faux endpoint de bench_end_to_end (latence
+configurable), sauf avec --real-openai (clé OPENAI_API_KEY requise). Le backend
+local est ignoré si faster-whisper n'est pas installé.
+
+Usage:
+    python benchmarks/bench_transcription_backends.py --minutes 2 --concurrency 4
+    LOCAL_WHISPER_MODEL=base python benchmarks/bench_transcription_backends.py --backends local
+"""
+import argparse
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.dirname(BENCH_DIR))
+sys.path.insert(0, BENCH_DIR)
+
+from bench_end_to_end import FakeWhisperHandler, QuietServer, start_server
+
+
+def make_fixture(folder, minutes):
+    """Audio mono 16 kHz (bruit rose modulé, plus réaliste qu'une sinusoïde pour le décodeur)"""
+    path = os.path.join(folder, 'speech.m4a')
+    subprocess.run([
+        'ffmpeg', '-hide_banner', '-loglevel', 'error', '-y',
+        '-f', 'lavfi', '-i', f'anoisesrc=color=pink:duration={minutes * 60}:amplitude=0.3',
+        '-af', 'tremolo=f=3:d=0.8', '-ac', '1', '-ar', '16000', '-c:a', 'aac', '-b:a', '48k',
+        path,
+    ], check=True)
+    return path
+
+
+def measure(name, backend, path, minutes, concurrency):
+    from transcriber import AudioTranscriber
+
+    transcriber = AudioTranscriber(backend=backend)
+    # Échauffement: chargement du modèle local, premières connexions
+    transcriber.transcribe_with_language_detection(path)
+
+    start = time.perf_counter()
+    transcriber.transcribe_with_language_detection(path)
+    single = time.perf_counter() - start
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        list(pool.map(lambda _: transcriber.transcribe_with_language_detection(path), range(concurrency)))
+    wall = time.perf_counter() - start
+
+    print(
+        f'{name:<10} {single / minutes:8.2f} s/min d\'audio (fichier seul)  '
+        f'{minutes * concurrency / (wall / 60):8.1f} min d\'audio/min (c={concurrency})'
+    )
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--minutes', type=float, default=2, help='durée de l\'audio de test (min)')
+    parser.add_argument('--concurrency', type=int, default=4)
+    parser.add_argument('--backends', default='openai,local')
+    parser.add_argument('--whisper-latency', type=float, default=1.0, help='latence du faux endpoint OpenAI (s)')
+    parser.add_argument('--real-openai', action='store_true', help='utilise la vraie API OpenAI')
+    args = parser.parse_args()
+
+    if not shutil.which('ffmpeg'):
+        sys.exit('ffmpeg est requis pour ce benchmark')
+
+    with tempfile.TemporaryDirectory() as folder:
+        path = make_fixture(folder, args.minutes)
+        if not args.real_openai:
+            FakeWhisperHandler.latency = args.whisper_latency
+            os.environ['OPENAI_BASE_URL'] = f'{start_server(QuietServer(("127.0.0.1", 0), FakeWhisperHandler))}/v1'
+            os.environ.setdefault('OPENAI_API_KEY', 'sk-bench')
+
+        from config import Config
+        Config.OPENAI_API_KEY = os.environ.get('OPENAI_API_KEY', '')
+        from transcriber import OpenAIWhisperBackend, LocalWhisperBackend
+
+        print(f'audio de {args.minutes:g} min, modèle local {Config.LOCAL_WHISPER_MODEL} '
+              f'({Config.LOCAL_WHISPER_COMPUTE_TYPE}), OpenAI {"réel" if args.real_openai else "simulé"}')
+        for name in args.backends.split(','):
+            if name == 'openai':
+                measure('openai', OpenAIWhisperBackend(), path, args.minutes, args.concurrency)
+            elif name == 'local':
+                if not LocalWhisperBackend.available():
+                    print('local      ignoré: faster-whisper non installé (pip install faster-whisper)')
+                    continue
+                measure('local', LocalWhisperBackend(), path, args.minutes, args.concurrency)
+
+
+if __name__ == '__main__':
+    main()
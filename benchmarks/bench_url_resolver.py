@@ -0,0 +1,164 @@
+"""
+Microbenchmark: résolution d'URL (analyse unique + aiguillage par hôte, motifs précompilés)
+vs validateurs séquentiels historiques (chaque plateforme testée tour à tour, motifs
+recompilés à chaque appel, extraction de l'identifiant par une seconde recherche).
+
+Mesure:
+- le coût par URL (µs) sur un corpus mêlant Instagram, TikTok, Vimeo et URLs refusées,
+  après vérification que les deux implémentations s'accordent sur plateforme et identifiant
+- les liens courts: résolution à froid (une redirection HTTP vers un serveur local,
+  --latency ms de délai) puis servie depuis le cache, et coalescence de --concurrency
+  requêtes simultanées sur le même lien (requêtes amont comptées)
+
+Usage:
+    python benchmarks/bench_url_resolver.py --iterations 20000 --latency 80 --concurrency 32
+"""
+import argparse
+import os
+import re
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+from urllib.parse import urlsplit
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import url_resolver
+from http_client import get_session
+
+CORPUS = [
+    'https://www.instagram.com/p/C1a2B3c4D5e/',
+    'https://www.instagram.com/reel/C9zYxWvUtSr/?igsh=abc',
+    'https://instagram.com/some.user/reels/Cq1w2e3r4t5/',
+    'https://www.tiktok.com/@some.user/video/7301234567890123456?is_from_webapp=1',
+    'https://vm.tiktok.com/ZMNabc123/',
+    'https://www.tiktok.com/t/ZPRxyz789/',
+    'https://vimeo.com/76979871',
+    'https://vimeo.com/channels/staffpicks/76979871',
+    'https://player.vimeo.com/video/76979871?h=abc',
+    'https://vimeo.com/ondemand/film/123456789',
+    'https://www.youtube.com/watch?v=dQw4w9WgXcQ',
+    'https://evil.example/?next=https://www.instagram.com/p/abc/',
+    'not a url',
+]
+
+
+# --- Implémentation historique (validateurs séquentiels), reproduite pour comparaison ---
+
+def legacy_resolve(url):
+    if any(host in url for host in ['www.instagram.com', 'instagram.com']):
+        match = re.search(r'instagram\.com/(?:[\w.]+/)?(?:p|reels?|tv)/([\w-]+)', url)
+        return 'Instagram', match.group(1) if match else ''
+    tiktok_patterns = [
+        r'https?://(?:www\.)?tiktok\.com/@[\w.-]+/video/\d+',
+        r'https?://(?:vm|vt)\.tiktok\.com/[\w]+',
+        r'https?://(?:www\.)?tiktok\.com/t/[\w]+',
+    ]
+    if any(re.match(pattern, url) for pattern in tiktok_patterns):
+        match = re.search(r'/video/(\d+)', url)
+        if match:
+            return 'TikTok', match.group(1)
+        match = re.search(r'(?:(?:vm|vt)\.tiktok\.com|tiktok\.com/t)/([\w]+)', url)
+        return 'TikTok', f'short-{match.group(1)}' if match else ''
+    vimeo_patterns = [
+        r'https?://(?:www\.)?vimeo\.com/\d+',
+        r'https?://(?:www\.)?vimeo\.com/channels/[\w-]+/\d+',
+        r'https?://player\.vimeo\.com/video/\d+',
+        r'https?://(?:www\.)?vimeo\.com/ondemand/[\w-]+/\d+',
+    ]
+    if any(re.match(p, url) for p in vimeo_patterns):
+        match = re.search(r'(?:vimeo\.com/(?:.*?/)?(\d+)|player\.vimeo\.com/video/(\d+))', url)
+        return 'Vimeo', (match.group(1) or match.group(2)) if match else ''
+    return None, None
+
+
+def resolver_resolve(url):
+    resolved = url_resolver.parse_url(url)
+    return (resolved.platform, resolved.canonical_id) if resolved else (None, None)
+
+
+def per_call_us(resolve, iterations):
+    start = time.perf_counter()
+    for _ in range(iterations):
+        for url in CORPUS:
+            resolve(url)
+    return (time.perf_counter() - start) / (iterations * len(CORPUS)) * 1e6
+
+
+# --- Liens courts: serveur local qui redirige vers l'URL complète ---
+
+class RedirectHandler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+    latency = 0.0
+    hits = 0
+    lock = threading.Lock()
+
+    def do_HEAD(self):
+        with RedirectHandler.lock:
+            RedirectHandler.hits += 1
+        time.sleep(self.latency)
+        code = self.path.strip('/')
+        self.send_response(301)
+        self.send_header('Location', f'https://www.tiktok.com/@bench/video/{abs(hash(code)) % 10 ** 18}')
+        self.send_header('Content-Length', '0')
+        self.end_headers()
+
+    def log_message(self, *args):
+        pass
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--iterations', type=int, default=20000)
+    parser.add_argument('--latency', type=float, default=80, help='délai de la redirection (ms)')
+    parser.add_argument('--concurrency', type=int, default=32)
+    parser.add_argument('--links', type=int, default=20, help='liens courts distincts')
+    args = parser.parse_args()
+
+    for url in CORPUS:
+        legacy, new = legacy_resolve(url), resolver_resolve(url)
+        flag = '' if legacy == new else f'   <- ancien: {legacy[0]}'
+        print(f'{url[:62]:<62} {str(new[0]):<9} {str(new[1]):<22}{flag}')
+    print()
+
+    legacy_us = per_call_us(legacy_resolve, args.iterations)
+    new_us = per_call_us(resolver_resolve, args.iterations)
+    print(f'validateurs séquentiels  {legacy_us:7.2f} µs/URL')
+    print(f'résolveur (hôte -> dict) {new_us:7.2f} µs/URL   x{legacy_us / new_us:.1f}\n')
+
+    RedirectHandler.latency = args.latency / 1000
+    server = ThreadingHTTPServer(('127.0.0.1', 0), RedirectHandler)
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    base = f'http://127.0.0.1:{server.server_port}'
+
+    # Redirection servie par le serveur local au lieu de vm.tiktok.com (Location lue sans la suivre)
+    def follow_local(url):
+        response = get_session().head(base + urlsplit(url).path, allow_redirects=False, timeout=5)
+        return url_resolver.parse_url(response.headers['Location'])
+
+    url_resolver._follow_short_link = follow_local
+    links = [f'https://vm.tiktok.com/ZM{n:05d}/' for n in range(args.links)]
+
+    for label in ('à froid (redirection)', 'depuis le cache'):
+        start = time.perf_counter()
+        keys = {url_resolver.resolve_url(link).key for link in links}
+        elapsed = (time.perf_counter() - start) / len(links) * 1e6
+        print(f'lien court {label:<24} {elapsed:10.1f} µs/lien  ({len(keys)} clés canoniques)')
+
+    RedirectHandler.hits = 0
+    link = 'https://vm.tiktok.com/ZMshared/'
+    with ThreadPoolExecutor(args.concurrency) as pool:
+        start = time.perf_counter()
+        keys = set(pool.map(lambda _: url_resolver.resolve_url(link).key, range(args.concurrency)))
+        elapsed = time.perf_counter() - start
+    print(f'{args.concurrency} requêtes simultanées, même lien: {elapsed * 1000:.0f} ms, '
+          f'{RedirectHandler.hits} requête(s) amont, {len(keys)} clé(s)')
+
+    server.shutdown()
+
+
+if __name__ == '__main__':
+    main()
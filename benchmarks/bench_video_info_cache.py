@@ -0,0 +1,96 @@
+"""
+Benchmark du cache de métadonnées vidéo (/info et contrôle de durée avant /transcribe).
+
+Mesure:
+- la latence d'une extraction simulée (--latency ms) puis servie depuis le cache
+- la non-régression du cache négatif: les messages d'erreur réels des extracteurs sont
+  classés (lien mort ou erreur transitoire); une panne amont (503, 429, limitation de
+  débit, connexion requise) ne doit jamais être mise en cache comme lien mort, un 404 ou
+  une vidéo supprimée doit l'être (code de sortie 1 sinon)
+
+Usage:
+    python benchmarks/bench_video_info_cache.py --latency 800 --lookups 10000
+"""
+import argparse
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from video_info_cache import VideoInfoCache, DeadLinkError, is_dead_link
+
+# Message d'erreur -> lien mort attendu
+MESSAGES = {
+    'ERROR: [Instagram] C1a2B3c4D5e: Unable to download webpage: HTTP Error 503: Service Unavailable': False,
+    'ERROR: [Instagram] C1a2B3c4D5e: Requested content is not available, rate-limit reached or login '
+    'required. Use --cookies, --cookies-from-browser, --username and --password, --netrc-cmd, or --netrc '
+    '(instagram) to provide account credentials': False,
+    'ERROR: [TikTok] 7301234567890123456: Unable to download webpage: HTTP Error 429: Too Many Requests': False,
+    'ERROR: [vimeo] 76979871: Unable to download JSON metadata: HTTP Error 500: Internal Server Error': False,
+    'ERROR: [generic] Unable to download webpage: <urlopen error timed out>': False,
+    'ERROR: [vimeo] 76979871: Unable to download webpage: HTTP Error 404: Not Found': True,
+    'ERROR: [TikTok] 7301234567890123456: Unable to download webpage: HTTP Error 410: Gone': True,
+    'ERROR: [TikTok] 7301234567890123456: Video not available, status code 10204': True,
+    'ERROR: [vimeo] 76979871: This video is private': True,
+    'ERROR: [vimeo] 76979871: Video unavailable': True,
+}
+
+
+def check_classification():
+    """Classe chaque message et vérifie le cache négatif; retourne le nombre d'écarts"""
+    unexpected = 0
+    for message, dead in MESSAGES.items():
+        cache = VideoInfoCache(ttl=60, negative_ttl=300, max_entries=10)
+        loads = []
+
+        def loader():
+            loads.append(1)
+            raise Exception(message)
+
+        for _ in range(2):
+            try:
+                cache.get('clé', loader)
+            except DeadLinkError:
+                pass
+            except Exception:
+                pass
+        # Lien mort: une seule extraction, la seconde est servie depuis le cache négatif
+        negative = len(loads) == 1
+        ok = is_dead_link(message) == dead and negative == dead
+        unexpected += not ok
+        label = 'lien mort  ' if dead else 'transitoire'
+        print(f'  {label} {"ok " if ok else "ÉCHEC"} {message[:90]}')
+    return unexpected
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--latency', type=float, default=800, help='durée simulée d\'une extraction (ms)')
+    parser.add_argument('--lookups', type=int, default=10000)
+    args = parser.parse_args()
+
+    cache = VideoInfoCache(ttl=600, negative_ttl=300, max_entries=1000)
+    info = {'title': 'Test', 'duration': 42}
+
+    def loader():
+        time.sleep(args.latency / 1000)
+        return info
+
+    start = time.perf_counter()
+    cache.get('clé', loader)
+    cold = time.perf_counter() - start
+    start = time.perf_counter()
+    for _ in range(args.lookups):
+        cache.get('clé', loader)
+    warm = (time.perf_counter() - start) / args.lookups
+    print(f'extraction {cold * 1000:8.1f} ms   servie depuis le cache {warm * 1e6:6.2f} µs\n')
+
+    print('Classement des erreurs (cache négatif):')
+    unexpected = check_classification()
+    if unexpected:
+        sys.exit(f'{unexpected} résultat(s) inattendu(s)')
+
+
+if __name__ == '__main__':
+    main()
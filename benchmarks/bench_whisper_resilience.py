@@ -0,0 +1,224 @@
+"""
+Benchmark de la résilience des appels Whisper face à un amont dégradé.
+
+Un faux endpoint OpenAI (/v1/audio/transcriptions) injecte des pannes; le vrai client
+OpenAI de OpenAIWhisperBackend y est dirigé via OPENAI_BASE_URL. Chaque scénario est
+mesuré avec la politique désactivée (aucune nouvelle tentative, disjoncteur et doublement
+coupés, comme avant) puis activée:
+
+- erreurs:  une partie des réponses sont des 503 (ou 429 avec Retry-After)
+- latence:  une partie des réponses sont très lentes (queue de latence)
+- panne:    l'amont ne répond plus que par des 500 après un délai
+- blocage:  l'amont ne répond jamais dans le délai de lecture
+
+Rapporte le taux de succès, p50/p95/p99, le nombre d'appels reçus par l'amont et les
+événements de résilience (retry, hedge, rejected...).
+
+Usage:
+    python benchmarks/bench_whisper_resilience.py --calls 200 --concurrency 8
+    python benchmarks/bench_whisper_resilience.py --scenario latence --mode async
+"""
+import argparse
+import asyncio
+import json
+import os
+import random
+import sys
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+# Scénario -> comportement de l'amont (probabilités par appel) et réglages du client
+SCENARIOS = {
+    'erreurs': {'latency': 0.05, 'error_rate': 0.3, 'error_status': 503},
+    'quota': {'latency': 0.05, 'error_rate': 0.3, 'error_status': 429, 'retry_after': 0.2},
+    'latence': {'latency': 0.05, 'slow_rate': 0.03, 'slow_latency': 0.8},
+    'panne': {'latency': 0.3, 'error_rate': 1.0, 'error_status': 500},
+    'blocage': {'latency': 0.05, 'hang_rate': 0.2, 'hang_latency': 5.0},
+}
+
+# Politique désactivée (comportement antérieur) puis activée
+POLICIES = {
+    'sans': {'WHISPER_RETRIES': 0, 'WHISPER_CIRCUIT_FAILURES': 0, 'WHISPER_HEDGE_ENABLED': False},
+    'avec': {'WHISPER_RETRIES': 2, 'WHISPER_CIRCUIT_FAILURES': 5, 'WHISPER_HEDGE_ENABLED': True},
+}
+
+
+class StubWhisperHandler(BaseHTTPRequestHandler):
+    """Faux endpoint de transcription OpenAI avec injection de délais et d'erreurs"""
+    behaviour = {}
+    calls = 0
+    lock = threading.Lock()
+    rng = random.Random(0)
+
+    def do_POST(self):
+        self.rfile.read(int(self.headers.get('Content-Length') or 0))
+        behaviour = StubWhisperHandler.behaviour
+        with StubWhisperHandler.lock:
+            StubWhisperHandler.calls += 1
+            draw = StubWhisperHandler.rng.random()
+
+        if draw < behaviour.get('hang_rate', 0):
+            time.sleep(behaviour['hang_latency'])
+        elif draw < behaviour.get('slow_rate', 0):
+            time.sleep(behaviour['slow_latency'])
+        else:
+            time.sleep(behaviour['latency'])
+
+        if draw < behaviour.get('error_rate', 0):
+            payload = json.dumps({'error': {'message': 'amont indisponible', 'type': 'server_error'}}).encode()
+            self.send_response(behaviour['error_status'])
+            if 'retry_after' in behaviour:
+                self.send_header('Retry-After', str(behaviour['retry_after']))
+        else:
+            payload = json.dumps({
+                'task': 'transcribe',
+                'text': 'Transcription de test',
+                'language': 'french',
+                'duration': 1.0,
+                'segments': [{'id': 0, 'start': 0.0, 'end': 1.0, 'text': 'Transcription de test'}],
+            }).encode()
+            self.send_response(200)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(payload)))
+        self.end_headers()
+        try:
+            self.wfile.write(payload)
+        except (BrokenPipeError, ConnectionResetError):
+            # Client parti (délai de lecture dépassé, requête doublée annulée)
+            pass
+
+    def log_message(self, *args):
+        pass
+
+
+class QuietServer(ThreadingHTTPServer):
+    daemon_threads = True
+
+    def handle_error(self, request, client_address):
+        pass
+
+
+def percentile(values, fraction):
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    return ordered[min(int(fraction * len(ordered)), len(ordered) - 1)]
+
+
+def make_backend(policy, scenario):
+    """Backend OpenAI neuf (disjoncteur et latences remis à zéro) configuré pour la politique"""
+    from config import Config
+    from transcriber import OpenAIWhisperBackend
+
+    for name, value in POLICIES[policy].items():
+        setattr(Config, name, value)
+    # Délai de lecture court: le scénario 'blocage' n'attend pas 120 s par appel
+    Config.WHISPER_READ_TIMEOUT = 1.0
+    Config.WHISPER_RETRY_BASE_DELAY = 0.05
+    Config.WHISPER_RETRY_MAX_DELAY = 1.0
+    Config.WHISPER_CIRCUIT_RESET_SECONDS = 2.0
+    Config.WHISPER_HEDGE_MIN_SECONDS = 0.1
+    return OpenAIWhisperBackend()
+
+
+def run_sync(backend, audio_path, calls, concurrency):
+    def one(_):
+        start = time.perf_counter()
+        try:
+            backend.transcribe(audio_path)
+            return True, time.perf_counter() - start
+        except Exception:
+            return False, time.perf_counter() - start
+
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        return list(pool.map(one, range(calls)))
+
+
+def run_async(backend, audio_path, calls, concurrency):
+    async def main():
+        limit = asyncio.Semaphore(concurrency)
+
+        async def one():
+            async with limit:
+                start = time.perf_counter()
+                try:
+                    await backend.atranscribe(audio_path)
+                    return True, time.perf_counter() - start
+                except Exception:
+                    return False, time.perf_counter() - start
+
+        return await asyncio.gather(*[one() for _ in range(calls)])
+
+    return asyncio.run(main())
+
+
+def measure(scenario, policy, audio_path, args):
+    import metrics
+
+    StubWhisperHandler.behaviour = SCENARIOS[scenario]
+    StubWhisperHandler.rng = random.Random(args.seed)
+    StubWhisperHandler.calls = 0
+    backend = make_backend(policy, scenario)
+    before = {event: metrics.resilience_events.total(service='whisper', event=event)
+              for event in ('retry', 'hedge', 'hedge_won', 'opened', 'rejected')}
+
+    start = time.perf_counter()
+    runner = run_async if args.mode == 'async' else run_sync
+    outcomes = runner(backend, audio_path, args.calls, args.concurrency)
+    elapsed = time.perf_counter() - start
+
+    latencies = [seconds for ok, seconds in outcomes if ok]
+    failures = [seconds for ok, seconds in outcomes if not ok]
+    events = {
+        event: int(metrics.resilience_events.total(service='whisper', event=event) - count)
+        for event, count in before.items()
+    }
+    print(
+        f'{scenario:8s} {policy:5s} succès {len(latencies):4d}/{len(outcomes):<4d} '
+        f'p50 {percentile(latencies, 0.50) * 1000:7.0f} ms  p95 {percentile(latencies, 0.95) * 1000:7.0f} ms  '
+        f'p99 {percentile(latencies, 0.99) * 1000:7.0f} ms  échec moyen '
+        f'{(sum(failures) / len(failures) if failures else 0) * 1000:6.0f} ms  '
+        f'appels amont {StubWhisperHandler.calls:4d}  durée {elapsed:5.1f} s'
+    )
+    print('               ' + ', '.join(f'{event} {count}' for event, count in events.items()))
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--calls', type=int, default=120)
+    parser.add_argument('--concurrency', type=int, default=8)
+    parser.add_argument('--scenario', choices=tuple(SCENARIOS) + ('tous',), default='tous')
+    parser.add_argument('--mode', choices=('sync', 'async'), default='sync',
+                        help='client synchrone (threads gunicorn) ou asynchrone (serveur ASGI)')
+    parser.add_argument('--seed', type=int, default=1)
+    args = parser.parse_args()
+
+    server = QuietServer(('127.0.0.1', 0), StubWhisperHandler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    os.environ.update({
+        'OPENAI_API_KEY': 'sk-bench',
+        'OPENAI_BASE_URL': f'http://127.0.0.1:{server.server_port}/v1',
+    })
+
+    with tempfile.TemporaryDirectory() as folder:
+        # Le contenu n'est pas décodé par le faux endpoint: seul l'envoi compte
+        audio_path = os.path.join(folder, 'audio.mp3')
+        with open(audio_path, 'wb') as audio_file:
+            audio_file.write(os.urandom(256 * 1024))
+
+        print(f'{args.calls} appels, concurrence {args.concurrency}, client {args.mode}\n')
+        scenarios = SCENARIOS if args.scenario == 'tous' else [args.scenario]
+        for scenario in scenarios:
+            for policy in POLICIES:
+                measure(scenario, policy, audio_path, args)
+    server.shutdown()
+
+
+if __name__ == '__main__':
+    main()
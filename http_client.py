@@ -0,0 +1,34 @@
+import threading
+from config import Config
+
+_session = None
+_session_lock = threading.Lock()
+
+
+def get_session():
+    """
+    Session HTTP partagée (keep-alive) avec un pool de connexions par hôte,
+    pour éviter une nouvelle connexion TLS à chaque requête.
+    """
+    global _session
+    if _session is None:
+        with _session_lock:
+            if _session is None:
+                # Import différé: requests n'est chargé qu'au premier appel HTTP ou au préchauffage
+                import requests
+                from requests.adapters import HTTPAdapter
+
+                session = requests.Session()
+                adapter = HTTPAdapter(
+                    pool_connections=Config.HTTP_POOL_HOSTS,
+                    pool_maxsize=Config.HTTP_POOL_SIZE_PER_HOST,
+                )
+                session.mount('https://', adapter)
+                session.mount('http://', adapter)
+                if getattr(Config, 'HTTP_PROXY_URL', ''):
+                    session.proxies = {
+                        'http': Config.HTTP_PROXY_URL,
+                        'https': Config.HTTP_PROXY_URL,
+                    }
+                _session = session
+    return _session
@@ -1,139 +1,109 @@
 import os
-import yt_dlp
 from config import Config
+from url_resolver import parse_url
+from media_extraction import extract_and_download, download_for_transcription, resolve_direct_media, extract_video_info
+from workspace import workspaces, work_outtmpl
+from metrics import timed
 
 class InstagramDownloader:
     def __init__(self):
         self.download_folder = Config.DOWNLOAD_FOLDER
         os.makedirs(self.download_folder, exist_ok=True)
         
-    def download_video(self, url):
+    def _build_ydl_opts(self, work_dir=None):
         """
-        Télécharge une vidéo Instagram et retourne le chemin du fichier audio extrait
+        Options yt-dlp communes (en-têtes, cookie de session et proxy optionnels).
+        `work_dir`: dossier de travail isolé de la requête (sortie déterministe)
         """
-        try:
-            # Configuration pour yt-dlp avec extraction audio
-            # Prépare cookies/headers pour Instagram si session fournie
-            cookies = None
-            if getattr(Config, 'INSTAGRAM_SESSIONID', ''):
-                cookies = {
-                    'sessionid': Config.INSTAGRAM_SESSIONID
-                }
-
-            ydl_opts = {
-                'format': 'best[ext=mp4]',  # Meilleur format MP4 disponible
-                'outtmpl': f'{self.download_folder}/%(title)s.%(ext)s',
-                'extractaudio': True,
-                'audioformat': 'mp3',
-                'http_headers': {
-                    'User-Agent': 'Mozilla/5.0 (Macintosh; Intel Mac OS X 10_15_7) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/120.0.0.0 Safari/537.36',
-                    'Accept-Language': 'fr-FR,fr;q=0.9,en;q=0.8',
-                    'Referer': 'https://www.instagram.com/'
-                },
-                'cookies': cookies,
-                # Proxy optionnel
-                'proxy': getattr(Config, 'HTTP_PROXY_URL', '') or None,
-                'postprocessors': [{
-                    'key': 'FFmpegExtractAudio',
-                    'preferredcodec': 'mp3',
-                    'preferredquality': '192',
-                }],
+        # Prépare cookies/headers pour Instagram si session fournie
+        cookies = None
+        if getattr(Config, 'INSTAGRAM_SESSIONID', ''):
+            cookies = {
+                'sessionid': Config.INSTAGRAM_SESSIONID
             }
-            
-            with yt_dlp.YoutubeDL(ydl_opts) as ydl:
-                # Récupère les informations de la vidéo
-                info = ydl.extract_info(url, download=False)
-                video_title = info.get('title', 'instagram_video')
-                
-                # Télécharge la vidéo
-                ydl.download([url])
-                
-                # Retourne le chemin du fichier audio
-                audio_path = f'{self.download_folder}/{video_title}.mp3'
-                
-                # Si le fichier audio n'existe pas, essaie avec le fichier vidéo
-                if not os.path.exists(audio_path):
-                    video_path = f'{self.download_folder}/{video_title}.mp4'
-                    if os.path.exists(video_path):
-                        return video_path
-                    else:
-                        # Cherche le premier fichier dans le dossier de téléchargement
-                        files = [f for f in os.listdir(self.download_folder) if f.endswith(('.mp4', '.mp3'))]
-                        if files:
-                            return os.path.join(self.download_folder, files[-1])
-                
-                return audio_path
+
+        return {
+            'outtmpl': work_outtmpl(work_dir) if work_dir else f'{self.download_folder}/%(title)s.%(ext)s',
+            'http_headers': {
+                'User-Agent': 'Mozilla/5.0 (Macintosh; Intel Mac OS X 10_15_7) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/120.0.0.0 Safari/537.36',
+                'Accept-Language': 'fr-FR,fr;q=0.9,en;q=0.8',
+                'Referer': 'https://www.instagram.com/'
+            },
+            'cookies': cookies,
+            # Proxy optionnel
+            'proxy': getattr(Config, 'HTTP_PROXY_URL', '') or None,
+        }
+        
+    @timed('audio_fetch', platform='Instagram')
+    def download_video(self, url, progress=None):
+        """
+        Télécharge l'audio d'une vidéo Instagram et retourne le chemin du fichier prêt pour Whisper
+        """
+        try:
+            # Flux audio seul si disponible, remux sans ré-encodage quand c'est possible
+            with workspaces.scratch('instagram') as work_dir:
+                return download_for_transcription(self._build_ydl_opts(work_dir), url, progress=progress)
                 
         except Exception as e:
             raise Exception(f"Erreur lors du téléchargement: {str(e)}")
     
+    @timed('video_fetch', platform='Instagram')
     def download_video_only(self, url):
         """
         Télécharge une vidéo Instagram en gardant le format vidéo original
         """
         try:
             # Configuration pour yt-dlp sans extraction audio
-            # Prépare cookies/headers pour Instagram si session fournie
-            cookies = None
-            if getattr(Config, 'INSTAGRAM_SESSIONID', ''):
-                cookies = {
-                    'sessionid': Config.INSTAGRAM_SESSIONID
-                }
-
-            ydl_opts = {
-                'format': 'best[ext=mp4]/best',  # Meilleur format MP4 ou meilleur format disponible
-                'outtmpl': f'{self.download_folder}/%(title)s.%(ext)s',
-                'http_headers': {
-                    'User-Agent': 'Mozilla/5.0 (Macintosh; Intel Mac OS X 10_15_7) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/120.0.0.0 Safari/537.36',
-                    'Accept-Language': 'fr-FR,fr;q=0.9,en;q=0.8',
-                    'Referer': 'https://www.instagram.com/'
-                },
-                'cookies': cookies,
-                'proxy': getattr(Config, 'HTTP_PROXY_URL', '') or None,
-                # Pas d'extraction audio
-            }
-            
-            with yt_dlp.YoutubeDL(ydl_opts) as ydl:
-                # Récupère les informations de la vidéo
-                info = ydl.extract_info(url, download=False)
-                video_title = info.get('title', 'instagram_video')
-                
-                # Télécharge la vidéo
-                ydl.download([url])
-                
-                # Retourne le chemin du fichier vidéo
-                video_path = f'{self.download_folder}/{video_title}.mp4'
-                
-                # Si le fichier MP4 n'existe pas, cherche d'autres formats
-                if not os.path.exists(video_path):
-                    # Cherche tous les fichiers vidéo dans le dossier
-                    video_extensions = ['.mp4', '.avi', '.mov', '.mkv', '.webm']
-                    files = [f for f in os.listdir(self.download_folder) 
-                            if any(f.endswith(ext) for ext in video_extensions)]
-                    if files:
-                        # Prend le fichier le plus récent
-                        latest_file = max(files, key=lambda f: os.path.getctime(os.path.join(self.download_folder, f)))
-                        return os.path.join(self.download_folder, latest_file)
+            with workspaces.scratch('instagram') as work_dir:
+                ydl_opts = self._build_ydl_opts(work_dir)
+                ydl_opts['format'] = 'best[ext=mp4]/best'  # Meilleur format MP4 ou meilleur format disponible
                 
+                # Un seul passage yt-dlp: métadonnées + téléchargement
+                _, video_path = extract_and_download(ydl_opts, url)
                 return video_path
                 
         except Exception as e:
             raise Exception(f"Erreur lors du téléchargement vidéo: {str(e)}")
     
+    def get_direct_media(self, url):
+        """
+        Résout l'URL directe du flux vidéo progressif (None si une fusion est nécessaire)
+        """
+        try:
+            return resolve_direct_media(self._build_ydl_opts(), url)
+        except Exception:
+            return None
+    
+    @timed('info', platform='Instagram')
+    def get_video_info(self, url):
+        """
+        Récupère les informations d'une vidéo Instagram sans la télécharger
+        """
+        try:
+            return extract_video_info(self._build_ydl_opts(), url)
+        except Exception as e:
+            raise Exception(f"Erreur lors de la récupération des infos Instagram: {str(e)}")
+    
     def validate_instagram_url(self, url):
         """
         Valide si l'URL est une URL Instagram valide
         """
-        return any(host in url for host in Config.ALLOWED_HOSTS)
+        resolved = parse_url(url)
+        return resolved is not None and resolved.platform == 'Instagram'
+    
+    def extract_video_id(self, url):
+        """
+        Extrait le shortcode de la publication Instagram ('' si introuvable)
+        """
+        resolved = parse_url(url)
+        return resolved.canonical_id if resolved and resolved.platform == 'Instagram' else ''
     
     def cleanup_downloads(self):
         """
-        Nettoie les fichiers téléchargés
+        Nettoie les fichiers téléchargés orphelins (les dossiers de travail
+        des requêtes en cours sont épargnés)
         """
         try:
-            for filename in os.listdir(self.download_folder):
-                file_path = os.path.join(self.download_folder, filename)
-                if os.path.isfile(file_path):
-                    os.unlink(file_path)
+            workspaces.sweep()
         except Exception as e:
             print(f"Erreur lors du nettoyage: {str(e)}") 
\ No newline at end of file
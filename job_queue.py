@@ -0,0 +1,192 @@
+import os
+import contextvars
+import ipaddress
+import json
+import socket
+import sqlite3
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from urllib.parse import urlsplit
+from config import Config
+from http_client import get_session
+
+
+def check_webhook_url(webhook_url):
+    """
+    Vérifie qu'un webhook fourni par le client désigne un hôte public en http(s):
+    les adresses internes (localhost, réseau privé, métadonnées cloud 169.254.169.254...)
+    sont refusées pour que le serveur ne puisse pas être utilisé contre son propre réseau.
+    Lève ValueError sinon.
+    """
+    if not isinstance(webhook_url, str):
+        raise ValueError("webhook_url doit être une URL http(s)")
+    try:
+        parts = urlsplit(webhook_url)
+        port = parts.port
+    except ValueError:
+        raise ValueError("webhook_url invalide")
+    if parts.scheme not in ('http', 'https') or not parts.hostname:
+        raise ValueError("webhook_url doit être une URL http(s)")
+    try:
+        addresses = socket.getaddrinfo(parts.hostname, port or (443 if parts.scheme == 'https' else 80),
+                                       proto=socket.IPPROTO_TCP)
+    except (socket.gaierror, UnicodeError):
+        raise ValueError(f"Hôte du webhook introuvable: {parts.hostname}")
+    for address in addresses:
+        # %: portée d'une adresse IPv6 de lien local
+        ip = ipaddress.ip_address(address[4][0].split('%')[0])
+        if not ip.is_global:
+            raise ValueError(f"Hôte du webhook non public: {parts.hostname}")
+
+
+class JobQueue:
+    """
+    File de traitements asynchrones persistée en SQLite.
+
+    Chaque job exécute `runner(url)` (qui retourne un couple (payload, status_code))
+    sur un pool de threads borné. L'état survit à un redémarrage : les jobs encore
+    en attente ou en cours sont relancés à l'initialisation.
+    """
+
+    QUEUED = 'queued'
+    RUNNING = 'running'
+    DONE = 'done'
+    FAILED = 'failed'
+
+    def __init__(self, runner, db_path=None, max_workers=None, retention=None):
+        self.runner = runner
+        self.db_path = db_path or Config.JOBS_DB_PATH
+        self.retention = Config.JOB_RETENTION if retention is None else retention
+        self._lock = threading.Lock()
+        self._executor = ThreadPoolExecutor(
+            max_workers=max_workers or Config.JOB_WORKERS,
+            thread_name_prefix='job'
+        )
+
+        folder = os.path.dirname(self.db_path)
+        if folder:
+            os.makedirs(folder, exist_ok=True)
+
+        self._conn = sqlite3.connect(self.db_path, check_same_thread=False, isolation_level=None)
+        self._conn.execute('PRAGMA journal_mode=WAL')
+        self._conn.execute(
+            'CREATE TABLE IF NOT EXISTS jobs ('
+            ' id TEXT PRIMARY KEY,'
+            ' url TEXT NOT NULL,'
+            ' status TEXT NOT NULL,'
+            ' result TEXT,'
+            ' error TEXT,'
+            ' webhook_url TEXT,'
+            ' created_at REAL NOT NULL,'
+            ' updated_at REAL NOT NULL'
+            ')'
+        )
+        self._resume()
+
+    def submit(self, url, webhook_url=None):
+        """
+        Enregistre un nouveau job et le planifie, retourne son identifiant
+        """
+        job_id = uuid.uuid4().hex
+        now = time.time()
+        with self._lock:
+            self._prune(now)
+            self._conn.execute(
+                'INSERT INTO jobs (id, url, status, webhook_url, created_at, updated_at) VALUES (?, ?, ?, ?, ?, ?)',
+                (job_id, url, self.QUEUED, webhook_url, now, now)
+            )
+        # Contexte de la requête: le job reste attribué à son client dans les files équitables
+        self._executor.submit(contextvars.copy_context().run, self._run, job_id)
+        return job_id
+
+    def get(self, job_id):
+        """
+        Retourne l'état d'un job sous forme de dict, ou None s'il est inconnu
+        """
+        with self._lock:
+            row = self._conn.execute(
+                'SELECT id, url, status, result, error, created_at, updated_at FROM jobs WHERE id = ?',
+                (job_id,)
+            ).fetchone()
+        if row is None:
+            return None
+        return {
+            'job_id': row[0],
+            'url': row[1],
+            'status': row[2],
+            'result': json.loads(row[3]) if row[3] else None,
+            'error': row[4],
+            'created_at': row[5],
+            'updated_at': row[6],
+        }
+
+    def _update(self, job_id, status, result=None, error=None):
+        with self._lock:
+            self._conn.execute(
+                'UPDATE jobs SET status = ?, result = ?, error = ?, updated_at = ? WHERE id = ?',
+                (status, json.dumps(result) if result is not None else None, error, time.time(), job_id)
+            )
+
+    def counts(self):
+        """
+        Nombre de jobs en attente et en cours, par statut
+        """
+        with self._lock:
+            rows = self._conn.execute(
+                'SELECT status, COUNT(*) FROM jobs WHERE status IN (?, ?) GROUP BY status',
+                (self.QUEUED, self.RUNNING)
+            ).fetchall()
+        counts = {self.QUEUED: 0, self.RUNNING: 0}
+        counts.update(dict(rows))
+        return counts
+
+    def _run(self, job_id):
+        """Exécute le pipeline d'un job puis notifie le webhook éventuel"""
+        with self._lock:
+            row = self._conn.execute('SELECT url, webhook_url FROM jobs WHERE id = ?', (job_id,)).fetchone()
+        if row is None:
+            return
+        url, webhook_url = row
+
+        self._update(job_id, self.RUNNING)
+        try:
+            payload, status_code = self.runner(url)
+            if status_code < 400 and payload.get('success'):
+                self._update(job_id, self.DONE, result=payload)
+            else:
+                self._update(job_id, self.FAILED, result=payload, error=payload.get('error'))
+        except Exception as e:
+            self._update(job_id, self.FAILED, error=f'Erreur générale: {str(e)}')
+
+        if webhook_url:
+            self._notify(webhook_url, self.get(job_id))
+
+    def _notify(self, webhook_url, job):
+        """Envoie l'état final du job au webhook (les erreurs sont ignorées)"""
+        try:
+            # Nouvelle vérification: la résolution DNS a pu changer depuis la soumission;
+            # pas de redirection, qui pourrait mener vers une adresse interne
+            check_webhook_url(webhook_url)
+            get_session().post(webhook_url, json=job, timeout=Config.JOB_WEBHOOK_TIMEOUT, allow_redirects=False)
+        except Exception as e:
+            print(f"Erreur lors de l'appel du webhook {webhook_url}: {str(e)}")
+
+    def _resume(self):
+        """Replanifie les jobs interrompus par un redémarrage du processus"""
+        with self._lock:
+            rows = self._conn.execute(
+                'SELECT id FROM jobs WHERE status IN (?, ?) ORDER BY created_at',
+                (self.QUEUED, self.RUNNING)
+            ).fetchall()
+        for (job_id,) in rows:
+            self._executor.submit(self._run, job_id)
+
+    def _prune(self, now):
+        """Supprime les jobs terminés plus anciens que la durée de rétention"""
+        if self.retention:
+            self._conn.execute(
+                'DELETE FROM jobs WHERE status IN (?, ?) AND updated_at < ?',
+                (self.DONE, self.FAILED, now - self.retention)
+            )
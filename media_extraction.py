@@ -0,0 +1,285 @@
+import copy
+import os
+import threading
+import time
+from config import Config
+from ydl_pool import ydl_pool
+from admission import stage
+import metrics
+
+# Sélection orientée transcription: flux audio seul d'abord, sinon le plus petit flux muxé avec audio
+TRANSCRIPTION_FORMAT = 'bestaudio[ext=m4a]/bestaudio[ext=webm]/bestaudio/worst[acodec!=none]/best'
+
+# Flux progressif unique (audio + vidéo, HTTP simple) relayable sans fusion ffmpeg
+DIRECT_FORMAT = (
+    'best[ext=mp4][protocol^=http][protocol!*=dash][vcodec!=?none][acodec!=?none]'
+    '/best[protocol^=http][protocol!*=dash][vcodec!=?none][acodec!=?none]'
+)
+
+# Métadonnées brutes (extracteur seul) d'une URL dont le flux n'est pas relayable, reprises une fois
+# par le repli disque: url -> (expiration, info dict)
+_handoff_lock = threading.Lock()
+_handoff = {}
+
+# Conteneurs acceptés tels quels par l'API Whisper
+WHISPER_AUDIO_EXTS = ('flac', 'm4a', 'mp3', 'mpeg', 'mpga', 'oga', 'ogg', 'wav', 'webm')
+
+# Codec audio source -> conteneur audio cible pour un remux sans ré-encodage
+REMUX_CONTAINERS = {
+    'aac': 'm4a',
+    'mp3': 'mp3',
+    'opus': 'ogg',
+    'vorbis': 'ogg',
+    'flac': 'flac',
+}
+
+
+def extract_and_download(ydl_opts, url):
+    """
+    Extraction des métadonnées et téléchargement en un seul passage yt-dlp.
+
+    Les métriques distinguent la durée du téléchargement (progress hook yt-dlp)
+    du reste du passage (extraction des métadonnées).
+
+    Returns:
+        tuple: (info dict yt-dlp, chemin du fichier final après post-traitement)
+    """
+    downloads = []
+
+    def record_download(status):
+        if status.get('status') == 'finished':
+            downloads.append((status.get('elapsed') or 0.0, status.get('total_bytes') or status.get('downloaded_bytes') or 0))
+
+    opts = dict(ydl_opts)
+    opts['progress_hooks'] = list(opts.get('progress_hooks') or []) + [record_download]
+    platform = metrics.current_platform()
+    start = time.perf_counter()
+    extracted = _take_extracted(url)
+    try:
+        with ydl_pool.lease(opts) as ydl:
+            if extracted is not None:
+                # Extraction déjà faite par resolve_direct_media: sélection de format et téléchargement seuls
+                info = ydl.process_ie_result(extracted, download=True)
+            else:
+                info = ydl.extract_info(url, download=True)
+            path = get_downloaded_path(info, ydl)
+    except Exception as e:
+        metrics.errors.inc(stage='extraction', platform=platform, error=type(e).__name__)
+        raise
+    finally:
+        download_seconds = sum(elapsed for elapsed, _ in downloads)
+        metrics.stage_duration.observe(max(0.0, time.perf_counter() - start - download_seconds), stage='extraction', platform=platform)
+        if downloads:
+            metrics.stage_duration.observe(download_seconds, stage='download', platform=platform)
+            metrics.download_size.observe(sum(size for _, size in downloads), platform=platform)
+    return info, path
+
+
+def resolve_direct_media(ydl_opts, url):
+    """
+    Résout l'URL directe d'un flux progressif sans rien télécharger.
+
+    Returns:
+        dict: {'url', 'http_headers', 'ext', 'filesize'} ou None si une fusion
+        (flux audio et vidéo séparés) ou un protocole segmenté est nécessaire; les
+        métadonnées extraites sont alors reprises par extract_and_download sur la même URL
+    """
+    opts = dict(ydl_opts)
+    opts['format'] = DIRECT_FORMAT
+    opts.pop('postprocessors', None)
+    with ydl_pool.lease(opts) as ydl:
+        extracted = ydl.extract_info(url, download=False, process=False)
+        try:
+            # Sélection du format sur une copie: le repli disque repart des métadonnées brutes
+            info = ydl.process_ie_result(copy.deepcopy(extracted), download=False)
+        except Exception:
+            # Aucun format progressif ('Requested format is not available')
+            info = {}
+
+    protocol = info.get('protocol') or ''
+    if info.get('requested_formats') or not info.get('url') or protocol not in ('http', 'https'):
+        _keep_extracted(url, extracted)
+        return None
+    return {
+        'url': info['url'],
+        'http_headers': info.get('http_headers') or {},
+        'ext': info.get('ext') or 'mp4',
+        'filesize': info.get('filesize'),
+    }
+
+
+def _keep_extracted(url, info):
+    if Config.DOWNLOAD_PROXY_INFO_TTL <= 0:
+        return
+    now = time.monotonic()
+    with _handoff_lock:
+        # Entrées expirées (repli jamais venu) retirées au passage
+        for key in [key for key, (expires, _) in _handoff.items() if expires <= now]:
+            del _handoff[key]
+        _handoff[url] = (now + Config.DOWNLOAD_PROXY_INFO_TTL, info)
+
+
+def _take_extracted(url):
+    """Métadonnées laissées par resolve_direct_media pour `url` (une seule fois), None sinon"""
+    with _handoff_lock:
+        expires, info = _handoff.pop(url, (0, None))
+    return info if expires > time.monotonic() else None
+
+
+def extract_video_info(ydl_opts, url):
+    """
+    Métadonnées d'une vidéo sans téléchargement ni sélection de format
+    (`process=False`: l'extracteur seul, sans résolution des flux).
+
+    Returns:
+        dict: {'title', 'author', 'duration', 'view_count', 'like_count',
+        'comment_count', 'description', 'upload_date', 'thumbnail'}
+    """
+    opts = dict(ydl_opts)
+    opts['skip_download'] = True
+    opts.pop('postprocessors', None)
+    with ydl_pool.lease(opts) as ydl:
+        info = ydl.extract_info(url, download=False, process=False)
+        # Extracteur qui délègue à une autre URL: résolution complète nécessaire
+        if info.get('_type') in ('url', 'url_transparent'):
+            info = ydl.extract_info(url, download=False)
+
+    return {
+        'title': info.get('title') or 'Sans titre',
+        'author': info.get('uploader') or info.get('channel') or info.get('creator') or 'Inconnu',
+        'duration': info.get('duration') or 0,
+        'view_count': info.get('view_count') or 0,
+        'like_count': info.get('like_count') or 0,
+        'comment_count': info.get('comment_count') or 0,
+        'description': info.get('description') or '',
+        'upload_date': info.get('upload_date') or '',
+        'thumbnail': info.get('thumbnail') or '',
+    }
+
+
+def get_downloaded_path(info, ydl=None):
+    """
+    Retourne le chemin réel du fichier produit, lu depuis l'info dict yt-dlp
+    (`requested_downloads[].filepath` est mis à jour par les post-processeurs).
+    """
+    candidates = []
+    for download in reversed(info.get('requested_downloads') or []):
+        candidates.append(download.get('filepath'))
+    candidates.append(info.get('filepath'))
+    candidates.append(info.get('_filename'))
+    if ydl is not None:
+        candidates.append(ydl.prepare_filename(info))
+
+    for path in candidates:
+        if path and os.path.exists(path):
+            return path
+
+    raise Exception('Fichier introuvable après téléchargement')
+
+
+def _normalize_acodec(acodec):
+    """Ramène un codec yt-dlp/ffprobe ('mp4a.40.2', 'aac', 'opus'...) à une clé de REMUX_CONTAINERS"""
+    acodec = (acodec or '').lower()
+    if acodec.startswith('mp4a') or acodec == 'aac':
+        return 'aac'
+    if acodec in ('mp3', 'mp3float'):
+        return 'mp3'
+    return acodec.split('.')[0]
+
+
+def make_progress_hook(progress, min_interval=0.5):
+    """
+    Adapte un callback `progress(événement, données)` en progress_hook yt-dlp,
+    limité à un événement toutes les `min_interval` secondes (plus l'événement final).
+    """
+    last_emit = [0.0]
+
+    def hook(status):
+        now = time.monotonic()
+        finished = status.get('status') == 'finished'
+        if not finished and now - last_emit[0] < min_interval:
+            return
+        last_emit[0] = now
+        downloaded = status.get('downloaded_bytes') or 0
+        total = status.get('total_bytes') or status.get('total_bytes_estimate') or 0
+        progress('download', {
+            'status': status.get('status'),
+            'downloaded_bytes': downloaded,
+            'total_bytes': total,
+            'percent': round(downloaded * 100 / total, 1) if total else None,
+            'speed': status.get('speed'),
+        })
+
+    return hook
+
+
+@metrics.timed('postprocess')
+@stage('ffmpeg')
+def prepare_for_transcription(info, path, progress=None):
+    """
+    Rend le fichier téléchargé acceptable par Whisper avec le moins de travail possible:
+    - flux audio seul dans un conteneur accepté: renvoyé tel quel
+    - codec audio connu: remux sans ré-encodage (-c:a copy)
+    - sinon: ré-encodage mono basse résolution (Config.TRANSCRIPTION_SAMPLE_RATE / _AUDIO_BITRATE)
+
+    Returns:
+        str: Chemin du fichier audio à envoyer à Whisper
+    """
+    fmt = (info.get('requested_downloads') or [info])[-1]
+    ext = os.path.splitext(path)[1].lstrip('.').lower()
+    if fmt.get('vcodec') == 'none' and ext in WHISPER_AUDIO_EXTS:
+        if progress:
+            progress('extracted', {'mode': 'direct', 'bytes': os.path.getsize(path)})
+        return path
+
+    from yt_dlp.postprocessor.ffmpeg import FFmpegPostProcessor
+
+    ffmpeg = FFmpegPostProcessor()
+    acodec = _normalize_acodec(fmt.get('acodec') if fmt.get('acodec') != 'none' else None)
+    if acodec not in REMUX_CONTAINERS:
+        acodec = _normalize_acodec(ffmpeg.get_audio_codec(path))
+
+    base = os.path.splitext(path)[0]
+    out_path = None
+    mode = 'remux'
+    if acodec in REMUX_CONTAINERS:
+        out_path = f'{base}.audio.{REMUX_CONTAINERS[acodec]}'
+        try:
+            ffmpeg.run_ffmpeg(path, out_path, ['-vn', '-c:a', 'copy'])
+        except Exception:
+            out_path = None
+
+    if out_path is None:
+        mode = 'transcode'
+        metrics.count_fallback('transcode')
+        # Ré-encodage inévitable: mono 16 kHz basse résolution, suffisant pour Whisper
+        out_path = f'{base}.audio.mp3'
+        ffmpeg.run_ffmpeg(path, out_path, [
+            '-vn',
+            '-ac', '1',
+            '-ar', str(Config.TRANSCRIPTION_SAMPLE_RATE),
+            '-c:a', 'libmp3lame',
+            '-b:a', Config.TRANSCRIPTION_AUDIO_BITRATE,
+        ])
+
+    try:
+        os.remove(path)
+    except OSError:
+        pass
+    if progress:
+        progress('extracted', {'mode': mode, 'bytes': os.path.getsize(out_path)})
+    return out_path
+
+
+def download_for_transcription(ydl_opts, url, progress=None):
+    """
+    Télécharge le flux le plus léger exploitable par Whisper puis le prépare
+    (remux ou ré-encodage minimal). Retourne le chemin du fichier audio.
+    """
+    opts = dict(ydl_opts)
+    opts['format'] = TRANSCRIPTION_FORMAT
+    opts.pop('postprocessors', None)
+    if progress:
+        opts['progress_hooks'] = list(opts.get('progress_hooks') or []) + [make_progress_hook(progress)]
+    info, path = extract_and_download(opts, url)
+    return prepare_for_transcription(info, path, progress=progress)
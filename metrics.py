@@ -0,0 +1,249 @@
+import contextvars
+import math
+import threading
+import time
+from contextlib import ContextDecorator, contextmanager
+
+# Bornes des histogrammes (secondes / octets)
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120, 300)
+SIZE_BUCKETS = (64 * 1024, 256 * 1024, 1024 ** 2, 4 * 1024 ** 2, 16 * 1024 ** 2, 64 * 1024 ** 2, 256 * 1024 ** 2, 1024 ** 3)
+
+# Plateforme de la requête en cours (propagée aux pools via contextvars.copy_context)
+_current_platform = contextvars.ContextVar('platform', default='unknown')
+
+
+def _format_labels(labels):
+    if not labels:
+        return ''
+    parts = []
+    for name, value in labels:
+        value = str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+        parts.append(f'{name}="{value}"')
+    return '{' + ','.join(parts) + '}'
+
+
+def _format_value(value):
+    if value == math.inf:
+        return '+Inf'
+    if float(value).is_integer():
+        return str(int(value))
+    return repr(float(value))
+
+
+class _Metric:
+    kind = None
+
+    def __init__(self, registry, name, help_text, labelnames=()):
+        self.name = name
+        self.help = help_text
+        self.labelnames = tuple(labelnames)
+        self._lock = threading.Lock()
+        self._values = {}
+        registry.register(self)
+
+    def _key(self, labels):
+        return tuple((name, labels.get(name, '')) for name in self.labelnames)
+
+    def header(self):
+        return [f'# HELP {self.name} {self.help}', f'# TYPE {self.name} {self.kind}']
+
+
+class Counter(_Metric):
+    kind = 'counter'
+
+    def inc(self, amount=1, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def total(self, **labels):
+        """Somme des valeurs dont les labels correspondent à ceux fournis"""
+        wanted = set(labels.items())
+        with self._lock:
+            return sum(value for key, value in self._values.items() if wanted <= set(key))
+
+    def render(self):
+        with self._lock:
+            values = sorted(self._values.items())
+        return [f'{self.name}{_format_labels(key)} {_format_value(value)}' for key, value in values]
+
+
+class Gauge(_Metric):
+    """Jauge évaluée à la lecture: `fn()` retourne une valeur ou un dict {labels (tuple): valeur}"""
+    kind = 'gauge'
+
+    def __init__(self, registry, name, help_text, fn, labelnames=()):
+        super().__init__(registry, name, help_text, labelnames)
+        self.fn = fn
+
+    def render(self):
+        try:
+            value = self.fn()
+        except Exception:
+            return []
+        if isinstance(value, dict):
+            return [
+                f'{self.name}{_format_labels(zip(self.labelnames, key))} {_format_value(item)}'
+                for key, item in sorted(value.items())
+            ]
+        return [f'{self.name} {_format_value(value)}']
+
+
+class Histogram(_Metric):
+    kind = 'histogram'
+
+    def __init__(self, registry, name, help_text, labelnames=(), buckets=LATENCY_BUCKETS):
+        super().__init__(registry, name, help_text, labelnames)
+        self.buckets = tuple(buckets) + (math.inf,)
+
+    def observe(self, value, **labels):
+        key = self._key(labels)
+        with self._lock:
+            state = self._values.get(key)
+            if state is None:
+                state = self._values[key] = [[0] * len(self.buckets), 0.0, 0]
+            for index, bound in enumerate(self.buckets):
+                if value <= bound:
+                    state[0][index] += 1
+                    break
+            state[1] += value
+            state[2] += 1
+
+    def render(self):
+        with self._lock:
+            values = sorted((key, (list(state[0]), state[1], state[2])) for key, state in self._values.items())
+        lines = []
+        for key, (counts, total, count) in values:
+            cumulative = 0
+            for bound, bucket_count in zip(self.buckets, counts):
+                cumulative += bucket_count
+                labels = key + (('le', _format_value(bound)),)
+                lines.append(f'{self.name}_bucket{_format_labels(labels)} {cumulative}')
+            lines.append(f'{self.name}_sum{_format_labels(key)} {_format_value(total)}')
+            lines.append(f'{self.name}_count{_format_labels(key)} {count}')
+        return lines
+
+
+class Registry:
+    """Ensemble des métriques exposées au format texte Prometheus"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._metrics = []
+
+    def register(self, metric):
+        with self._lock:
+            self._metrics.append(metric)
+
+    def render(self):
+        with self._lock:
+            metrics = list(self._metrics)
+        lines = []
+        for metric in metrics:
+            lines.extend(metric.header())
+            lines.extend(metric.render())
+        return '\n'.join(lines) + '\n'
+
+
+registry = Registry()
+
+stage_duration = Histogram(
+    registry, 'pipeline_stage_duration_seconds',
+    'Durée de chaque étape du pipeline', ('stage', 'platform')
+)
+download_size = Histogram(
+    registry, 'download_size_bytes',
+    'Taille des fichiers téléchargés', ('platform',), buckets=SIZE_BUCKETS
+)
+cache_requests = Counter(
+    registry, 'transcript_cache_requests_total',
+    'Consultations du cache des transcriptions', ('platform', 'result')
+)
+errors = Counter(
+    registry, 'pipeline_errors_total',
+    'Erreurs par étape et par classe d\'exception', ('stage', 'platform', 'error')
+)
+fallbacks = Counter(
+    registry, 'pipeline_fallbacks_total',
+    'Recours à un chemin de repli', ('fallback', 'platform')
+)
+
+fingerprint_lookups = Counter(
+    registry, 'fingerprint_lookups_total',
+    'Recherches dans l\'index des empreintes audio', ('platform', 'result')
+)
+fingerprint_seconds = Counter(
+    registry, 'fingerprint_seconds_total',
+    'Temps passé à calculer et rechercher les empreintes audio', ('platform',)
+)
+whisper_seconds_saved = Counter(
+    registry, 'fingerprint_whisper_seconds_saved_total',
+    'Latence Whisper évitée grâce aux empreintes audio', ('platform',)
+)
+
+admission_decisions = Counter(
+    registry, 'admission_decisions_total',
+    'Décisions d\'admission des requêtes (admitted, rate_limited, queue_full, timeout, evicted)', ('result',)
+)
+
+resilience_events = Counter(
+    registry, 'upstream_resilience_events_total',
+    'Événements de résilience des appels amont (retry, hedge, hedge_won, opened, rejected)', ('service', 'event')
+)
+
+
+def current_platform():
+    return _current_platform.get()
+
+
+@contextmanager
+def platform(name):
+    """Associe les mesures du bloc (et des tâches soumises via copy_context) à une plateforme"""
+    token = _current_platform.set(name or 'unknown')
+    try:
+        yield
+    finally:
+        _current_platform.reset(token)
+
+
+class timed(ContextDecorator):
+    """
+    Mesure la durée d'une étape (context manager ou décorateur) dans
+    pipeline_stage_duration_seconds; une exception incrémente pipeline_errors_total.
+
+        with timed('whisper'):
+            ...
+
+        @timed('postprocess')
+        def prepare(...):
+            ...
+    """
+
+    def __init__(self, stage, platform=None):
+        self.stage = stage
+        self.platform = platform
+        self._local = threading.local()
+
+    def __enter__(self):
+        starts = getattr(self._local, 'starts', None)
+        if starts is None:
+            starts = self._local.starts = []
+        starts.append(time.perf_counter())
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        elapsed = time.perf_counter() - self._local.starts.pop()
+        platform_label = self.platform or current_platform()
+        stage_duration.observe(elapsed, stage=self.stage, platform=platform_label)
+        if exc_type is not None and issubclass(exc_type, Exception):
+            errors.inc(stage=self.stage, platform=platform_label, error=exc_type.__name__)
+        return False
+
+
+def count_fallback(name, platform=None):
+    fallbacks.inc(fallback=name, platform=platform or current_platform())
+
+
+def gauge(name, help_text, fn, labelnames=()):
+    """Déclare une jauge calculée au moment de la lecture de /metrics"""
+    return Gauge(registry, name, help_text, fn, labelnames)
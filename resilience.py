@@ -0,0 +1,294 @@
+import asyncio
+import collections
+import contextvars
+import random
+import threading
+import time
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+import metrics
+
+
+class CircuitOpenError(Exception):
+    """Appel refusé sans contacter le service amont: disjoncteur ouvert"""
+
+    def __init__(self, name, retry_in):
+        super().__init__(f"Service {name} indisponible (disjoncteur ouvert, nouvel essai dans {retry_in:.0f} s)")
+        self.retry_in = retry_in
+
+
+class CircuitBreaker:
+    """
+    Disjoncteur d'un service amont. Après `failure_threshold` échecs consécutifs, les appels
+    échouent immédiatement pendant `reset_timeout` secondes (ouvert); un seul appel test passe
+    ensuite (semi-ouvert): son succès referme le disjoncteur, son échec le rouvre.
+    `failure_threshold` à 0 désactive le disjoncteur.
+    """
+
+    CLOSED = 'closed'
+    OPEN = 'open'
+    HALF_OPEN = 'half_open'
+
+    def __init__(self, name, failure_threshold, reset_timeout):
+        self.name = name
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self._state = self.CLOSED
+        self._failures = 0
+        self._opened_at = 0.0
+        self._probing = False
+        self._lock = threading.Lock()
+
+    @property
+    def state(self):
+        return self._state
+
+    def before_call(self):
+        """Lève CircuitOpenError si l'appel doit échouer sans contacter l'amont"""
+        if self.failure_threshold <= 0:
+            return
+        with self._lock:
+            if self._state == self.OPEN:
+                remaining = self._opened_at + self.reset_timeout - time.monotonic()
+                if remaining > 0:
+                    metrics.resilience_events.inc(service=self.name, event='rejected')
+                    raise CircuitOpenError(self.name, remaining)
+                self._state = self.HALF_OPEN
+                self._probing = False
+            if self._state == self.HALF_OPEN:
+                # Un seul appel test à la fois, les autres échouent encore immédiatement
+                if self._probing:
+                    metrics.resilience_events.inc(service=self.name, event='rejected')
+                    raise CircuitOpenError(self.name, 0)
+                self._probing = True
+
+    def record_success(self):
+        """L'amont a répondu (y compris par une erreur propre à la requête)"""
+        with self._lock:
+            if self._state != self.CLOSED:
+                print(f"Disjoncteur {self.name} refermé")
+            self._state = self.CLOSED
+            self._failures = 0
+            self._probing = False
+
+    def record_failure(self):
+        """Échec imputable à l'amont (réseau, délai dépassé, surcharge, erreur serveur)"""
+        with self._lock:
+            self._failures += 1
+            if self.failure_threshold <= 0:
+                return
+            if self._state == self.HALF_OPEN or self._failures >= self.failure_threshold:
+                if self._state != self.OPEN:
+                    print(f"Disjoncteur {self.name} ouvert pour {self.reset_timeout:.0f} s "
+                          f"après {self._failures} échec(s) consécutif(s)")
+                    metrics.resilience_events.inc(service=self.name, event='opened')
+                self._state = self.OPEN
+                self._opened_at = time.monotonic()
+                self._probing = False
+
+    def stats(self):
+        with self._lock:
+            retry_in = 0.0
+            if self._state == self.OPEN:
+                retry_in = max(self._opened_at + self.reset_timeout - time.monotonic(), 0.0)
+            return {
+                'state': self._state,
+                'consecutive_failures': self._failures,
+                'retry_in': round(retry_in, 1)
+            }
+
+
+class LatencyTracker:
+    """Latences des derniers appels réussis (fenêtre glissante), pour le seuil des requêtes doublées"""
+
+    def __init__(self, window=200, min_samples=20):
+        self.min_samples = min_samples
+        self._samples = collections.deque(maxlen=window)
+        self._lock = threading.Lock()
+
+    def observe(self, seconds):
+        with self._lock:
+            self._samples.append(seconds)
+
+    def quantile(self, fraction):
+        """Quantile des latences observées, None tant que l'échantillon est trop petit"""
+        with self._lock:
+            if len(self._samples) < self.min_samples:
+                return None
+            ordered = sorted(self._samples)
+        return ordered[min(int(fraction * len(ordered)), len(ordered) - 1)]
+
+
+def retry_after(error):
+    """Délai Retry-After (secondes) de la réponse HTTP portée par l'exception, None si absent"""
+    headers = getattr(getattr(error, 'response', None), 'headers', None)
+    try:
+        return float(headers.get('retry-after')) if headers else None
+    except (TypeError, ValueError):
+        return None
+
+
+class UpstreamGuard:
+    """
+    Politique de résilience des appels à un service amont (API Whisper):
+    - disjoncteur: échec immédiat (CircuitOpenError) quand l'amont est en panne
+    - nouvelles tentatives des erreurs transitoires (`retryable(exception)`), espacées
+      d'un délai exponentiel aléatoire (full jitter) ou du Retry-After de l'amont
+    - requête doublée (hedging, optionnelle): si un appel dépasse le quantile `hedge_quantile`
+      des latences récentes, une seconde requête identique part et la première réponse gagne
+
+    `attempt` (sync) ou la coroutine renvoyée par `attempt()` (async) effectue un seul appel
+    et doit pouvoir être rejouée: le contenu envoyé est lu une fois par l'appelant.
+    """
+
+    def __init__(self, name, breaker, retryable, retries=2, base_delay=0.5, max_delay=10.0,
+                 hedge=False, hedge_quantile=0.95, hedge_min_delay=1.0, hedge_workers=16):
+        self.name = name
+        self.breaker = breaker
+        self.retryable = retryable
+        self.retries = retries
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.hedge = hedge
+        self.hedge_quantile = hedge_quantile
+        self.hedge_min_delay = hedge_min_delay
+        self.latency = LatencyTracker()
+        # Appels synchrones doublés: chaque tentative tourne dans ce pool, l'appelant attend la première
+        self._hedge_executor = None
+        if hedge:
+            self._hedge_executor = ThreadPoolExecutor(max_workers=hedge_workers, thread_name_prefix=f'{name}-hedge')
+
+    def call(self, attempt):
+        """Exécute `attempt()` avec disjoncteur, nouvelles tentatives et requête doublée"""
+        for retry in range(self.retries + 1):
+            self.breaker.before_call()
+            try:
+                result = self._hedged(attempt) if self.hedge else self._timed(attempt)
+            except Exception as e:
+                delay = self._after_failure(e, retry)
+                if delay is None:
+                    raise
+                time.sleep(delay)
+            else:
+                self.breaker.record_success()
+                return result
+
+    async def acall(self, attempt):
+        """Équivalent asynchrone de call: `attempt()` retourne une coroutine"""
+        for retry in range(self.retries + 1):
+            self.breaker.before_call()
+            try:
+                result = await (self._ahedged(attempt) if self.hedge else self._atimed(attempt))
+            except Exception as e:
+                delay = self._after_failure(e, retry)
+                if delay is None:
+                    raise
+                await asyncio.sleep(delay)
+            else:
+                self.breaker.record_success()
+                return result
+
+    def _after_failure(self, error, retry):
+        """Enregistre l'échec; retourne le délai avant la tentative suivante, None pour abandonner"""
+        if not self.retryable(error):
+            # Erreur propre à la requête (fichier invalide, clé refusée): l'amont a répondu
+            self.breaker.record_success()
+            return None
+        self.breaker.record_failure()
+        if retry >= self.retries or self.breaker.state == CircuitBreaker.OPEN:
+            return None
+        delay = random.uniform(0, min(self.max_delay, self.base_delay * 2 ** retry))
+        after = retry_after(error)
+        if after is not None:
+            delay = min(max(delay, after), self.max_delay)
+        metrics.resilience_events.inc(service=self.name, event='retry')
+        print(f"Appel {self.name} en échec ({type(error).__name__}), nouvel essai dans {delay:.1f} s")
+        return delay
+
+    def _hedge_delay(self):
+        """Attente avant de doubler un appel, None si le doublement est impossible"""
+        if self.breaker.state != CircuitBreaker.CLOSED:
+            return None
+        threshold = self.latency.quantile(self.hedge_quantile)
+        if threshold is None:
+            return None
+        return max(threshold, self.hedge_min_delay)
+
+    def _timed(self, attempt):
+        start = time.perf_counter()
+        result = attempt()
+        self.latency.observe(time.perf_counter() - start)
+        return result
+
+    async def _atimed(self, attempt):
+        start = time.perf_counter()
+        result = await attempt()
+        self.latency.observe(time.perf_counter() - start)
+        return result
+
+    def _hedged(self, attempt):
+        delay = self._hedge_delay()
+        if delay is None:
+            return self._timed(attempt)
+
+        # copy_context: les mesures des tentatives restent attribuées à la plateforme de la requête
+        first = self._hedge_executor.submit(contextvars.copy_context().run, self._timed, attempt)
+        done, _ = wait([first], timeout=delay)
+        if done:
+            return first.result()
+
+        metrics.resilience_events.inc(service=self.name, event='hedge')
+        second = self._hedge_executor.submit(contextvars.copy_context().run, self._timed, attempt)
+        pending = [first, second]
+        error = None
+        while pending:
+            done, pending = wait(pending, return_when=FIRST_COMPLETED)
+            for future in done:
+                if future.exception() is None:
+                    if future is second:
+                        metrics.resilience_events.inc(service=self.name, event='hedge_won')
+                    # La requête perdante se termine en arrière-plan, sa réponse est ignorée
+                    return future.result()
+                error = future.exception()
+        raise error
+
+    async def _ahedged(self, attempt):
+        delay = self._hedge_delay()
+        if delay is None:
+            return await self._atimed(attempt)
+
+        first = asyncio.ensure_future(self._atimed(attempt))
+        tasks = [first]
+        try:
+            done, _ = await asyncio.wait(tasks, timeout=delay)
+            if done:
+                return first.result()
+
+            metrics.resilience_events.inc(service=self.name, event='hedge')
+            second = asyncio.ensure_future(self._atimed(attempt))
+            tasks.append(second)
+            pending = tasks
+            error = None
+            while pending:
+                done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                # exception() sur chaque tâche terminée: aucune erreur laissée non consultée
+                outcomes = {task: task.exception() for task in done}
+                for task, exception in outcomes.items():
+                    if exception is None:
+                        if task is second:
+                            metrics.resilience_events.inc(service=self.name, event='hedge_won')
+                        return task.result()
+                    error = exception
+            raise error
+        finally:
+            # La requête perdante est annulée
+            for task in tasks:
+                if not task.done():
+                    task.cancel()
+
+    def stats(self):
+        threshold = self.latency.quantile(self.hedge_quantile)
+        return {
+            'circuit': self.breaker.stats(),
+            'hedge': self.hedge,
+            'latency_quantile': round(threshold, 3) if threshold is not None else None
+        }
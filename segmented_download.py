@@ -0,0 +1,403 @@
+import fcntl
+import hashlib
+import json
+import os
+import re
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from urllib.parse import urljoin, urlsplit
+from config import Config
+from http_client import get_session
+import metrics
+
+_CONTENT_RANGE_RE = re.compile(r'bytes\s+\d+-\d+/(\d+)')
+_ATTRIBUTE_RE = re.compile(r'([A-Z0-9-]+)=("[^"]*"|[^,]*)')
+
+# Extension du fichier assemblé selon celle des segments HLS
+HLS_SEGMENT_EXTS = {'ts': 'ts', 'aac': 'aac', 'm4s': 'mp4', 'mp4': 'mp4', 'm4a': 'm4a'}
+
+
+class UnsupportedMediaError(Exception):
+    """Source non prise en charge par le téléchargement segmenté (chiffrement HLS, tailles inconnues...)"""
+
+
+def _strip_query(url):
+    parts = urlsplit(url)
+    return f'{parts.scheme}://{parts.netloc}{parts.path}'
+
+
+def _parse_attributes(line):
+    """Attributs d'une balise HLS (`#EXT-X-...:CLE=valeur,...`)"""
+    return {key: value.strip('"') for key, value in _ATTRIBUTE_RE.findall(line.split(':', 1)[-1])}
+
+
+def _pwrite_all(fd, data, offset):
+    """os.pwrite peut écrire partiellement: boucle jusqu'à la fin du bloc"""
+    view = memoryview(data)
+    while view:
+        written = os.pwrite(fd, view, offset)
+        view = view[written:]
+        offset += written
+
+
+def purge_stale_partials(folder, max_age):
+    """Supprime les téléchargements partiels (et leurs manifestes) abandonnés depuis plus de `max_age` secondes"""
+    if not os.path.isdir(folder):
+        return
+    now = time.time()
+    for entry in os.scandir(folder):
+        try:
+            if entry.is_file() and now - entry.stat().st_mtime > max_age:
+                os.remove(entry.path)
+        except OSError:
+            pass
+
+
+class DownloadManifest:
+    """
+    État de progression persisté à côté du fichier partiel (JSON, remplacement atomique):
+    signature de la source et octets déjà écrits par partie.
+    """
+
+    def __init__(self, path, signature, parts, interval=1.0):
+        self.path = path
+        self.signature = signature
+        self.parts = parts
+        self.interval = interval
+        self._lock = threading.Lock()
+        self._last_flush = 0.0
+
+    @classmethod
+    def load(cls, path, signature, parts, interval=1.0):
+        """Reprend la progression enregistrée si la source n'a pas changé (même signature et découpage)"""
+        manifest = cls(path, signature, parts, interval)
+        try:
+            with open(path, 'r', encoding='utf-8') as f:
+                saved = json.load(f)
+        except (OSError, ValueError):
+            return manifest
+        done = saved.get('done') or []
+        if saved.get('signature') == signature and len(done) == len(parts):
+            for part, written in zip(parts, done):
+                part['done'] = min(int(written), part['length'])
+        return manifest
+
+    def flush(self, force=False):
+        now = time.monotonic()
+        with self._lock:
+            if not force and now - self._last_flush < self.interval:
+                return
+            self._last_flush = now
+            state = {
+                'signature': self.signature,
+                'done': [part['done'] for part in self.parts],
+                'updated_at': time.time(),
+            }
+            tmp_path = f'{self.path}.tmp'
+            with open(tmp_path, 'w', encoding='utf-8') as f:
+                json.dump(state, f)
+            os.replace(tmp_path, self.path)
+
+    def remove(self):
+        try:
+            os.remove(self.path)
+        except OSError:
+            pass
+
+
+class SegmentedDownloader:
+    """
+    Téléchargement parallèle par plages d'octets (MP4 progressif) ou par segments (HLS)
+    sur les connexions du pool HTTP partagé.
+
+    Les parties sont écrites avec os.pwrite dans un fichier préalloué; un manifeste de
+    progression permet de reprendre là où une tentative précédente s'est arrêtée,
+    et la taille finale est vérifiée avant de livrer le fichier.
+    """
+
+    def __init__(self, session=None, connections=None, segment_bytes=None, retries=None, partial_folder=None):
+        self.session = session
+        self.connections = connections or Config.SEGMENTED_DOWNLOAD_CONNECTIONS
+        self.segment_bytes = segment_bytes or Config.SEGMENTED_DOWNLOAD_SEGMENT_BYTES
+        self.retries = Config.SEGMENTED_DOWNLOAD_RETRIES if retries is None else retries
+        self.partial_folder = partial_folder or Config.SEGMENTED_DOWNLOAD_FOLDER
+        self.timeout = (Config.DOWNLOAD_PROXY_CONNECT_TIMEOUT, Config.DOWNLOAD_PROXY_READ_TIMEOUT)
+
+    def _session(self):
+        return self.session or get_session()
+
+    # Plan de téléchargement: liste de parties {url, start, length, offset, done}
+
+    def plan_progressive(self, url, headers):
+        """Découpe un fichier servi en HTTP simple en plages d'octets (taille obtenue par une requête Range 0-0)"""
+        probe = self._session().get(
+            url, headers=dict(headers, Range='bytes=0-0'), stream=True, timeout=self.timeout
+        )
+        try:
+            if probe.status_code not in (200, 206):
+                raise Exception(f"Source média indisponible (HTTP {probe.status_code})")
+            match = _CONTENT_RANGE_RE.match(probe.headers.get('Content-Range', ''))
+            if probe.status_code != 206 or not match:
+                raise UnsupportedMediaError('Requêtes Range non prises en charge par la source')
+            total = int(match.group(1))
+            validator = probe.headers.get('ETag') or probe.headers.get('Last-Modified') or ''
+        finally:
+            probe.close()
+
+        parts = [
+            {'url': url, 'start': start, 'length': min(self.segment_bytes, total - start), 'offset': start, 'done': 0}
+            for start in range(0, total, self.segment_bytes)
+        ]
+        signature = hashlib.sha1(json.dumps([total, validator]).encode()).hexdigest()
+        return parts, total, signature
+
+    def _fetch_playlist(self, url, headers):
+        resp = self._session().get(url, headers=headers, timeout=self.timeout)
+        if resp.status_code != 200:
+            raise Exception(f"Playlist HLS indisponible (HTTP {resp.status_code})")
+        return resp.text
+
+    def resolve_media_playlist(self, url, headers):
+        """
+        Suit une playlist maître jusqu'à une playlist de segments: rendu audio séparé
+        s'il existe (suffisant pour la transcription), sinon la variante la plus légère.
+        """
+        text = self._fetch_playlist(url, headers)
+        if '#EXT-X-STREAM-INF' not in text:
+            return url, text
+
+        audio = None
+        variants = []
+        lines = text.splitlines()
+        for i, line in enumerate(lines):
+            if line.startswith('#EXT-X-MEDIA:'):
+                attributes = _parse_attributes(line)
+                if attributes.get('TYPE') == 'AUDIO' and attributes.get('URI') and audio is None:
+                    audio = attributes['URI']
+            elif line.startswith('#EXT-X-STREAM-INF:'):
+                bandwidth = int(_parse_attributes(line).get('BANDWIDTH') or 0)
+                uri = next((l.strip() for l in lines[i + 1:] if l.strip() and not l.startswith('#')), None)
+                if uri:
+                    variants.append((bandwidth, uri))
+        chosen = audio or (min(variants)[1] if variants else None)
+        if not chosen:
+            raise UnsupportedMediaError('Playlist HLS maître sans variante exploitable')
+        media_url = urljoin(url, chosen)
+        return media_url, self._fetch_playlist(media_url, headers)
+
+    def _content_length(self, url, headers):
+        resp = self._session().head(url, headers=headers, timeout=self.timeout, allow_redirects=True)
+        length = resp.headers.get('Content-Length')
+        if resp.status_code != 200 or not length:
+            raise UnsupportedMediaError('Taille des segments HLS inconnue')
+        return int(length)
+
+    def plan_hls(self, url, headers):
+        """
+        Liste les segments d'une playlist HLS (segment d'initialisation compris).
+        Leurs tailles, obtenues par des HEAD en parallèle, fixent la position de chacun
+        dans le fichier préalloué. Playlists chiffrées ou en plages d'octets: non prises en charge.
+        """
+        media_url, text = self.resolve_media_playlist(url, headers)
+        if '#EXT-X-ENDLIST' not in text:
+            raise UnsupportedMediaError('Flux HLS en direct')
+        if '#EXT-X-BYTERANGE' in text:
+            raise UnsupportedMediaError('Segments HLS en plages d\'octets')
+
+        uris = []
+        for line in text.splitlines():
+            line = line.strip()
+            if line.startswith('#EXT-X-KEY:') and _parse_attributes(line).get('METHOD', 'NONE') != 'NONE':
+                raise UnsupportedMediaError('Flux HLS chiffré')
+            if line.startswith('#EXT-X-MAP:'):
+                uris.append(_parse_attributes(line)['URI'])
+            elif line and not line.startswith('#'):
+                uris.append(line)
+        if not uris:
+            raise UnsupportedMediaError('Playlist HLS vide')
+
+        urls = [urljoin(media_url, uri) for uri in uris]
+        with ThreadPoolExecutor(max_workers=self.connections) as pool:
+            lengths = list(pool.map(lambda u: self._content_length(u, headers), urls))
+
+        parts = []
+        offset = 0
+        for segment_url, length in zip(urls, lengths):
+            parts.append({'url': segment_url, 'start': 0, 'length': length, 'offset': offset, 'done': 0})
+            offset += length
+        signature = hashlib.sha1(
+            json.dumps([[os.path.basename(urlsplit(u).path), n] for u, n in zip(urls, lengths)]).encode()
+        ).hexdigest()
+        return parts, offset, signature
+
+    # Transfert
+
+    def _fetch_part(self, fd, part, headers, manifest, stop, on_bytes):
+        """Télécharge le reste d'une partie (reprise à `done`), avec nouvelles tentatives"""
+        attempt = 0
+        while part['done'] < part['length']:
+            if stop.is_set():
+                return
+            first = part['start'] + part['done']
+            last = part['start'] + part['length'] - 1
+            try:
+                resp = self._session().get(
+                    part['url'], headers=dict(headers, Range=f'bytes={first}-{last}'),
+                    stream=True, timeout=self.timeout,
+                )
+                try:
+                    if resp.status_code == 200 and part['start'] == 0 and part['length'] == int(resp.headers.get('Content-Length') or -1):
+                        # Source sans Range (segment HLS entier): la partie repart de zéro
+                        on_bytes(-part['done'])
+                        part['done'] = 0
+                    elif resp.status_code != 206:
+                        raise Exception(f"Réponse inattendue pour une plage (HTTP {resp.status_code})")
+                    for chunk in resp.iter_content(chunk_size=Config.DOWNLOAD_PROXY_CHUNK_SIZE):
+                        if stop.is_set():
+                            return
+                        chunk = chunk[:part['length'] - part['done']]
+                        if not chunk:
+                            break
+                        _pwrite_all(fd, chunk, part['offset'] + part['done'])
+                        part['done'] += len(chunk)
+                        on_bytes(len(chunk))
+                        manifest.flush()
+                finally:
+                    resp.close()
+                if part['done'] < part['length']:
+                    raise Exception('Connexion interrompue avant la fin de la partie')
+            except Exception:
+                attempt += 1
+                if attempt > self.retries:
+                    raise
+                time.sleep(min(0.5 * 2 ** (attempt - 1), 5.0))
+
+    @staticmethod
+    def _open_partial(partial_path):
+        """
+        Ouvre le fichier partiel sous verrou exclusif (flock: threads et processus).
+        Si la même source est déjà en cours de téléchargement, lève une exception
+        plutôt que d'attendre: l'appelant se replie sur yt-dlp.
+        """
+        fd = os.open(partial_path, os.O_RDWR | os.O_CREAT, 0o644)
+        try:
+            fcntl.flock(fd, fcntl.LOCK_EX | fcntl.LOCK_NB)
+            # Le fichier a pu être renommé (téléchargement terminé) entre open et flock
+            if os.fstat(fd).st_ino != os.stat(partial_path).st_ino:
+                raise OSError('Fichier partiel remplacé')
+        except OSError:
+            os.close(fd)
+            raise Exception('Téléchargement de la même source déjà en cours')
+        return fd
+
+    def download(self, url, dest_path, headers=None, resume_key=None, hls=None, progress=None):
+        """
+        Télécharge `url` vers `dest_path` et retourne le chemin final.
+
+        Args:
+            dest_path: chemin de destination; `%(ext)s` y est remplacé par l'extension
+                       du média (celle des segments en HLS, celle de l'URL sinon)
+            headers: en-têtes HTTP à envoyer (Referer, User-Agent...)
+            resume_key: identifiant stable de la source (les URLs signées changent d'un appel à l'autre);
+                        le fichier partiel et son manifeste en dérivent
+            hls: force le mode playlist (détecté sur l'extension .m3u8 sinon)
+        """
+        headers = dict(headers or {})
+        if hls is None:
+            hls = '.m3u8' in urlsplit(url).path
+        parts, total, signature = (self.plan_hls if hls else self.plan_progressive)(url, headers)
+
+        os.makedirs(self.partial_folder, exist_ok=True)
+        purge_stale_partials(self.partial_folder, Config.SEGMENTED_DOWNLOAD_RESUME_TTL)
+        key = hashlib.sha1((resume_key or _strip_query(url)).encode()).hexdigest()[:20]
+
+        partial_path = os.path.join(self.partial_folder, f'{key}.part')
+        fd = self._open_partial(partial_path)
+        stop = threading.Event()
+        manifest = None
+        try:
+            manifest = DownloadManifest.load(f'{partial_path}.json', signature, parts)
+            # Préallocation: réserve l'espace d'un coup et fixe la taille que pwrite remplit
+            if os.fstat(fd).st_size != total:
+                for part in parts:
+                    part['done'] = 0
+                os.ftruncate(fd, 0)
+                if hasattr(os, 'posix_fallocate') and total:
+                    try:
+                        os.posix_fallocate(fd, 0, total)
+                    except OSError:
+                        pass
+                os.ftruncate(fd, total)
+            manifest.flush(force=True)
+
+            resumed = sum(part['done'] for part in parts)
+            state = {'downloaded': resumed, 'last_emit': 0.0}
+            state_lock = threading.Lock()
+            start = time.monotonic()
+
+            def on_bytes(size):
+                with state_lock:
+                    state['downloaded'] += size
+                    now = time.monotonic()
+                    if not progress or now - state['last_emit'] < 0.5:
+                        return
+                    state['last_emit'] = now
+                    downloaded = state['downloaded']
+                elapsed = now - start
+                progress('download', {
+                    'status': 'downloading',
+                    'downloaded_bytes': downloaded,
+                    'total_bytes': total,
+                    'percent': round(downloaded * 100 / total, 1) if total else None,
+                    'speed': (downloaded - resumed) / elapsed if elapsed else None,
+                })
+
+            pending = [part for part in parts if part['done'] < part['length']]
+            with ThreadPoolExecutor(max_workers=max(1, min(self.connections, len(pending)))) as pool:
+                futures = [pool.submit(self._fetch_part, fd, part, headers, manifest, stop, on_bytes) for part in pending]
+                try:
+                    for future in futures:
+                        future.result()
+                except BaseException:
+                    stop.set()
+                    raise
+
+            written = sum(part['done'] for part in parts)
+            size = os.fstat(fd).st_size
+            if written != total or size != total:
+                raise Exception(f"Taille finale incorrecte ({size} octets sur disque, {written}/{total} reçus)")
+
+            ext = hls_extension(parts) if hls else (os.path.splitext(urlsplit(url).path)[1].lstrip('.').lower() or 'mp4')
+            dest_path = dest_path.replace('%(ext)s', ext)
+            # Renommage sous le verrou: un téléchargement concurrent ne peut pas rouvrir ce fichier
+            os.replace(partial_path, dest_path)
+            manifest.remove()
+        except BaseException:
+            if manifest is not None:
+                manifest.flush(force=True)
+            raise
+        finally:
+            os.close(fd)
+
+        metrics.download_size.observe(total, platform=metrics.current_platform())
+        if progress:
+            elapsed = time.monotonic() - start
+            progress('download', {
+                'status': 'finished',
+                'downloaded_bytes': total,
+                'total_bytes': total,
+                'percent': 100.0,
+                'speed': (total - resumed) / elapsed if elapsed else None,
+                'resumed_bytes': resumed,
+            })
+        return dest_path
+
+
+def hls_extension(parts):
+    """Extension du fichier assemblé à partir d'une liste de segments HLS"""
+    ext = os.path.splitext(urlsplit(parts[-1]['url']).path)[1].lstrip('.').lower()
+    return HLS_SEGMENT_EXTS.get(ext, 'ts')
+
+
+segmented_downloader = SegmentedDownloader()
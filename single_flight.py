@@ -0,0 +1,139 @@
+import asyncio
+import os
+import threading
+
+
+class _Call:
+    """Traitement en cours partagé par tous les appelants d'une même clé"""
+
+    def __init__(self):
+        self.done = threading.Event()
+        self.participants = 1
+        self.result = None
+        self.error = None
+
+
+class SingleFlight:
+    """
+    Coalescence des requêtes concurrentes : un seul appel de `fn` par clé à la fois,
+    les appelants arrivés pendant l'exécution attendent et reçoivent le même résultat.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._calls = {}
+        self.hits = 0
+        self.misses = 0
+
+    def do(self, key, fn):
+        """
+        Exécute `fn()` pour `key` (ou rejoint l'exécution en cours).
+        Retourne (résultat, nombre d'appelants ayant partagé ce résultat).
+        """
+        with self._lock:
+            call = self._calls.get(key)
+            if call is not None:
+                call.participants += 1
+                self.hits += 1
+                leader = False
+            else:
+                call = _Call()
+                self._calls[key] = call
+                self.misses += 1
+                leader = True
+
+        if leader:
+            try:
+                call.result = fn()
+            except Exception as e:
+                call.error = e
+            finally:
+                # Le nombre de participants est figé dès que la clé est retirée
+                with self._lock:
+                    del self._calls[key]
+                call.done.set()
+        else:
+            call.done.wait()
+
+        if call.error is not None:
+            raise call.error
+        return call.result, call.participants
+
+    def stats(self):
+        """Compteurs de coalescence (hits = appels évités)"""
+        with self._lock:
+            total = self.hits + self.misses
+            return {
+                'hits': self.hits,
+                'misses': self.misses,
+                'in_flight': len(self._calls),
+                'hit_ratio': round(self.hits / total, 4) if total else 0.0,
+            }
+
+
+class AsyncSingleFlight:
+    """
+    Équivalent asyncio de SingleFlight pour le serveur ASGI: les coroutines arrivées
+    pendant l'exécution attendent le même résultat sans occuper de thread.
+    """
+
+    def __init__(self):
+        self._calls = {}
+        self.hits = 0
+        self.misses = 0
+
+    async def do(self, key, fn):
+        """
+        Attend `fn()` (coroutine) pour `key` ou rejoint l'exécution en cours.
+        Retourne (résultat, nombre d'appelants ayant partagé ce résultat).
+        """
+        entry = self._calls.get(key)
+        if entry is None:
+            self.misses += 1
+            entry = self._calls[key] = [asyncio.ensure_future(fn()), 1]
+            entry[0].add_done_callback(lambda _: self._calls.pop(key, None))
+        else:
+            self.hits += 1
+            entry[1] += 1
+        # shield: l'abandon d'un client n'annule pas le traitement partagé
+        result = await asyncio.shield(entry[0])
+        return result, entry[1]
+
+    def stats(self):
+        total = self.hits + self.misses
+        return {
+            'hits': self.hits,
+            'misses': self.misses,
+            'in_flight': len(self._calls),
+            'hit_ratio': round(self.hits / total, 4) if total else 0.0,
+        }
+
+
+class SharedFileReleaser:
+    """
+    Suppression différée d'un fichier partagé entre plusieurs appelants :
+    le fichier n'est supprimé qu'après la dernière libération.
+    """
+
+    def __init__(self, remove=None):
+        self._lock = threading.Lock()
+        self._remaining = {}
+        # Fonction de suppression (par défaut: le fichier seul)
+        self._remove = remove or _remove_file
+
+    def release(self, path, participants):
+        with self._lock:
+            remaining = self._remaining.get(path, participants) - 1
+            if remaining > 0:
+                self._remaining[path] = remaining
+                return
+            self._remaining.pop(path, None)
+        self._remove(path)
+
+
+def _remove_file(path):
+    try:
+        if os.path.exists(path):
+            os.remove(path)
+    except Exception:
+        pass
@@ -0,0 +1,105 @@
+import threading
+import time
+
+
+class LazyObject:
+    """
+    Objet construit au premier accès à l'un de ses attributs (construction thread-safe,
+    une seule fois): les imports lourds et l'initialisation d'un composant sont différés
+    hors du démarrage du worker. Les attributs lus ou affectés sont ceux de l'objet construit.
+    """
+
+    def __init__(self, factory, name=None):
+        object.__setattr__(self, '_factory', factory)
+        object.__setattr__(self, '_name', name or getattr(factory, '__name__', 'objet'))
+        object.__setattr__(self, '_instance', None)
+        object.__setattr__(self, '_lock', threading.Lock())
+
+    def get(self):
+        """Retourne l'objet, construit au premier appel"""
+        if self._instance is None:
+            with self._lock:
+                if self._instance is None:
+                    object.__setattr__(self, '_instance', self._factory())
+        return self._instance
+
+    @property
+    def loaded(self):
+        return self._instance is not None
+
+    def __getattr__(self, name):
+        return getattr(self.get(), name)
+
+    def __setattr__(self, name, value):
+        setattr(self.get(), name, value)
+
+    def __repr__(self):
+        state = 'chargé' if self.loaded else 'non chargé'
+        return f'<LazyObject {self._name} ({state})>'
+
+
+class Warmup:
+    """
+    Préchauffage en arrière-plan: exécute dans un thread dédié des étapes nommées
+    (imports lourds, construction des composants) pour que la première requête ne les paie pas.
+    Le serveur répond dès l'import; `ready` indique quand toutes les étapes sont terminées.
+    Une étape en échec est journalisée et n'empêche pas les suivantes (chargement au premier usage).
+    """
+
+    def __init__(self):
+        self._steps = []
+        self._thread = None
+        self._lock = threading.Lock()
+        self._done = threading.Event()
+        self.started_at = None
+        self.finished_at = None
+        self.results = {}
+
+    def step(self, name, fn):
+        """Ajoute une étape `fn()` (exécutée dans l'ordre d'ajout)"""
+        self._steps.append((name, fn))
+
+    def start(self):
+        """Démarre le thread de préchauffage (sans effet s'il est déjà démarré)"""
+        with self._lock:
+            if self._thread is not None:
+                return
+            self.started_at = time.monotonic()
+            self._thread = threading.Thread(target=self._run, name='warmup', daemon=True)
+            self._thread.start()
+
+    def _run(self):
+        for name, fn in self._steps:
+            start = time.monotonic()
+            try:
+                fn()
+                self.results[name] = {'status': 'ok', 'seconds': round(time.monotonic() - start, 3)}
+            except Exception as e:
+                print(f"Préchauffage '{name}' impossible: {str(e)}")
+                self.results[name] = {
+                    'status': 'error',
+                    'seconds': round(time.monotonic() - start, 3),
+                    'error': str(e),
+                }
+        self.finished_at = time.monotonic()
+        self._done.set()
+
+    @property
+    def ready(self):
+        return self._done.is_set()
+
+    def wait(self, timeout=None):
+        """Attend la fin du préchauffage, retourne True s'il est terminé"""
+        return self._done.wait(timeout)
+
+    def status(self):
+        now = time.monotonic()
+        return {
+            'ready': self.ready,
+            'started': self.started_at is not None,
+            'seconds': round((self.finished_at or now) - self.started_at, 3) if self.started_at else None,
+            'steps': {
+                name: self.results.get(name, {'status': 'pending'})
+                for name, _ in self._steps
+            },
+        }
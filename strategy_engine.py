@@ -0,0 +1,133 @@
+import os
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, FIRST_COMPLETED, wait
+
+
+def browser_cookies_available(browser):
+    """
+    Indique si les cookies du navigateur peuvent être lus sur cette machine
+    (toujours faux sur un serveur Linux headless sans profil de navigateur)
+    """
+    if browser == 'safari':
+        return sys.platform == 'darwin'
+    try:
+        from yt_dlp.cookies import _get_chromium_based_browser_settings
+        return os.path.isdir(_get_chromium_based_browser_settings(browser)['browser_dir'])
+    except Exception:
+        # API interne de yt-dlp indisponible: on laisse la tentative décider
+        return True
+
+
+class StrategyEngine:
+    """
+    Ordonnancement adaptatif de stratégies de repli.
+
+    Chaque stratégie est identifiée par une clé; le moteur enregistre le taux de succès
+    et la latence de chaque clé et ordonne les candidates vers le gagnant historique.
+    `run` peut mettre en concurrence les deux meilleures et garder le premier succès.
+    """
+
+    def __init__(self, max_race=2, max_workers=8):
+        self.max_race = max_race
+        self._lock = threading.Lock()
+        self._stats = {}
+        # Pool partagé par les courses de toutes les requêtes en cours
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix='strategy')
+
+    def record(self, key, success, latency):
+        with self._lock:
+            stats = self._stats.setdefault(key, {
+                'attempts': 0,
+                'successes': 0,
+                'total_latency': 0.0,
+            })
+            stats['attempts'] += 1
+            stats['total_latency'] += latency
+            if success:
+                stats['successes'] += 1
+
+    def _score(self, key):
+        """Taux de succès lissé (0.5 pour une stratégie jamais essayée) puis latence moyenne"""
+        stats = self._stats.get(key)
+        if not stats:
+            return (-0.5, 0.0)
+        rate = (stats['successes'] + 1) / (stats['attempts'] + 2)
+        latency = stats['total_latency'] / stats['attempts']
+        return (-rate, latency)
+
+    def order(self, keys):
+        """Trie les clés de la plus prometteuse à la moins prometteuse (tri stable)"""
+        with self._lock:
+            return sorted(keys, key=self._score)
+
+    def _attempt(self, key, fn, cancelled):
+        start = time.monotonic()
+        try:
+            result = fn(cancelled)
+        except Exception:
+            # Une perdante interrompue n'est pas un échec de la stratégie
+            if not cancelled.is_set():
+                self.record(key, False, time.monotonic() - start)
+            raise
+        self.record(key, True, time.monotonic() - start)
+        return result
+
+    def run(self, candidates, race=False):
+        """
+        Exécute les candidates [(clé, fn), ...] dans l'ordre appris jusqu'au premier succès.
+        Chaque `fn(cancelled)` reçoit un threading.Event positionné si elle doit s'interrompre.
+
+        Avec `race`, les deux meilleures sont lancées en parallèle et la première
+        qui réussit l'emporte; l'autre est priée de s'interrompre.
+
+        Returns:
+            tuple: (clé gagnante, résultat de fn)
+        """
+        functions = dict(candidates)
+        ordered = self.order(list(functions))
+        last_err = None
+
+        if race and len(ordered) > 1:
+            racers = ordered[:self.max_race]
+            ordered = ordered[self.max_race:]
+            events = {key: threading.Event() for key in racers}
+            futures = {
+                self._executor.submit(self._attempt, key, functions[key], events[key]): key
+                for key in racers
+            }
+            pending = set(futures)
+            while pending:
+                done, pending = wait(pending, return_when=FIRST_COMPLETED)
+                for future in done:
+                    try:
+                        result = future.result()
+                    except Exception as e:
+                        last_err = e
+                        continue
+                    for other in pending:
+                        events[futures[other]].set()
+                    return futures[future], result
+
+        for key in ordered:
+            try:
+                return key, self._attempt(key, functions[key], threading.Event())
+            except Exception as e:
+                last_err = e
+        raise last_err or Exception('Aucune stratégie disponible')
+
+    def stats(self):
+        """Statistiques par stratégie, dans l'ordre de préférence courant"""
+        with self._lock:
+            keys = sorted(self._stats, key=self._score)
+            return [
+                {
+                    'strategy': key,
+                    'attempts': self._stats[key]['attempts'],
+                    'successes': self._stats[key]['successes'],
+                    'success_rate': round(self._stats[key]['successes'] / self._stats[key]['attempts'], 4),
+                    'avg_latency_ms': round(self._stats[key]['total_latency'] / self._stats[key]['attempts'] * 1000, 1),
+                }
+                for key in keys
+            ]
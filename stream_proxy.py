@@ -0,0 +1,95 @@
+import asyncio
+import time
+from config import Config
+from http_client import get_session
+from async_http import get_async_client
+
+
+class ByteRateLimiter:
+    """Limite le débit d'un flux à `max_bytes_per_second` (0 = illimité)"""
+
+    def __init__(self, max_bytes_per_second):
+        self.max_bytes_per_second = max_bytes_per_second
+        self.start = time.monotonic()
+        self.sent = 0
+
+    def delay(self, size):
+        """Attente nécessaire après l'envoi de `size` octets pour rester sous le plafond"""
+        if not self.max_bytes_per_second:
+            return 0.0
+        self.sent += size
+        expected = self.sent / self.max_bytes_per_second
+        return max(0.0, expected - (time.monotonic() - self.start))
+
+    def consume(self, size):
+        wait = self.delay(size)
+        if wait:
+            time.sleep(wait)
+
+    async def aconsume(self, size):
+        wait = self.delay(size)
+        if wait:
+            await asyncio.sleep(wait)
+
+
+def open_upstream(media, range_header=None):
+    """
+    Ouvre la connexion vers l'URL média directe (en transmettant l'en-tête Range du client).
+    Lève une exception si la source ne répond pas 200/206.
+    """
+    headers = dict(media.get('http_headers') or {})
+    if range_header:
+        headers['Range'] = range_header
+
+    upstream = get_session().get(
+        media['url'],
+        headers=headers,
+        stream=True,
+        timeout=(Config.DOWNLOAD_PROXY_CONNECT_TIMEOUT, Config.DOWNLOAD_PROXY_READ_TIMEOUT),
+    )
+    if upstream.status_code not in (200, 206):
+        upstream.close()
+        raise Exception(f"Source média indisponible (HTTP {upstream.status_code})")
+    return upstream
+
+
+def iter_upstream(upstream, max_bytes_per_second=None):
+    """Relaye le corps de la réponse par blocs, sans passer par le disque, au débit plafonné"""
+    limiter = ByteRateLimiter(
+        Config.DOWNLOAD_PROXY_MAX_BYTES_PER_SECOND if max_bytes_per_second is None else max_bytes_per_second
+    )
+    try:
+        for chunk in upstream.iter_content(chunk_size=Config.DOWNLOAD_PROXY_CHUNK_SIZE):
+            if chunk:
+                limiter.consume(len(chunk))
+                yield chunk
+    finally:
+        upstream.close()
+
+
+async def aopen_upstream(media, range_header=None):
+    """Version asynchrone de open_upstream (serveur ASGI), retourne une réponse httpx2 en flux"""
+    headers = dict(media.get('http_headers') or {})
+    if range_header:
+        headers['Range'] = range_header
+
+    client = get_async_client()
+    upstream = await client.send(client.build_request('GET', media['url'], headers=headers), stream=True)
+    if upstream.status_code not in (200, 206):
+        await upstream.aclose()
+        raise Exception(f"Source média indisponible (HTTP {upstream.status_code})")
+    return upstream
+
+
+async def aiter_upstream(upstream, max_bytes_per_second=None):
+    """Version asynchrone de iter_upstream"""
+    limiter = ByteRateLimiter(
+        Config.DOWNLOAD_PROXY_MAX_BYTES_PER_SECOND if max_bytes_per_second is None else max_bytes_per_second
+    )
+    try:
+        async for chunk in upstream.aiter_bytes(chunk_size=Config.DOWNLOAD_PROXY_CHUNK_SIZE):
+            if chunk:
+                await limiter.aconsume(len(chunk))
+                yield chunk
+    finally:
+        await upstream.aclose()
@@ -1,8 +1,8 @@
 import os
-import re
-import requests
-from urllib.parse import urlparse
-import yt_dlp
+from media_extraction import extract_and_download, download_for_transcription, resolve_direct_media, extract_video_info, TRANSCRIPTION_FORMAT
+from workspace import workspaces, work_outtmpl
+from metrics import timed
+from url_resolver import parse_url
 
 class TikTokDownloader:
     """Classe pour télécharger des vidéos TikTok et extraire l'audio"""
@@ -27,15 +27,10 @@ class TikTokDownloader:
             }
         }
         
-        # Options pour l'extraction audio uniquement
+        # Options pour la transcription (flux audio seul privilégié, pas de transcodage MP3)
         self.audio_opts = self.ydl_opts.copy()
         self.audio_opts.update({
-            'format': 'bestaudio/best',
-            'postprocessors': [{
-                'key': 'FFmpegExtractAudio',
-                'preferredcodec': 'mp3',
-                'preferredquality': '192',
-            }]
+            'format': TRANSCRIPTION_FORMAT,
         })
         
         # Options pour le téléchargement vidéo complet
@@ -46,50 +41,47 @@ class TikTokDownloader:
     
     def validate_tiktok_url(self, url):
         """Valide qu'une URL est bien une URL TikTok"""
-        tiktok_patterns = [
-            r'https?://(?:www\.)?tiktok\.com/@[\w.-]+/video/\d+',
-            r'https?://(?:vm|vt)\.tiktok\.com/[\w]+',
-            r'https?://(?:www\.)?tiktok\.com/t/[\w]+',
-        ]
+        resolved = parse_url(url)
+        return resolved is not None and resolved.platform == 'TikTok'
+    
+    def extract_video_id(self, url):
+        """
+        Extrait l'identifiant de la vidéo TikTok (ID numérique ou code de lien court)
         
-        return any(re.match(pattern, url) for pattern in tiktok_patterns)
+        Args:
+            url (str): URL de la vidéo TikTok
+            
+        Returns:
+            str: Identifiant de la vidéo ('' si introuvable)
+        """
+        resolved = parse_url(url)
+        return resolved.canonical_id if resolved and resolved.platform == 'TikTok' else ''
     
-    def download_video(self, url):
+    @timed('audio_fetch', platform='TikTok')
+    def download_video(self, url, progress=None):
         """
-        Télécharge une vidéo TikTok et extrait l'audio en MP3
+        Télécharge l'audio d'une vidéo TikTok, prêt pour Whisper
         
         Args:
             url (str): URL de la vidéo TikTok
+            progress (callable, optionnel): callback progress(événement, données)
             
         Returns:
-            str: Chemin vers le fichier audio extrait
+            str: Chemin vers le fichier audio (m4a/ogg/webm remuxé ou mp3 mono basse résolution)
         """
         if not self.validate_tiktok_url(url):
             raise ValueError("URL TikTok invalide")
         
         try:
-            with yt_dlp.YoutubeDL(self.audio_opts) as ydl:
-                info = ydl.extract_info(url, download=True)
-                
-                # Récupérer le nom du fichier généré
-                filename = ydl.prepare_filename(info)
-                # Remplacer l'extension par .mp3
-                audio_filename = os.path.splitext(filename)[0] + '.mp3'
-                
-                if os.path.exists(audio_filename):
-                    return audio_filename
-                else:
-                    # Si le fichier n'existe pas avec l'extension .mp3, chercher d'autres extensions
-                    for ext in ['.m4a', '.webm', '.opus']:
-                        alt_filename = os.path.splitext(filename)[0] + ext
-                        if os.path.exists(alt_filename):
-                            return alt_filename
-                    
-                    raise Exception("Fichier audio non trouvé après extraction")
+            # Remux sans ré-encodage quand le codec est accepté par Whisper
+            with workspaces.scratch('tiktok') as work_dir:
+                opts = dict(self.audio_opts, outtmpl=work_outtmpl(work_dir))
+                return download_for_transcription(opts, url, progress=progress)
                     
         except Exception as e:
             raise Exception(f"Erreur lors du téléchargement TikTok: {str(e)}")
     
+    @timed('video_fetch', platform='TikTok')
     def download_video_only(self, url):
         """
         Télécharge uniquement la vidéo TikTok (sans extraction audio)
@@ -104,27 +96,34 @@ class TikTokDownloader:
             raise ValueError("URL TikTok invalide")
         
         try:
-            with yt_dlp.YoutubeDL(self.video_opts) as ydl:
-                info = ydl.extract_info(url, download=True)
-                
-                # Récupérer le nom du fichier généré
-                filename = ydl.prepare_filename(info)
-                
-                # Chercher le fichier avec différentes extensions possibles
-                for ext in ['.mp4', '.webm', '.mkv']:
-                    video_filename = os.path.splitext(filename)[0] + ext
-                    if os.path.exists(video_filename):
-                        return video_filename
-                
-                # Si aucun fichier n'est trouvé, utiliser le nom par défaut
-                if os.path.exists(filename):
-                    return filename
-                    
-                raise Exception("Fichier vidéo non trouvé après téléchargement")
+            # Le chemin final est lu depuis l'info dict yt-dlp
+            with workspaces.scratch('tiktok') as work_dir:
+                opts = dict(self.video_opts, outtmpl=work_outtmpl(work_dir))
+                _, video_filename = extract_and_download(opts, url)
+                return video_filename
                     
         except Exception as e:
             raise Exception(f"Erreur lors du téléchargement de la vidéo TikTok: {str(e)}")
     
+    def get_direct_media(self, url):
+        """
+        Résout l'URL directe du flux vidéo progressif sans télécharger
+        
+        Args:
+            url (str): URL de la vidéo TikTok
+            
+        Returns:
+            dict: {'url', 'http_headers', 'ext', 'filesize'} ou None si indisponible
+        """
+        if not self.validate_tiktok_url(url):
+            return None
+        
+        try:
+            return resolve_direct_media(self.ydl_opts, url)
+        except Exception:
+            return None
+    
+    @timed('info', platform='TikTok')
     def get_video_info(self, url):
         """
         Récupère les informations d'une vidéo TikTok sans la télécharger
@@ -139,22 +138,7 @@ class TikTokDownloader:
             raise ValueError("URL TikTok invalide")
         
         try:
-            opts = self.ydl_opts.copy()
-            opts['skip_download'] = True
-            
-            with yt_dlp.YoutubeDL(opts) as ydl:
-                info = ydl.extract_info(url, download=False)
-                
-                return {
-                    'title': info.get('title', 'Sans titre'),
-                    'author': info.get('uploader', 'Inconnu'),
-                    'duration': info.get('duration', 0),
-                    'view_count': info.get('view_count', 0),
-                    'like_count': info.get('like_count', 0),
-                    'description': info.get('description', ''),
-                    'upload_date': info.get('upload_date', ''),
-                }
-                
+            return extract_video_info(self.ydl_opts, url)
         except Exception as e:
             raise Exception(f"Erreur lors de la récupération des infos TikTok: {str(e)}")
 
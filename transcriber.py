@@ -1,43 +1,732 @@
-from openai import OpenAI
+import asyncio
+import contextvars
+import functools
+import importlib.util
+import os
+import shutil
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, wait
 from config import Config
+import audio_chunker
+import metrics
+from admission import stage
+from resilience import CircuitBreaker, CircuitOpenError, UpstreamGuard
+
+# Noms de langue renvoyés par Whisper (verbose_json) -> codes ISO-639-1 acceptés en entrée
+WHISPER_LANGUAGE_CODES = {
+    'english': 'en', 'french': 'fr', 'spanish': 'es', 'german': 'de', 'italian': 'it',
+    'portuguese': 'pt', 'dutch': 'nl', 'russian': 'ru', 'ukrainian': 'uk', 'polish': 'pl',
+    'czech': 'cs', 'slovak': 'sk', 'romanian': 'ro', 'hungarian': 'hu', 'greek': 'el',
+    'bulgarian': 'bg', 'serbian': 'sr', 'croatian': 'hr', 'slovenian': 'sl', 'swedish': 'sv',
+    'norwegian': 'no', 'danish': 'da', 'finnish': 'fi', 'estonian': 'et', 'latvian': 'lv',
+    'lithuanian': 'lt', 'turkish': 'tr', 'arabic': 'ar', 'hebrew': 'he', 'persian': 'fa',
+    'hindi': 'hi', 'urdu': 'ur', 'bengali': 'bn', 'tamil': 'ta', 'thai': 'th',
+    'vietnamese': 'vi', 'indonesian': 'id', 'malay': 'ms', 'tagalog': 'tl', 'chinese': 'zh',
+    'japanese': 'ja', 'korean': 'ko', 'catalan': 'ca', 'galician': 'gl', 'basque': 'eu',
+    'welsh': 'cy', 'icelandic': 'is', 'swahili': 'sw', 'afrikaans': 'af',
+}
+
+
+def language_code(language):
+    """Convertit la langue détectée par Whisper ('french') en code ISO ('fr'), None si inconnue"""
+    if not language:
+        return None
+    language = language.lower()
+    if len(language) == 2:
+        return language
+    return WHISPER_LANGUAGE_CODES.get(language)
+
+
+def _field(obj, name, default=None):
+    """Lecture d'un champ sur un objet de réponse OpenAI ou un dict"""
+    if isinstance(obj, dict):
+        return obj.get(name, default)
+    return getattr(obj, name, default)
+
+
+def _offset_timings(result, offset):
+    """Segments et mots d'un morceau d'audio, horodatages décalés de `offset` secondes"""
+    segments = [
+        {
+            'start': round(segment['start'] + offset, 3),
+            'end': round(segment['end'] + offset, 3),
+            'text': segment['text'],
+        }
+        for segment in result.get('segments') or []
+    ]
+    words = [
+        {
+            'start': round(word['start'] + offset, 3),
+            'end': round(word['end'] + offset, 3),
+            'word': word['word'],
+        }
+        for word in result.get('words') or []
+    ]
+    return segments, words
+
+
+class TranscriptionBackend:
+    """
+    Interface commune des backends de transcription.
+
+    `transcribe` retourne {'text'} en format 'text', sinon
+    {'text', 'language', 'duration', 'segments': [{'start', 'end', 'text'}]},
+    plus 'words': [{'start', 'end', 'word'}] si TRANSCRIPTION_WORD_TIMESTAMPS est activé.
+    """
+
+    name = None
+
+    def warm_up(self):
+        """Charge à l'avance ce que le premier appel chargerait (SDK, modèle), préchauffage au démarrage"""
+
+    def stats(self):
+        """État de la résilience des appels (disjoncteur, latences), None sans service amont"""
+        return None
+
+    def transcribe(self, audio_file_path, language=None, response_format='verbose_json'):
+        raise NotImplementedError
+
+    async def atranscribe(self, audio_file_path, language=None, response_format='verbose_json', executor=None):
+        """
+        Version asynchrone (serveur ASGI). Par défaut, la transcription synchrone
+        s'exécute dans `executor` sans bloquer la boucle d'événements.
+        """
+        call = functools.partial(self.transcribe, audio_file_path, language, response_format)
+        return await asyncio.get_running_loop().run_in_executor(executor, contextvars.copy_context().run, call)
+
+
+def _retryable_openai_error(e):
+    """Erreurs transitoires de l'API (réseau, délai dépassé, 408/409/429, 5xx): nouvel essai"""
+    from openai import APIConnectionError, APIStatusError
+
+    if isinstance(e, APIConnectionError):
+        return True
+    if isinstance(e, APIStatusError):
+        # Quota épuisé: 429 durable, inutile d'insister
+        if getattr(e, 'code', None) == 'insufficient_quota':
+            return False
+        return e.status_code in (408, 409, 429) or e.status_code >= 500
+    return False
+
+
+class OpenAIWhisperBackend(TranscriptionBackend):
+    """
+    Backend de transcription via l'API OpenAI Whisper. Les appels passent par un UpstreamGuard
+    (délais explicites, nouvelles tentatives, disjoncteur, requêtes doublées): l'audio est lu
+    une seule fois puis renvoyé tel quel à chaque tentative.
+    """
+
+    name = 'openai'
 
-class AudioTranscriber:
     def __init__(self):
-        self.client = OpenAI(api_key=Config.OPENAI_API_KEY)
-    
+        self._client = None
+        self._client_lock = threading.Lock()
+        # Un client asynchrone par boucle d'événements (serveur ASGI)
+        self._async_clients = {}
+        self.guard = UpstreamGuard(
+            'whisper',
+            CircuitBreaker('whisper', Config.WHISPER_CIRCUIT_FAILURES, Config.WHISPER_CIRCUIT_RESET_SECONDS),
+            _retryable_openai_error,
+            retries=Config.WHISPER_RETRIES,
+            base_delay=Config.WHISPER_RETRY_BASE_DELAY,
+            max_delay=Config.WHISPER_RETRY_MAX_DELAY,
+            hedge=Config.WHISPER_HEDGE_ENABLED,
+            hedge_quantile=Config.WHISPER_HEDGE_QUANTILE,
+            hedge_min_delay=Config.WHISPER_HEDGE_MIN_SECONDS,
+            hedge_workers=4 * Config.TRANSCRIPTION_MAX_CONCURRENCY
+        )
+
+    @staticmethod
+    def _client_options():
+        """Délais de connexion et de lecture explicites; les nouvelles tentatives sont celles du guard"""
+        from openai import Timeout
+
+        return {
+            'api_key': Config.OPENAI_API_KEY,
+            'timeout': Timeout(Config.WHISPER_READ_TIMEOUT, connect=Config.WHISPER_CONNECT_TIMEOUT),
+            'max_retries': 0,
+        }
+
+    @property
+    def client(self):
+        """Client OpenAI créé au premier appel (le SDK n'est importé qu'à ce moment)"""
+        if self._client is None:
+            with self._client_lock:
+                if self._client is None:
+                    from openai import OpenAI
+
+                    self._client = OpenAI(**self._client_options())
+        return self._client
+
+    def warm_up(self):
+        return self.client
+
+    def stats(self):
+        return self.guard.stats()
+
+    def transcribe(self, audio_file_path, language=None, response_format='verbose_json'):
+        """
+        Transcrit un fichier audio, retourne un dict {'text', 'language', 'duration', 'segments'}
+        """
+        with open(audio_file_path, "rb") as audio_file:
+            content = audio_file.read()
+        upload = (os.path.basename(audio_file_path), content)
+        options = self._options(language, response_format)
+
+        def attempt():
+            return self.client.audio.transcriptions.create(
+                model="whisper-1",
+                file=upload,
+                response_format=response_format,
+                **options
+            )
+
+        return self._parse(self.guard.call(attempt), response_format)
+
+    async def atranscribe(self, audio_file_path, language=None, response_format='verbose_json', executor=None):
+        """Transcription via le client OpenAI asynchrone: l'attente de l'API ne mobilise aucun thread"""
+        loop = asyncio.get_running_loop()
+        client = self._async_clients.get(loop)
+        if client is None:
+            from openai import AsyncOpenAI
+
+            client = self._async_clients[loop] = AsyncOpenAI(**self._client_options())
+
+        with open(audio_file_path, "rb") as audio_file:
+            content = await loop.run_in_executor(executor, audio_file.read)
+        upload = (os.path.basename(audio_file_path), content)
+        options = self._options(language, response_format)
+
+        def attempt():
+            return client.audio.transcriptions.create(
+                model="whisper-1",
+                file=upload,
+                response_format=response_format,
+                **options
+            )
+
+        return self._parse(await self.guard.acall(attempt), response_format)
+
+    @staticmethod
+    def _options(language, response_format):
+        options = {}
+        if language:
+            options['language'] = language
+        # Horodatage par mot obtenu dans le même appel que les segments
+        if response_format == 'verbose_json' and Config.TRANSCRIPTION_WORD_TIMESTAMPS:
+            options['timestamp_granularities'] = ['word', 'segment']
+        return options
+
+    @staticmethod
+    def _parse(transcript, response_format):
+        if response_format == 'text':
+            return {'text': transcript}
+
+        return {
+            'text': transcript.text,
+            'language': getattr(transcript, 'language', None),
+            'duration': getattr(transcript, 'duration', None),
+            'segments': [
+                {
+                    'start': float(_field(segment, 'start', 0.0)),
+                    'end': float(_field(segment, 'end', 0.0)),
+                    'text': _field(segment, 'text', ''),
+                }
+                for segment in (getattr(transcript, 'segments', None) or [])
+            ],
+            'words': [
+                {
+                    'start': float(_field(word, 'start', 0.0)),
+                    'end': float(_field(word, 'end', 0.0)),
+                    'word': _field(word, 'word', ''),
+                }
+                for word in (getattr(transcript, 'words', None) or [])
+            ],
+        }
+
+
+class LocalWhisperBackend(TranscriptionBackend):
+    """
+    Backend local sur CPU (faster-whisper / CTranslate2, modèle quantifié int8).
+
+    Le modèle est chargé une seule fois par processus, au premier appel. Les transcriptions
+    s'exécutent sur un pool dédié (LOCAL_WHISPER_WORKERS) et le modèle est ouvert avec autant
+    de workers CTranslate2, ce qui permet de traiter les requêtes concurrentes en parallèle;
+    au sein d'un fichier, les segments sont décodés par lots (LOCAL_WHISPER_BATCH_SIZE).
+    """
+
+    name = 'local'
+    _model = None
+    _pipeline = None
+    _model_lock = threading.Lock()
+
+    def __init__(self):
+        self._executor = ThreadPoolExecutor(
+            max_workers=Config.LOCAL_WHISPER_WORKERS,
+            thread_name_prefix='local-whisper'
+        )
+
+    @staticmethod
+    def available():
+        """Indique si faster-whisper est installé (dépendance optionnelle)"""
+        return importlib.util.find_spec('faster_whisper') is not None
+
+    @classmethod
+    def _load(cls):
+        """Charge le modèle une seule fois par processus"""
+        if cls._model is None:
+            with cls._model_lock:
+                if cls._model is None:
+                    import faster_whisper
+
+                    model = faster_whisper.WhisperModel(
+                        Config.LOCAL_WHISPER_MODEL,
+                        device='cpu',
+                        compute_type=Config.LOCAL_WHISPER_COMPUTE_TYPE,
+                        cpu_threads=Config.LOCAL_WHISPER_CPU_THREADS,
+                        num_workers=Config.LOCAL_WHISPER_WORKERS,
+                        download_root=Config.LOCAL_WHISPER_MODEL_DIR,
+                    )
+                    # Décodage par lots des segments d'un même fichier (faster-whisper >= 1.0)
+                    batched = getattr(faster_whisper, 'BatchedInferencePipeline', None)
+                    if batched is not None and Config.LOCAL_WHISPER_BATCH_SIZE > 1:
+                        cls._pipeline = batched(model=model)
+                    cls._model = model
+        return cls._model
+
+    def warm_up(self):
+        self._load()
+
+    def _run(self, audio_file_path, language):
+        model = self._load()
+        word_timestamps = Config.TRANSCRIPTION_WORD_TIMESTAMPS
+        if self._pipeline is not None:
+            segments, info = self._pipeline.transcribe(
+                audio_file_path, language=language, batch_size=Config.LOCAL_WHISPER_BATCH_SIZE,
+                word_timestamps=word_timestamps
+            )
+        else:
+            segments, info = model.transcribe(audio_file_path, language=language, word_timestamps=word_timestamps)
+        # Les segments sont produits paresseusement: le décodage a lieu ici, dans le pool dédié
+        results = []
+        words = []
+        for segment in segments:
+            results.append({'start': float(segment.start), 'end': float(segment.end), 'text': segment.text})
+            words.extend(
+                {'start': float(word.start), 'end': float(word.end), 'word': word.word}
+                for word in getattr(segment, 'words', None) or []
+            )
+        return results, words, info
+
+    def transcribe(self, audio_file_path, language=None, response_format='verbose_json'):
+        segments, words, info = self._executor.submit(self._run, audio_file_path, language).result()
+        return self._format(segments, words, info, response_format)
+
+    async def atranscribe(self, audio_file_path, language=None, response_format='verbose_json', executor=None):
+        # Attente directe sur le pool dédié, sans occuper un thread de l'appelant
+        future = self._executor.submit(contextvars.copy_context().run, self._run, audio_file_path, language)
+        segments, words, info = await asyncio.wrap_future(future)
+        return self._format(segments, words, info, response_format)
+
+    @staticmethod
+    def _format(segments, words, info, response_format):
+        text = ''.join(segment['text'] for segment in segments).strip()
+        if response_format == 'text':
+            return {'text': text}
+
+        # Même convention que l'API (nom de langue en anglais) pour un résultat homogène
+        names = {code: name for name, code in WHISPER_LANGUAGE_CODES.items()}
+        return {
+            'text': text,
+            'language': names.get(info.language, info.language),
+            'duration': info.duration,
+            'segments': segments,
+            'words': words,
+        }
+
+
+class FallbackBackend(TranscriptionBackend):
+    """
+    Utilise le backend principal et bascule sur le secours en cas d'échec
+    (le secours n'est instancié qu'au premier besoin)
+    """
+
+    def __init__(self, primary, fallback_name):
+        self.primary = primary
+        self.fallback_name = fallback_name
+        self.name = f'{primary.name}+{fallback_name}'
+        self._fallback = None
+        self._lock = threading.Lock()
+
+    def _get_fallback(self):
+        with self._lock:
+            if self._fallback is None:
+                self._fallback = _instantiate(self.fallback_name)
+            return self._fallback
+
+    def warm_up(self):
+        self.primary.warm_up()
+
+    def stats(self):
+        return self.primary.stats()
+
+    def transcribe(self, audio_file_path, language=None, response_format='verbose_json'):
+        try:
+            return self.primary.transcribe(audio_file_path, language, response_format)
+        except Exception as e:
+            print(f"Erreur du backend {self.primary.name}, bascule sur {self.fallback_name}: {str(e)}")
+            metrics.count_fallback(f'backend_{self.fallback_name}')
+            return self._get_fallback().transcribe(audio_file_path, language, response_format)
+
+    async def atranscribe(self, audio_file_path, language=None, response_format='verbose_json', executor=None):
+        try:
+            return await self.primary.atranscribe(audio_file_path, language, response_format, executor)
+        except Exception as e:
+            print(f"Erreur du backend {self.primary.name}, bascule sur {self.fallback_name}: {str(e)}")
+            metrics.count_fallback(f'backend_{self.fallback_name}')
+            return await self._get_fallback().atranscribe(audio_file_path, language, response_format, executor)
+
+
+class FakeTranscriptionBackend(TranscriptionBackend):
+    """
+    Backend local factice pour les tests et benchmarks: aucun appel réseau,
+    retourne un segment couvrant tout le fichier après une latence configurable.
+    """
+
+    name = 'fake'
+
+    def __init__(self, text='Transcription factice', language='french', latency=0.0):
+        self.text = text
+        self.language = language
+        self.latency = latency
+        self.calls = []
+
+    def transcribe(self, audio_file_path, language=None, response_format='verbose_json'):
+        self.calls.append((audio_file_path, language))
+        if self.latency:
+            time.sleep(self.latency)
+
+        text = f'{self.text} [{os.path.basename(audio_file_path)}]'
+        if response_format == 'text':
+            return {'text': text}
+
+        duration = audio_chunker.probe_duration(audio_file_path)
+        result = {
+            'text': text,
+            'language': language or self.language,
+            'duration': duration,
+            'segments': [{'start': 0.0, 'end': duration, 'text': text}],
+        }
+        if Config.TRANSCRIPTION_WORD_TIMESTAMPS:
+            # Mots répartis uniformément sur la durée
+            tokens = text.split()
+            step = duration / len(tokens)
+            result['words'] = [
+                {'start': round(i * step, 3), 'end': round((i + 1) * step, 3), 'word': token}
+                for i, token in enumerate(tokens)
+            ]
+        return result
+
+
+def _instantiate(name):
+    if name == 'openai':
+        return OpenAIWhisperBackend()
+    if name == 'local':
+        return LocalWhisperBackend()
+    if name == 'fake':
+        return FakeTranscriptionBackend()
+    raise ValueError(f"Backend de transcription inconnu: {name}")
+
+
+def create_backend(name, fallback=None):
+    """
+    Instancie le backend de transcription configuré, doublé d'un backend de secours
+    (`fallback`, Config.TRANSCRIPTION_FALLBACK_BACKEND par défaut) s'il est différent.
+    Le backend local est écarté d'emblée si faster-whisper n'est pas installé.
+    """
+    fallback = Config.TRANSCRIPTION_FALLBACK_BACKEND if fallback is None else fallback
+    if name == 'local' and not LocalWhisperBackend.available():
+        if not fallback:
+            raise ValueError("Backend local indisponible: installez faster-whisper")
+        print(f"faster-whisper non installé, utilisation du backend {fallback}")
+        return _instantiate(fallback)
+
+    backend = _instantiate(name)
+    # Le backend factice (tests, benchmarks) n'a pas de secours
+    if fallback and fallback != name and name != 'fake':
+        return FallbackBackend(backend, fallback)
+    return backend
+
+
+class AudioTranscriber:
+    def __init__(self, backend=None):
+        self.backend = backend or create_backend(Config.TRANSCRIPTION_BACKEND)
+        # Pool borné partagé par toutes les requêtes pour les morceaux d'audios longs
+        self._executor = ThreadPoolExecutor(
+            max_workers=Config.TRANSCRIPTION_MAX_CONCURRENCY,
+            thread_name_prefix='whisper'
+        )
+        # Équivalent asynchrone: un sémaphore par boucle d'événements (serveur ASGI)
+        self._async_limits = {}
+
+    def warm_up(self):
+        """Préchauffe le backend (client OpenAI, modèle local) avant la première requête"""
+        self.backend.warm_up()
+
+    def stats(self):
+        return self.backend.stats()
+
     def transcribe_audio(self, audio_file_path):
         """
         Transcrit un fichier audio en utilisant l'API OpenAI Whisper
         """
         try:
-            with open(audio_file_path, "rb") as audio_file:
-                transcript = self.client.audio.transcriptions.create(
-                    model="whisper-1",
-                    file=audio_file,
-                    response_format="text"
-                )
-            
-            return transcript
-            
+            with stage('whisper'):
+                # Segments demandés dans tous les cas: un seul format de réponse, mis en cache par l'appelant
+                return self._transcribe(audio_file_path, response_format="verbose_json")['text']
+
         except Exception as e:
             raise Exception(f"Erreur lors de la transcription: {str(e)}")
-    
-    def transcribe_with_language_detection(self, audio_file_path):
+
+    def transcribe_with_language_detection(self, audio_file_path, progress=None):
         """
-        Transcrit un fichier audio avec détection automatique de la langue
+        Transcrit un fichier audio avec détection automatique de la langue.
+        `progress(événement, données)` reçoit un événement 'segment' par morceau transcrit.
         """
         try:
-            with open(audio_file_path, "rb") as audio_file:
-                transcript = self.client.audio.transcriptions.create(
-                    model="whisper-1",
-                    file=audio_file,
-                    response_format="verbose_json"
-                )
-            
+            with stage('whisper'):
+                result = self._transcribe(audio_file_path, response_format="verbose_json", progress=progress)
+
+            return {
+                'text': result['text'],
+                'language': result.get('language') or 'auto-detected',
+                'duration': result.get('duration'),
+                'segments': result.get('segments', []),
+                'words': result.get('words', [])
+            }
+
+        except CircuitOpenError:
+            # Échec immédiat: l'appelant répond 503 sans attendre l'amont
+            raise
+        except Exception as e:
+            raise Exception(f"Erreur lors de la transcription avec détection de langue: {str(e)}")
+
+    async def atranscribe_audio(self, audio_file_path, executor=None):
+        """Version asynchrone de transcribe_audio (serveur ASGI)"""
+        try:
+            async with stage('whisper'):
+                result = await self._atranscribe(audio_file_path, "verbose_json", executor)
+            return result['text']
+
+        except Exception as e:
+            raise Exception(f"Erreur lors de la transcription: {str(e)}")
+
+    async def atranscribe_with_language_detection(self, audio_file_path, executor=None):
+        """
+        Version asynchrone de transcribe_with_language_detection (serveur ASGI):
+        ffmpeg tourne dans `executor`, les appels au backend sont attendus sans bloquer.
+        """
+        try:
+            async with stage('whisper'):
+                result = await self._atranscribe(audio_file_path, "verbose_json", executor)
+
             return {
-                'text': transcript.text,
-                'language': getattr(transcript, 'language', 'auto-detected')
+                'text': result['text'],
+                'language': result.get('language') or 'auto-detected',
+                'duration': result.get('duration'),
+                'segments': result.get('segments', []),
+                'words': result.get('words', [])
             }
-            
+
+        except CircuitOpenError:
+            raise
+        except Exception as e:
+            raise Exception(f"Erreur lors de la transcription avec détection de langue: {str(e)}")
+
+    def _backend_transcribe(self, audio_file_path, language, response_format):
+        """Appel au backend, mesuré (étape 'whisper')"""
+        with metrics.timed('whisper'):
+            return self.backend.transcribe(audio_file_path, language, response_format)
+
+    def _transcribe(self, audio_file_path, response_format, progress=None):
+        """Envoi direct si l'audio est court, sinon découpage et transcription parallèle"""
+        duration = audio_chunker.probe_duration(audio_file_path)
+        target = audio_chunker.target_chunk_seconds(audio_file_path, duration)
+        if duration > target:
+            return self._transcribe_chunked(audio_file_path, duration, target, progress)
+
+        if progress:
+            progress('transcribing', {'chunks': 1})
+        result = self._backend_transcribe(audio_file_path, None, response_format)
+        if progress:
+            progress('segment', {
+                'index': 0,
+                'count': 1,
+                'text': result.get('text', ''),
+                'segments': result.get('segments', []),
+            })
+        return result
+
+    def _transcribe_chunked(self, audio_file_path, duration, target, progress=None):
+        """
+        Découpe l'audio sur les silences, transcrit les morceaux en parallèle
+        puis recolle texte et segments (horodatages décalés) dans l'ordre.
+        """
+        silences = audio_chunker.detect_silences(audio_file_path)
+        chunks = audio_chunker.plan_chunks(duration, silences, target)
+
+        work_dir = tempfile.mkdtemp(prefix='chunks_', dir=os.path.dirname(os.path.abspath(audio_file_path)))
+        try:
+            chunk_paths = audio_chunker.split_audio(audio_file_path, chunks, work_dir)
+            if progress:
+                progress('transcribing', {'chunks': len(chunk_paths)})
+
+            # Le premier morceau détecte la langue, imposée ensuite aux autres pour la cohérence
+            first = self._backend_transcribe(chunk_paths[0], None, 'verbose_json')
+            detected_language = first.get('language')
+            forced_language = language_code(detected_language)
+            # copy_context: les mesures des morceaux restent attribuées à la plateforme de la requête
+            futures = [
+                self._executor.submit(
+                    contextvars.copy_context().run,
+                    self._backend_transcribe, path, forced_language, 'verbose_json'
+                )
+                for path in chunk_paths[1:]
+            ]
+
+            # Recollage dans l'ordre: chaque morceau est publié dès que lui et ses prédécesseurs sont prêts
+            texts = []
+            segments = []
+            words = []
+            try:
+                for index, ((offset, _), pending) in enumerate(zip(chunks, [None] + futures)):
+                    result = first if pending is None else pending.result()
+                    text = (result.get('text') or '').strip()
+                    if text:
+                        texts.append(text)
+                    chunk_segments, chunk_words = _offset_timings(result, offset)
+                    segments.extend(chunk_segments)
+                    words.extend(chunk_words)
+                    if progress:
+                        progress('segment', {
+                            'index': index,
+                            'count': len(chunks),
+                            'text': text,
+                            'segments': chunk_segments,
+                        })
+            except BaseException:
+                # Morceau en échec ou client SSE parti: les morceaux en file sont annulés et ceux
+                # en cours terminés avant de supprimer leurs fichiers
+                for future in futures:
+                    future.cancel()
+                wait(futures)
+                raise
+        finally:
+            shutil.rmtree(work_dir, ignore_errors=True)
+
+        return {
+            'text': ' '.join(texts),
+            'language': detected_language,
+            'duration': duration,
+            'segments': segments,
+            'words': words,
+        }
+
+    async def _abackend_transcribe(self, audio_file_path, language, response_format, executor):
+        """
+        Appel asynchrone au backend, mesuré (étape 'whisper'; mesure explicite car
+        plusieurs coroutines partagent le même thread)
+        """
+        start = time.perf_counter()
+        try:
+            return await self.backend.atranscribe(audio_file_path, language, response_format, executor)
         except Exception as e:
-            raise Exception(f"Erreur lors de la transcription avec détection de langue: {str(e)}") 
\ No newline at end of file
+            metrics.errors.inc(stage='whisper', platform=metrics.current_platform(), error=type(e).__name__)
+            raise
+        finally:
+            metrics.stage_duration.observe(
+                time.perf_counter() - start, stage='whisper', platform=metrics.current_platform()
+            )
+
+    async def _abackend_transcribe_limited(self, audio_file_path, language, response_format, executor, running):
+        """
+        Morceaux d'un audio long: bornés par TRANSCRIPTION_MAX_CONCURRENCY, comme le pool synchrone.
+        La tâche s'inscrit dans `running` une fois l'appel au backend commencé.
+        """
+        loop = asyncio.get_running_loop()
+        limit = self._async_limits.get(loop)
+        if limit is None:
+            limit = self._async_limits[loop] = asyncio.Semaphore(Config.TRANSCRIPTION_MAX_CONCURRENCY)
+        async with limit:
+            running.add(asyncio.current_task())
+            return await self._abackend_transcribe(audio_file_path, language, response_format, executor)
+
+    async def _atranscribe(self, audio_file_path, response_format, executor=None):
+        """Équivalent asynchrone de _transcribe: découpage via ffmpeg dans `executor`, morceaux concurrents"""
+        loop = asyncio.get_running_loop()
+
+        def blocking(fn, *args):
+            return loop.run_in_executor(executor, contextvars.copy_context().run, fn, *args)
+
+        duration = await blocking(audio_chunker.probe_duration, audio_file_path)
+        target = audio_chunker.target_chunk_seconds(audio_file_path, duration)
+        if duration <= target:
+            return await self._abackend_transcribe(audio_file_path, None, response_format, executor)
+
+        silences = await blocking(audio_chunker.detect_silences, audio_file_path)
+        chunks = audio_chunker.plan_chunks(duration, silences, target)
+        work_dir = tempfile.mkdtemp(prefix='chunks_', dir=os.path.dirname(os.path.abspath(audio_file_path)))
+        try:
+            chunk_paths = await blocking(audio_chunker.split_audio, audio_file_path, chunks, work_dir)
+
+            # Le premier morceau détecte la langue, imposée ensuite aux autres
+            first = await self._abackend_transcribe(chunk_paths[0], None, 'verbose_json', executor)
+            detected_language = first.get('language')
+            forced_language = language_code(detected_language)
+            running = set()
+            tasks = [
+                asyncio.ensure_future(
+                    self._abackend_transcribe_limited(path, forced_language, 'verbose_json', executor, running)
+                )
+                for path in chunk_paths[1:]
+            ]
+            try:
+                # asyncio.wait et non gather: l'annulation de la requête ne se propage pas aux
+                # morceaux en cours, traités ci-dessous
+                done, _ = await asyncio.wait(tasks, return_when=asyncio.FIRST_EXCEPTION)
+                for task in done:
+                    if task.exception() is not None:
+                        raise task.exception()
+                others = [task.result() for task in tasks]
+            except BaseException:
+                # Morceau en échec ou requête annulée: les morceaux en attente sont annulés et ceux
+                # en cours (souvent dans un thread, non interruptibles) terminés avant de supprimer
+                # leurs fichiers
+                for task in tasks:
+                    if task not in running:
+                        task.cancel()
+                await asyncio.gather(*tasks, return_exceptions=True)
+                raise
+        finally:
+            shutil.rmtree(work_dir, ignore_errors=True)
+
+        texts = []
+        segments = []
+        words = []
+        for (offset, _), result in zip(chunks, [first] + list(others)):
+            text = (result.get('text') or '').strip()
+            if text:
+                texts.append(text)
+            chunk_segments, chunk_words = _offset_timings(result, offset)
+            segments.extend(chunk_segments)
+            words.extend(chunk_words)
+
+        return {
+            'text': ' '.join(texts),
+            'language': detected_language,
+            'duration': duration,
+            'segments': segments,
+            'words': words,
+        }
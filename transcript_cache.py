@@ -0,0 +1,110 @@
+import os
+import json
+import sqlite3
+import threading
+import time
+from config import Config
+
+
+class TranscriptCache:
+    """
+    Cache persistant des transcriptions (SQLite), indexé par plateforme + ID vidéo.
+    Les segments horodatés (et les mots si disponibles) sont conservés avec le texte:
+    les formats SRT/WebVTT/JSON se rendent depuis le cache sans nouvel appel Whisper.
+    """
+
+    def __init__(self, db_path=None, ttl=None, max_entries=None):
+        self.db_path = db_path or Config.TRANSCRIPT_CACHE_PATH
+        self.ttl = Config.TRANSCRIPT_CACHE_TTL if ttl is None else ttl
+        self.max_entries = Config.TRANSCRIPT_CACHE_MAX_ENTRIES if max_entries is None else max_entries
+        self._lock = threading.Lock()
+
+        folder = os.path.dirname(self.db_path)
+        if folder:
+            os.makedirs(folder, exist_ok=True)
+
+        # Une seule connexion partagée entre les threads gunicorn, protégée par un verrou
+        self._conn = sqlite3.connect(self.db_path, check_same_thread=False, isolation_level=None)
+        self._conn.execute('PRAGMA journal_mode=WAL')
+        self._conn.execute('PRAGMA synchronous=NORMAL')
+        self._conn.execute(
+            'CREATE TABLE IF NOT EXISTS transcripts ('
+            ' cache_key TEXT PRIMARY KEY,'
+            ' transcript TEXT NOT NULL,'
+            ' language TEXT,'
+            ' created_at REAL NOT NULL,'
+            ' last_access REAL NOT NULL,'
+            ' timing TEXT'
+            ')'
+        )
+        self._conn.execute('CREATE INDEX IF NOT EXISTS idx_transcripts_access ON transcripts (last_access)')
+
+    @staticmethod
+    def make_key(platform, video_id):
+        """Construit la clé de cache canonique (ex: 'instagram:C1a2B3c4')."""
+        return f'{platform.lower()}:{video_id}'
+
+    def get(self, key):
+        """
+        Retourne la transcription en cache ({'text', 'language', 'duration', 'segments', 'words'})
+        ou None si absente/expirée (segments et mots vides pour une entrée sans horodatage)
+        """
+        now = time.time()
+        with self._lock:
+            row = self._conn.execute(
+                'SELECT transcript, language, created_at, timing FROM transcripts WHERE cache_key = ?',
+                (key,)
+            ).fetchone()
+            if row is None:
+                return None
+
+            transcript, language, created_at, timing = row
+            if self.ttl and now - created_at > self.ttl:
+                self._conn.execute('DELETE FROM transcripts WHERE cache_key = ?', (key,))
+                return None
+
+            # Mise à jour de l'accès pour l'éviction LRU
+            self._conn.execute('UPDATE transcripts SET last_access = ? WHERE cache_key = ?', (now, key))
+
+        timing = json.loads(timing) if timing else {}
+        return {
+            'text': transcript,
+            'language': language,
+            'duration': timing.get('duration'),
+            'segments': timing.get('segments', []),
+            'words': timing.get('words', [])
+        }
+
+    def set(self, key, transcript, language=None, segments=None, words=None, duration=None):
+        """
+        Enregistre une transcription (et ses horodatages) puis applique l'éviction (TTL + LRU)
+        """
+        timing = None
+        if segments or words:
+            timing = json.dumps({'duration': duration, 'segments': segments or [], 'words': words or []},
+                                ensure_ascii=False, separators=(',', ':'))
+        now = time.time()
+        with self._lock:
+            self._conn.execute(
+                'INSERT OR REPLACE INTO transcripts (cache_key, transcript, language, created_at, last_access, timing) '
+                'VALUES (?, ?, ?, ?, ?, ?)',
+                (key, transcript, language, now, now, timing)
+            )
+            self._evict(now)
+
+    def _evict(self, now):
+        """Supprime les entrées expirées puis les moins récemment utilisées au-delà de la limite"""
+        if self.ttl:
+            self._conn.execute('DELETE FROM transcripts WHERE created_at < ?', (now - self.ttl,))
+        if self.max_entries:
+            self._conn.execute(
+                'DELETE FROM transcripts WHERE cache_key IN ('
+                ' SELECT cache_key FROM transcripts ORDER BY last_access DESC LIMIT -1 OFFSET ?'
+                ')',
+                (self.max_entries,)
+            )
+
+    def clear(self):
+        """Vide entièrement le cache"""
+        with self._lock:
+            self._conn.execute('DELETE FROM transcripts')
@@ -0,0 +1,128 @@
+import json
+
+# Formats de sortie de /transcribe?format=... et type MIME de la réponse
+MIMETYPES = {
+    'text': 'text/plain; charset=utf-8',
+    'srt': 'application/x-subrip; charset=utf-8',
+    'vtt': 'text/vtt; charset=utf-8',
+    'json': 'application/json',
+}
+
+
+def _clock(seconds, separator):
+    """Horodatage HH:MM:SS,mmm (SRT) ou HH:MM:SS.mmm (WebVTT)"""
+    millis = int(round(max(seconds or 0.0, 0.0) * 1000))
+    hours, millis = divmod(millis, 3600000)
+    minutes, millis = divmod(millis, 60000)
+    secs, millis = divmod(millis, 1000)
+    return f'{hours:02d}:{minutes:02d}:{secs:02d}{separator}{millis:03d}'
+
+
+def _segments(transcript):
+    """Segments horodatés; sans horodatage, un segment unique couvrant toute la transcription"""
+    return transcript.get('segments') or [
+        {'start': 0.0, 'end': transcript.get('duration') or 0.0, 'text': transcript.get('text') or ''}
+    ]
+
+
+def _with_words(segments, words):
+    """Associe à chaque segment ses mots, en un seul parcours des deux listes (triées par début)"""
+    index = 0
+    last = len(segments) - 1
+    for position, segment in enumerate(segments):
+        start = index
+        # Le dernier segment reçoit aussi les mots qui dépasseraient sa fin
+        while index < len(words) and (position == last or words[index]['start'] < segment['end']):
+            index += 1
+        yield segment, words[start:index]
+
+
+def render_text(transcript, words=False):
+    """Texte brut, une ligne par segment"""
+    for segment in _segments(transcript):
+        text = segment['text'].strip()
+        if text:
+            yield text + '\n'
+
+
+def render_srt(transcript, words=False):
+    """Sous-titres SubRip: un bloc par segment, ou par mot si `words` et horodatages par mot disponibles"""
+    cues = transcript.get('words') if words else None
+    if cues:
+        cues = ({'start': word['start'], 'end': word['end'], 'text': word['word']} for word in cues)
+    else:
+        cues = _segments(transcript)
+    number = 0
+    for cue in cues:
+        text = cue['text'].strip()
+        if not text:
+            continue
+        number += 1
+        yield f"{number}\n{_clock(cue['start'], ',')} --> {_clock(cue['end'], ',')}\n{text}\n\n"
+
+
+def render_vtt(transcript, words=False):
+    """
+    Sous-titres WebVTT: un bloc par segment; avec `words`, chaque mot porte son horodatage
+    (balises de temps WebVTT, mise en évidence mot à mot par le lecteur)
+    """
+    yield 'WEBVTT\n\n'
+    segments = _segments(transcript)
+    timed_words = transcript.get('words') if words else None
+    pairs = _with_words(segments, timed_words) if timed_words else ((segment, None) for segment in segments)
+    for segment, segment_words in pairs:
+        if segment_words:
+            text = ' '.join(
+                (f"<{_clock(word['start'], '.')}>" if i else '') + word['word'].strip()
+                for i, word in enumerate(segment_words)
+            )
+        else:
+            text = segment['text'].strip()
+        if text:
+            yield f"{_clock(segment['start'], '.')} --> {_clock(segment['end'], '.')}\n{text}\n\n"
+
+
+def _json_array(name, items):
+    yield f', "{name}": ['
+    for i, item in enumerate(items):
+        yield (', ' if i else '') + json.dumps(item, ensure_ascii=False)
+    yield ']'
+
+
+def render_json(transcript, words=False):
+    """Document JSON {text, language, duration, segments[, words]}, émis élément par élément"""
+    yield '{"text": ' + json.dumps(transcript.get('text') or '', ensure_ascii=False)
+    yield ', "language": ' + json.dumps(transcript.get('language'), ensure_ascii=False)
+    yield ', "duration": ' + json.dumps(transcript.get('duration'))
+    yield from _json_array('segments', transcript.get('segments') or [])
+    if words:
+        yield from _json_array('words', transcript.get('words') or [])
+    yield '}\n'
+
+
+RENDERERS = {
+    'text': render_text,
+    'srt': render_srt,
+    'vtt': render_vtt,
+    'json': render_json,
+}
+
+
+def render(transcript, output_format, words=False, buffer_size=16 * 1024):
+    """
+    Générateur des morceaux de la transcription au format demandé, encodés en UTF-8
+    ({'text', 'language', 'duration', 'segments', 'words'}, tel que servi par le cache):
+    la réponse est diffusée par blocs d'environ `buffer_size` octets, sans assembler
+    le document en mémoire.
+    """
+    pending = []
+    size = 0
+    for chunk in RENDERERS[output_format](transcript, words):
+        pending.append(chunk)
+        size += len(chunk)
+        if size >= buffer_size:
+            yield ''.join(pending).encode('utf-8')
+            pending = []
+            size = 0
+    if pending:
+        yield ''.join(pending).encode('utf-8')
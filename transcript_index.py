@@ -0,0 +1,220 @@
+import os
+import queue
+import re
+import sqlite3
+import threading
+import time
+from config import Config
+
+_TERM_RE = re.compile(r'"([^"]+)"|(\w+)', re.UNICODE)
+
+HIGHLIGHT_START = '<mark>'
+HIGHLIGHT_END = '</mark>'
+
+
+def fts_query(text):
+    """
+    Convertit une recherche libre en requête FTS5 sûre: mots et "expressions exactes"
+    entre guillemets, tous requis; le dernier mot est cherché en préfixe (saisie en cours).
+    Retourne '' si la recherche ne contient aucun terme.
+    """
+    terms = []
+    for phrase, word in _TERM_RE.findall(text or ''):
+        term = (phrase or word).replace('"', '""')
+        terms.append((f'"{term}"', bool(word)))
+    if not terms:
+        return ''
+    last, is_word = terms[-1]
+    if is_word and not (text or '').endswith(' '):
+        terms[-1] = (f'{last}*', is_word)
+    return ' AND '.join(term for term, _ in terms)
+
+
+class TranscriptIndex:
+    """
+    Index plein texte des transcriptions (SQLite FTS5), découpé en segments horodatés
+    pour situer chaque occurrence dans la vidéo.
+
+    Les écritures sont mises en file et appliquées par un thread dédié, par lots
+    (une transaction pour TRANSCRIPT_INDEX_BATCH_SIZE vidéos au plus, toutes les
+    TRANSCRIPT_INDEX_FLUSH_SECONDS secondes): la requête de transcription n'attend pas l'index.
+    """
+
+    def __init__(self, db_path=None, batch_size=None, flush_interval=None):
+        self.db_path = db_path or Config.TRANSCRIPT_INDEX_PATH
+        self.batch_size = batch_size or Config.TRANSCRIPT_INDEX_BATCH_SIZE
+        self.flush_interval = Config.TRANSCRIPT_INDEX_FLUSH_SECONDS if flush_interval is None else flush_interval
+        self._lock = threading.Lock()
+        self._pending = queue.Queue()
+        self._writer = None
+        self._writer_lock = threading.Lock()
+        self.indexed = 0
+        self.batches = 0
+
+        folder = os.path.dirname(self.db_path)
+        if folder:
+            os.makedirs(folder, exist_ok=True)
+
+        # Une seule connexion partagée (thread d'écriture et recherches), protégée par un verrou
+        self._conn = sqlite3.connect(self.db_path, check_same_thread=False, isolation_level=None)
+        self._conn.execute('PRAGMA journal_mode=WAL')
+        self._conn.execute('PRAGMA synchronous=NORMAL')
+        self._conn.executescript(
+            'CREATE TABLE IF NOT EXISTS videos ('
+            ' video_key TEXT PRIMARY KEY,'
+            ' url TEXT,'
+            ' platform TEXT,'
+            ' language TEXT,'
+            ' duration REAL,'
+            ' indexed_at REAL NOT NULL'
+            ');'
+            'CREATE TABLE IF NOT EXISTS segments ('
+            ' id INTEGER PRIMARY KEY,'
+            ' video_key TEXT NOT NULL,'
+            ' start REAL,'
+            ' end REAL,'
+            ' text TEXT NOT NULL'
+            ');'
+            'CREATE INDEX IF NOT EXISTS idx_segments_video ON segments (video_key);'
+            # Index inversé à contenu externe: le texte n'est stocké qu'une fois (table segments)
+            "CREATE VIRTUAL TABLE IF NOT EXISTS segments_fts USING fts5("
+            " text, content='segments', content_rowid='id', tokenize='unicode61 remove_diacritics 2'"
+            ');'
+            'CREATE TRIGGER IF NOT EXISTS segments_ai AFTER INSERT ON segments BEGIN'
+            ' INSERT INTO segments_fts (rowid, text) VALUES (new.id, new.text);'
+            ' END;'
+            'CREATE TRIGGER IF NOT EXISTS segments_ad AFTER DELETE ON segments BEGIN'
+            " INSERT INTO segments_fts (segments_fts, rowid, text) VALUES ('delete', old.id, old.text);"
+            ' END;'
+        )
+
+    def add(self, video_key, text, language=None, segments=None, url=None, platform=None, duration=None):
+        """
+        Programme l'indexation (ou la réindexation) d'une transcription, sans attendre l'écriture.
+        Sans segments horodatés, le texte entier forme un segment unique.
+        """
+        if not video_key or not text:
+            return
+        rows = [
+            (segment.get('start'), segment.get('end'), (segment.get('text') or '').strip())
+            for segment in segments or []
+            if (segment.get('text') or '').strip()
+        ] or [(None, None, text.strip())]
+        self._pending.put((video_key, url, platform, language, duration, rows))
+        self._ensure_writer()
+
+    def _ensure_writer(self):
+        if self._writer is None:
+            with self._writer_lock:
+                if self._writer is None:
+                    self._writer = threading.Thread(target=self._write_loop, name='transcript-index', daemon=True)
+                    self._writer.start()
+
+    def _write_loop(self):
+        while True:
+            batch = [self._pending.get()]
+            # Regroupe ce qui arrive pendant la fenêtre de regroupement (une transaction par lot)
+            deadline = time.monotonic() + self.flush_interval
+            while len(batch) < self.batch_size:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                try:
+                    batch.append(self._pending.get(timeout=remaining))
+                except queue.Empty:
+                    break
+            try:
+                self._write(batch)
+            except Exception as e:
+                print(f"Indexation des transcriptions impossible: {str(e)}")
+            finally:
+                for _ in batch:
+                    self._pending.task_done()
+
+    def _write(self, batch):
+        now = time.time()
+        with self._lock:
+            self._conn.execute('BEGIN')
+            try:
+                for video_key, url, platform, language, duration, rows in batch:
+                    self._conn.execute('DELETE FROM segments WHERE video_key = ?', (video_key,))
+                    self._conn.execute(
+                        'INSERT OR REPLACE INTO videos (video_key, url, platform, language, duration, indexed_at) '
+                        'VALUES (?, ?, ?, ?, ?, ?)',
+                        (video_key, url, platform, language, duration, now)
+                    )
+                    self._conn.executemany(
+                        'INSERT INTO segments (video_key, start, end, text) VALUES (?, ?, ?, ?)',
+                        [(video_key, start, end, text) for start, end, text in rows]
+                    )
+                self._conn.execute('COMMIT')
+            except Exception:
+                self._conn.execute('ROLLBACK')
+                raise
+            self.indexed += len(batch)
+            self.batches += 1
+
+    def flush(self):
+        """Attend que toutes les écritures en file soient appliquées"""
+        self._pending.join()
+
+    def search(self, text, limit=20, offset=0, matches_per_video=3):
+        """
+        Recherche classée (BM25) des vidéos dont au moins un segment contient tous les termes.
+
+        Returns:
+            list: une entrée par vidéo {'video_key', 'url', 'platform', 'language', 'score',
+                  'match_count', 'matches': [{'start', 'end', 'snippet'}]}, meilleures d'abord
+        """
+        match = fts_query(text)
+        if not match:
+            return []
+        with self._lock:
+            rows = self._conn.execute(
+                'SELECT s.video_key, s.start, s.end,'
+                ' snippet(segments_fts, 0, ?, ?, ?, 24), bm25(segments_fts)'
+                ' FROM segments_fts JOIN segments s ON s.id = segments_fts.rowid'
+                ' WHERE segments_fts MATCH ?'
+                ' ORDER BY bm25(segments_fts)'
+                ' LIMIT ?',
+                (HIGHLIGHT_START, HIGHLIGHT_END, '…', match, Config.TRANSCRIPT_INDEX_MAX_SEGMENTS)
+            ).fetchall()
+
+            # Regroupement par vidéo: score = somme des pertinences de ses segments
+            results = {}
+            for video_key, start, end, snippet, rank in rows:
+                entry = results.get(video_key)
+                if entry is None:
+                    entry = results[video_key] = {'video_key': video_key, 'score': 0.0, 'match_count': 0, 'matches': []}
+                entry['score'] -= rank
+                entry['match_count'] += 1
+                if len(entry['matches']) < matches_per_video:
+                    entry['matches'].append({'start': start, 'end': end, 'snippet': snippet})
+
+            ranked = sorted(results.values(), key=lambda entry: entry['score'], reverse=True)[offset:offset + limit]
+            if ranked:
+                placeholders = ','.join('?' * len(ranked))
+                videos = {
+                    row[0]: row[1:]
+                    for row in self._conn.execute(
+                        f'SELECT video_key, url, platform, language FROM videos WHERE video_key IN ({placeholders})',
+                        [entry['video_key'] for entry in ranked]
+                    )
+                }
+        for entry in ranked:
+            url, platform, language = videos.get(entry['video_key'], (None, None, None))
+            entry.update(url=url, platform=platform, language=language, score=round(entry['score'], 4))
+            entry['matches'].sort(key=lambda match: match['start'] if match['start'] is not None else 0.0)
+        return ranked
+
+    def stats(self):
+        with self._lock:
+            videos = self._conn.execute('SELECT COUNT(*) FROM videos').fetchone()[0]
+            segments = self._conn.execute('SELECT COUNT(*) FROM segments').fetchone()[0]
+        return {
+            'videos': videos,
+            'segments': segments,
+            'pending': self._pending.qsize(),
+            'indexed': self.indexed,
+            'batches': self.batches,
+        }
@@ -0,0 +1,134 @@
+import re
+from typing import NamedTuple
+from urllib.parse import urlsplit
+from config import Config
+from http_client import get_session
+from video_info_cache import VideoInfoCache
+
+BROWSER_USER_AGENT = (
+    'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 '
+    '(KHTML, like Gecko) Chrome/120.0.0.0 Safari/537.36'
+)
+
+
+class ResolvedUrl(NamedTuple):
+    """URL normalisée: plateforme, identifiant canonique de la vidéo, URL canonique"""
+    platform: str
+    canonical_id: str
+    canonical_url: str
+
+    @property
+    def key(self):
+        """Clé canonique partagée par les caches, le dédoublonnage et la coalescence (ex: 'tiktok:123')"""
+        return f'{self.platform.lower()}:{self.canonical_id}'
+
+
+# Motifs précompilés appliqués au chemin de l'URL: (regex, fabrique (id, URL canonique), lien court)
+_INSTAGRAM = [
+    (re.compile(r'/(?:[\w.]+/)?(p|reels?|tv)/([\w-]+)'),
+     lambda m: (m.group(2), f"https://www.instagram.com/{'reel' if m.group(1).startswith('reel') else m.group(1)}/{m.group(2)}/"),
+     False),
+]
+_TIKTOK = [
+    (re.compile(r'/@([\w.-]+)/video/(\d+)'),
+     lambda m: (m.group(2), f'https://www.tiktok.com/@{m.group(1)}/video/{m.group(2)}'),
+     False),
+    (re.compile(r'/v/(\d+)(?:\.html)?'),
+     lambda m: (m.group(1), f'https://m.tiktok.com/v/{m.group(1)}.html'),
+     False),
+    (re.compile(r'/t/(\w+)'),
+     lambda m: (f'short-{m.group(1)}', f'https://www.tiktok.com/t/{m.group(1)}/'),
+     True),
+]
+_TIKTOK_SHORT = [
+    (re.compile(r'/(\w+)'),
+     lambda m: (f'short-{m.group(1)}', None),
+     True),
+]
+_VIMEO = [
+    (re.compile(r'/(?:channels/[\w-]+/|ondemand/[\w-]+/)?(\d+)'),
+     lambda m: (m.group(1), f'https://vimeo.com/{m.group(1)}'),
+     False),
+]
+_VIMEO_PLAYER = [
+    (re.compile(r'/video/(\d+)'),
+     lambda m: (m.group(1), f'https://vimeo.com/{m.group(1)}'),
+     False),
+]
+
+# Aiguillage par nom d'hôte (dict): une seule analyse de l'URL, aucun parcours séquentiel
+ROUTES = {host: ('Instagram', _INSTAGRAM) for host in Config.ALLOWED_HOSTS}
+ROUTES.update({
+    'tiktok.com': ('TikTok', _TIKTOK),
+    'www.tiktok.com': ('TikTok', _TIKTOK),
+    'm.tiktok.com': ('TikTok', _TIKTOK),
+    'vm.tiktok.com': ('TikTok', _TIKTOK_SHORT),
+    'vt.tiktok.com': ('TikTok', _TIKTOK_SHORT),
+    'vimeo.com': ('Vimeo', _VIMEO),
+    'www.vimeo.com': ('Vimeo', _VIMEO),
+    'player.vimeo.com': ('Vimeo', _VIMEO_PLAYER),
+})
+
+
+def _parse(url):
+    """Retourne (ResolvedUrl, lien court) ou (None, False) si l'URL n'est pas prise en charge"""
+    try:
+        parts = urlsplit(url.strip())
+        host = parts.hostname
+    except (AttributeError, ValueError):
+        return None, False
+    if parts.scheme not in ('http', 'https') or host not in ROUTES:
+        return None, False
+
+    platform, patterns = ROUTES[host]
+    for pattern, build, short in patterns:
+        match = pattern.match(parts.path)
+        if match:
+            canonical_id, canonical_url = build(match)
+            return ResolvedUrl(platform, canonical_id, canonical_url or f'https://{host}{match.group(0)}'), short
+    return None, False
+
+
+def parse_url(url):
+    """
+    Analyse sans accès réseau: ResolvedUrl, ou None si l'URL n'est pas une vidéo prise en charge.
+    Un lien court (vm.tiktok.com, tiktok.com/t/) garde un identifiant 'short-<code>'.
+    """
+    return _parse(url)[0]
+
+
+def _follow_short_link(url):
+    """Suit les redirections d'un lien court jusqu'à l'URL complète de la vidéo"""
+    response = get_session().head(
+        url, allow_redirects=True, timeout=Config.SHORT_LINK_TIMEOUT,
+        headers={'User-Agent': BROWSER_USER_AGENT},
+    )
+    for candidate in [response.url] + [r.headers.get('Location') or '' for r in reversed(response.history)]:
+        resolved, short = _parse(candidate)
+        if resolved and not short:
+            return resolved
+    raise Exception(f"Lien court non résolu (HTTP {response.status_code})")
+
+
+# Liens courts déjà résolus (mémoire, LRU): une seule requête réseau par lien
+short_links = VideoInfoCache(
+    ttl=Config.SHORT_LINK_CACHE_TTL,
+    negative_ttl=Config.VIDEO_INFO_NEGATIVE_TTL,
+    max_entries=Config.SHORT_LINK_CACHE_MAX_ENTRIES,
+)
+
+
+def resolve_url(url):
+    """
+    Comme parse_url, en résolvant en plus les liens courts (une fois, résultat mis en cache)
+    pour que toutes les formes d'une même vidéo partagent la même clé canonique.
+    En cas d'échec de la résolution, la forme courte est conservée.
+    """
+    resolved, short = _parse(url)
+    if resolved is None or not short or not Config.SHORT_LINK_RESOLVE:
+        return resolved
+    try:
+        target, _ = short_links.get(resolved.key, lambda: _follow_short_link(resolved.canonical_url))
+        return target
+    except Exception:
+        return resolved
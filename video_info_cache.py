@@ -0,0 +1,120 @@
+import re
+import threading
+import time
+from collections import OrderedDict
+from config import Config
+from single_flight import SingleFlight
+
+# Statut HTTP cité par yt-dlp ("HTTP Error 404: Not Found") ou par requests ("404 Client Error")
+HTTP_STATUS = re.compile(r'http error (\d{3})|\b(\d{3}) (?:client|server) error')
+DEAD_HTTP_STATUSES = ('404', '410')
+
+# Messages explicites des extracteurs pour une vidéo supprimée, privée ou inexistante
+DEAD_LINK_MARKERS = (
+    'video unavailable', 'video is unavailable', 'video not available', 'video is not available',
+    'post is unavailable',
+    'has been removed', 'was removed', 'has been deleted', 'was deleted',
+    'private video', 'video is private', 'account is private', 'does not exist',
+)
+
+# Pannes ou refus temporaires: jamais considérés comme un lien mort, même si le message
+# contient aussi un marqueur ("Service Unavailable", "not available, rate-limit reached
+# or login required")
+TRANSIENT_MARKERS = (
+    'rate-limit', 'rate limit', 'too many requests', 'login required', 'log in', 'sign in',
+    'temporarily', 'timed out', 'try again',
+)
+
+
+class DeadLinkError(Exception):
+    """Vidéo supprimée, privée ou inexistante (résultat servi depuis le cache négatif)"""
+
+
+def is_dead_link(error):
+    """
+    Lien mort: HTTP 404/410 ou message explicite de l'extracteur. Les erreurs 5xx, 429,
+    de limitation de débit ou de connexion requise sont transitoires (réessayées).
+    """
+    message = str(error).lower()
+    if any(marker in message for marker in TRANSIENT_MARKERS):
+        return False
+    statuses = [code for match in HTTP_STATUS.finditer(message) for code in match.groups() if code]
+    if statuses:
+        return all(status in DEAD_HTTP_STATUSES for status in statuses)
+    return any(marker in message for marker in DEAD_LINK_MARKERS)
+
+
+class VideoInfoCache:
+    """
+    Cache mémoire des métadonnées vidéo (titre, durée, auteur, compteurs).
+
+    Les succès sont conservés `ttl` secondes, les liens morts `negative_ttl` secondes;
+    au-delà de `max_entries` les entrées les moins récemment utilisées sont évincées.
+    Les requêtes concurrentes sur une même clé partagent une seule extraction.
+    """
+
+    def __init__(self, ttl=None, negative_ttl=None, max_entries=None):
+        self.ttl = Config.VIDEO_INFO_CACHE_TTL if ttl is None else ttl
+        self.negative_ttl = Config.VIDEO_INFO_NEGATIVE_TTL if negative_ttl is None else negative_ttl
+        self.max_entries = Config.VIDEO_INFO_CACHE_MAX_ENTRIES if max_entries is None else max_entries
+        self._lock = threading.Lock()
+        self._entries = OrderedDict()
+        self._flight = SingleFlight()
+        self.hits = 0
+        self.negative_hits = 0
+        self.misses = 0
+
+    def get(self, key, loader):
+        """
+        Retourne les métadonnées de `key`, chargées via `loader()` si absentes ou expirées.
+        Lève DeadLinkError pour un lien mort (éventuellement depuis le cache négatif).
+
+        Returns:
+            tuple: (dict des métadonnées, True si servi depuis le cache)
+        """
+        now = time.monotonic()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and entry[0] <= now:
+                del self._entries[key]
+                entry = None
+            if entry is not None:
+                self._entries.move_to_end(key)
+                if entry[2]:
+                    self.negative_hits += 1
+                    raise DeadLinkError(entry[1])
+                self.hits += 1
+                return entry[1], True
+            self.misses += 1
+
+        info, _ = self._flight.do(key, lambda: self._load(key, loader))
+        return info, False
+
+    def _load(self, key, loader):
+        try:
+            info = loader()
+        except Exception as e:
+            if not is_dead_link(e):
+                raise
+            self._store(key, str(e), self.negative_ttl, negative=True)
+            raise DeadLinkError(str(e))
+        self._store(key, info, self.ttl)
+        return info
+
+    def _store(self, key, value, ttl, negative=False):
+        if ttl <= 0:
+            return
+        with self._lock:
+            self._entries[key] = (time.monotonic() + ttl, value, negative)
+            self._entries.move_to_end(key)
+            while self.max_entries and len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def stats(self):
+        with self._lock:
+            return {
+                'entries': len(self._entries),
+                'hits': self.hits,
+                'negative_hits': self.negative_hits,
+                'misses': self.misses,
+            }
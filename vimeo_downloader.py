@@ -1,8 +1,14 @@
 import os
-import re
-import requests
-import yt_dlp
+import time
 from config import Config
+from http_client import get_session
+from async_http import get_async_client
+from media_extraction import extract_and_download, prepare_for_transcription, make_progress_hook, extract_video_info, TRANSCRIPTION_FORMAT
+from workspace import workspaces, work_outtmpl
+from strategy_engine import StrategyEngine, browser_cookies_available
+from segmented_download import segmented_downloader
+from metrics import timed, count_fallback, stage_duration
+from url_resolver import parse_url
 
 
 class VimeoDownloader:
@@ -30,15 +36,10 @@ class VimeoDownloader:
             }
         }
 
-        # Extraction audio (MP3)
+        # Transcription: flux audio seul privilégié, préparé ensuite par prepare_for_transcription
         self.audio_opts = self.base_opts.copy()
         self.audio_opts.update({
-            'format': 'bestaudio/best',
-            'postprocessors': [{
-                'key': 'FFmpegExtractAudio',
-                'preferredcodec': 'mp3',
-                'preferredquality': '192',
-            }]
+            'format': TRANSCRIPTION_FORMAT,
         })
 
         # Téléchargement vidéo (MP4 si possible)
@@ -47,24 +48,33 @@ class VimeoDownloader:
             'format': 'best[ext=mp4]/best'
         })
 
+        # Stratégies d'extraction de repli; celles qui ne peuvent pas aboutir ici
+        # (cookies d'un navigateur absent, ex. serveur Linux headless) sont écartées
+        no_api = {'extractor_args': {'vimeo': {'use_api': ['no']}}}
+        self.option_strategies = [
+            (name, options)
+            for name, options in [
+                ('no_api', no_api),
+                ('safari_cookies', dict(no_api, cookiesfrombrowser=('safari',))),
+                ('chrome_cookies', dict(no_api, cookiesfrombrowser=('chrome',))),
+                ('generic', {'force_generic_extractor': True}),
+            ]
+            if 'cookiesfrombrowser' not in options or browser_cookies_available(options['cookiesfrombrowser'][0])
+        ]
+        self.strategies = StrategyEngine()
+
     def validate_vimeo_url(self, url: str) -> bool:
         """Valide si l'URL correspond à un format Vimeo connu."""
-        patterns = [
-            r'https?://(?:www\.)?vimeo\.com/\d+',
-            r'https?://(?:www\.)?vimeo\.com/channels/[\w-]+/\d+',
-            r'https?://player\.vimeo\.com/video/\d+',
-            r'https?://(?:www\.)?vimeo\.com/ondemand/[\w-]+/\d+',
-        ]
-        return any(re.match(p, url) for p in patterns)
+        resolved = parse_url(url)
+        return resolved is not None and resolved.platform == 'Vimeo'
 
-    def _extract_video_id(self, url: str) -> str:
-        match = re.search(r'(?:vimeo\.com/(?:.*?/)?(\d+)|player\.vimeo\.com/video/(\d+))', url)
-        if not match:
-            return ''
-        return match.group(1) or match.group(2)
+    def extract_video_id(self, url: str) -> str:
+        """Extrait l'identifiant numérique de la vidéo Vimeo ('' si introuvable)."""
+        resolved = parse_url(url)
+        return resolved.canonical_id if resolved and resolved.platform == 'Vimeo' else ''
 
-    def _fetch_player_config(self, video_id: str) -> dict:
-        """Récupère le JSON de configuration du player Vimeo pour obtenir des URLs directes."""
+    def _player_config_requests(self, video_id: str):
+        """Endpoints de configuration du player et en-têtes associés."""
         endpoints = [
             f'https://player.vimeo.com/video/{video_id}/config',
             f'https://player.vimeo.com/video/{video_id}/config?autoplay=1&dnt=1',
@@ -76,15 +86,38 @@ class VimeoDownloader:
             'Accept': 'application/json,text/html;q=0.9,*/*;q=0.8',
             'Accept-Language': 'en-US,en;q=0.9',
         }
+        return endpoints, headers
+
+    @timed('player_config', platform='Vimeo')
+    def _fetch_player_config(self, video_id: str) -> dict:
+        """Récupère le JSON de configuration du player Vimeo pour obtenir des URLs directes."""
+        endpoints, headers = self._player_config_requests(video_id)
         for endpoint in endpoints:
             try:
-                resp = requests.get(endpoint, headers=headers, timeout=10)
+                resp = get_session().get(endpoint, headers=headers, timeout=10)
                 if resp.status_code == 200 and resp.headers.get('content-type', '').startswith('application/json'):
                     return resp.json()
             except Exception:
                 continue
         return {}
 
+    async def _afetch_player_config(self, video_id: str) -> dict:
+        """Version asynchrone de _fetch_player_config (serveur ASGI)."""
+        endpoints, headers = self._player_config_requests(video_id)
+        # Mesure explicite: plusieurs coroutines partagent le même thread
+        start = time.perf_counter()
+        try:
+            for endpoint in endpoints:
+                try:
+                    resp = await get_async_client().get(endpoint, headers=headers, timeout=10)
+                    if resp.status_code == 200 and resp.headers.get('content-type', '').startswith('application/json'):
+                        return resp.json()
+                except Exception:
+                    continue
+        finally:
+            stage_duration.observe(time.perf_counter() - start, stage='player_config', platform='Vimeo')
+        return {}
+
     def _get_best_direct_url(self, config_json: dict) -> str:
         """Retourne une URL directe (MP4 ou HLS) depuis le JSON de config du player."""
         try:
@@ -107,31 +140,152 @@ class VimeoDownloader:
             pass
         return ''
 
-    def download_video(self, url: str) -> str:
+    def get_direct_media(self, url: str):
+        """
+        Résout l'URL MP4 progressive via la config du player (None si seul le HLS est disponible).
+        """
+        video_id = self.extract_video_id(url)
+        if not video_id:
+            return None
+        return self._direct_media(video_id, self._fetch_player_config(video_id))
+
+    async def aget_direct_media(self, url: str):
+        """Version asynchrone de get_direct_media (aucun thread bloqué pendant l'appel réseau)."""
+        video_id = self.extract_video_id(url)
+        if not video_id:
+            return None
+        return self._direct_media(video_id, await self._afetch_player_config(video_id))
+
+    def _direct_media(self, video_id: str, config_json: dict):
+        direct_url = self._get_best_direct_url(config_json)
+        if not direct_url or '.m3u8' in direct_url:
+            return None
+        return {
+            'url': direct_url,
+            'http_headers': {
+                'User-Agent': self.base_opts['http_headers']['User-Agent'],
+                'Referer': f'https://vimeo.com/{video_id}',
+                'Origin': 'https://vimeo.com',
+            },
+            'ext': 'mp4',
+            'filesize': None,
+        }
+
+    def _segmented_download(self, media_url: str, video_id: str, work_dir: str, progress=None):
+        """
+        Téléchargement parallèle et reprenable d'une URL directe (MP4 progressif ou HLS).
+        Retourne None en cas d'échec: repli sur yt-dlp, la progression reste reprenable.
+        """
+        if not Config.SEGMENTED_DOWNLOAD_ENABLED:
+            return None
+        kind = 'hls' if '.m3u8' in media_url else 'progressive'
+        try:
+            return segmented_downloader.download(
+                media_url,
+                work_outtmpl(work_dir),
+                headers={
+                    'User-Agent': self.base_opts['http_headers']['User-Agent'],
+                    'Referer': f'https://vimeo.com/{video_id}',
+                    'Origin': 'https://vimeo.com',
+                },
+                resume_key=f'vimeo-{video_id}-{kind}',
+                progress=progress,
+            )
+        except Exception as e:
+            print(f"Téléchargement segmenté Vimeo impossible, repli sur yt-dlp: {str(e)}")
+            count_fallback('segmented_download', platform='Vimeo')
+            return None
+
+    @timed('info', platform='Vimeo')
+    def get_video_info(self, url: str) -> dict:
         """
-        Télécharge la vidéo Vimeo et retourne le chemin du fichier audio extrait (MP3 si possible).
+        Récupère les informations d'une vidéo Vimeo sans la télécharger.
+        Repli sur la config du player (sans compteurs) si l'extracteur yt-dlp échoue.
+        """
+        try:
+            return extract_video_info(self.base_opts, url)
+        except Exception as e:
+            error = e
+
+        video_id = self.extract_video_id(url)
+        video = (self._fetch_player_config(video_id) if video_id else {}).get('video') or {}
+        if not video:
+            raise Exception(f"Erreur lors de la récupération des infos Vimeo: {str(error)}")
+        thumbs = video.get('thumbs') or {}
+        return {
+            'title': video.get('title') or 'Sans titre',
+            'author': (video.get('owner') or {}).get('name') or 'Inconnu',
+            'duration': video.get('duration') or 0,
+            'view_count': 0,
+            'like_count': 0,
+            'comment_count': 0,
+            'description': '',
+            'upload_date': '',
+            'thumbnail': thumbs.get('base') or thumbs.get('640') or '',
+        }
+
+    def _download_with_strategies(self, opts: dict, attempt_urls: list, work_dir: str):
+        """
+        Essaie les combinaisons (stratégie d'options, variante d'URL) dans l'ordre appris,
+        en course entre les deux meilleures si VIMEO_RACE_STRATEGIES est activé.
+        Retourne (info, chemin du fichier).
+        """
+        race = Config.VIMEO_RACE_STRATEGIES
+
+        def make_attempt(key, options, test_url):
+            def attempt(cancelled):
+                attempt_opts = opts.copy()
+                attempt_opts.update(options)
+                if race:
+                    # Chaque concurrente écrit dans son sous-dossier et s'arrête si elle a perdu
+                    attempt_opts['outtmpl'] = work_outtmpl(os.path.join(work_dir, key.replace('/', '-')))
+
+                    def abort_if_lost(_):
+                        if cancelled.is_set():
+                            raise Exception('Tentative interrompue (course perdue)')
+
+                    attempt_opts['progress_hooks'] = list(opts.get('progress_hooks') or []) + [abort_if_lost]
+                return extract_and_download(attempt_opts, test_url)
+            return attempt
+
+        candidates = [
+            (f'{name}/{variant}', make_attempt(f'{name}/{variant}', options, test_url))
+            for name, options in self.option_strategies
+            for variant, test_url in attempt_urls
+        ]
+        _, result = self.strategies.run(candidates, race=race)
+        return result
+
+    @timed('audio_fetch', platform='Vimeo')
+    def download_video(self, url: str, progress=None) -> str:
+        """
+        Télécharge la vidéo Vimeo et retourne le chemin du fichier audio prêt pour Whisper.
         """
         if not self.validate_vimeo_url(url):
             raise ValueError('URL Vimeo invalide')
 
+        work_dir = None
         try:
             # Normaliser l'URL pour éviter les problèmes d'OAuth sur les URLs player
-            normalized_url = url
-            m = re.search(r'(?:vimeo\.com/(?:.*?/)?(\d+)|player\.vimeo\.com/video/(\d+))', url)
-            video_id = None
-            if m:
-                video_id = m.group(1) or m.group(2)
-                normalized_url = f'https://vimeo.com/{video_id}'
+            resolved = parse_url(url)
+            normalized_url = resolved.canonical_url
+            video_id = resolved.canonical_id
+            # Dossier de travail isolé de la requête
+            work_dir = workspaces.create('vimeo')
             # Variantes d'URL à tenter, incluant une URL directe si disponible
             attempt_urls = []
             if video_id:
                 config_json = self._fetch_player_config(video_id)
                 direct_url = self._get_best_direct_url(config_json)
                 if direct_url:
-                    attempt_urls.append(direct_url)
-            attempt_urls.append(normalized_url)
+                    # URL directe: téléchargement segmenté d'abord, yt-dlp en repli
+                    filename = self._segmented_download(direct_url, video_id, work_dir, progress)
+                    if filename:
+                        return prepare_for_transcription({}, filename, progress=progress)
+                    attempt_urls.append(('direct', direct_url))
+            attempt_urls.append(('page', normalized_url))
             if video_id:
-                attempt_urls.append(f'https://player.vimeo.com/video/{video_id}')
+                attempt_urls.append(('player', f'https://player.vimeo.com/video/{video_id}'))
 
             # Cloner les options et ajuster les en-têtes dynamiques
             opts = self.audio_opts.copy()
@@ -140,68 +294,44 @@ class VimeoDownloader:
                 headers['Referer'] = f'https://vimeo.com/{video_id}'
                 headers['Origin'] = 'https://vimeo.com'
             opts['http_headers'] = headers
+            opts['outtmpl'] = work_outtmpl(work_dir)
+            if progress:
+                opts['progress_hooks'] = [make_progress_hook(progress)]
 
-            filename = None
-            last_err = None
-            # 1) Tentatives avec différentes options et variantes d'URL
-            option_attempts = [
-                {'extractor_args': {'vimeo': {'use_api': ['no']}}},
-                {'extractor_args': {'vimeo': {'use_api': ['no']}}, 'cookiesfrombrowser': ('safari',)},
-                {'extractor_args': {'vimeo': {'use_api': ['no']}}, 'cookiesfrombrowser': ('chrome',)},
-                {'force_generic_extractor': True},
-            ]
-            for attempt in option_attempts:
-                for test_url in attempt_urls:
-                    try:
-                        attempt_opts = opts.copy()
-                        attempt_opts.update(attempt)
-                        with yt_dlp.YoutubeDL(attempt_opts) as ydl:
-                            info = ydl.extract_info(test_url, download=True)
-                            filename = ydl.prepare_filename(info)
-                            break
-                    except Exception as e:
-                        last_err = e
-                        continue
-                if filename:
-                    break
-            if filename is None:
-                raise last_err or Exception('Téléchargement Vimeo impossible (toutes les tentatives ont échoué)')
-
-            # Remplacer l'extension d'origine par .mp3 si postprocessor exécuté
-            audio_filename = os.path.splitext(filename)[0] + '.mp3'
-            if os.path.exists(audio_filename):
-                return audio_filename
-
-            # Fallback: chercher formats audio alternatifs
-            for ext in ['.m4a', '.webm', '.opus']:
-                alt = os.path.splitext(filename)[0] + ext
-                if os.path.exists(alt):
-                    return alt
-
-            # Dernier recours: retourner le fichier d'origine si présent
-            if os.path.exists(filename):
-                return filename
-
-            raise Exception('Fichier audio non trouvé après extraction')
+            # Tentatives (options × variantes d'URL) ordonnées par le moteur de stratégies
+            info, filename = self._download_with_strategies(opts, attempt_urls, work_dir)
+
+            # Remux sans ré-encodage si possible, sinon audio mono basse résolution
+            return prepare_for_transcription(info, filename, progress=progress)
         except Exception as e:
+            if work_dir:
+                workspaces.release(work_dir)
             raise Exception(f"Erreur lors du téléchargement Vimeo: {str(e)}")
 
+    @timed('video_fetch', platform='Vimeo')
     def download_video_only(self, url: str) -> str:
         """Télécharge uniquement la vidéo Vimeo (retourne le chemin du fichier vidéo)."""
         if not self.validate_vimeo_url(url):
             raise ValueError('URL Vimeo invalide')
 
+        work_dir = None
         try:
             # Normaliser l'URL pour éviter les problèmes d'OAuth sur les URLs player
-            normalized_url = url
-            m = re.search(r'(?:vimeo\.com/(?:.*?/)?(\d+)|player\.vimeo\.com/video/(\d+))', url)
-            video_id = None
-            if m:
-                video_id = m.group(1) or m.group(2)
-                normalized_url = f'https://vimeo.com/{video_id}'
-            attempt_urls = [normalized_url]
+            resolved = parse_url(url)
+            normalized_url = resolved.canonical_url
+            video_id = resolved.canonical_id
+            attempt_urls = [('page', normalized_url)]
             if video_id:
-                attempt_urls.append(f'https://player.vimeo.com/video/{video_id}')
+                attempt_urls.append(('player', f'https://player.vimeo.com/video/{video_id}'))
+
+            # Dossier de travail isolé de la requête
+            work_dir = workspaces.create('vimeo')
+            # MP4 progressif direct: téléchargement segmenté d'abord, yt-dlp en repli
+            media = self._direct_media(video_id, self._fetch_player_config(video_id)) if video_id else None
+            if media:
+                filename = self._segmented_download(media['url'], video_id, work_dir)
+                if filename:
+                    return filename
 
             # Cloner les options et ajuster les en-têtes dynamiques
             opts = self.video_opts.copy()
@@ -210,43 +340,14 @@ class VimeoDownloader:
                 headers['Referer'] = f'https://vimeo.com/{video_id}'
                 headers['Origin'] = 'https://vimeo.com'
             opts['http_headers'] = headers
+            opts['outtmpl'] = work_outtmpl(work_dir)
 
-            filename = None
-            last_err = None
-            option_attempts = [
-                {'extractor_args': {'vimeo': {'use_api': ['no']}}},
-                {'extractor_args': {'vimeo': {'use_api': ['no']}}, 'cookiesfrombrowser': ('safari',)},
-                {'extractor_args': {'vimeo': {'use_api': ['no']}}, 'cookiesfrombrowser': ('chrome',)},
-                {'force_generic_extractor': True},
-            ]
-            for attempt in option_attempts:
-                for test_url in attempt_urls:
-                    try:
-                        attempt_opts = opts.copy()
-                        attempt_opts.update(attempt)
-                        with yt_dlp.YoutubeDL(attempt_opts) as ydl:
-                            info = ydl.extract_info(test_url, download=True)
-                            filename = ydl.prepare_filename(info)
-                            break
-                    except Exception as e:
-                        last_err = e
-                        continue
-                if filename:
-                    break
-            if filename is None:
-                raise last_err or Exception('Téléchargement Vimeo impossible (toutes les tentatives ont échoué)')
-
-            # Essayer plusieurs extensions vidéo possibles
-            for ext in ['.mp4', '.webm', '.mkv', '.mov']:
-                candidate = os.path.splitext(filename)[0] + ext
-                if os.path.exists(candidate):
-                    return candidate
-
-            if os.path.exists(filename):
-                return filename
+            _, filename = self._download_with_strategies(opts, attempt_urls, work_dir)
 
-            raise Exception('Fichier vidéo non trouvé après téléchargement')
+            return filename
         except Exception as e:
+            if work_dir:
+                workspaces.release(work_dir)
             raise Exception(f"Erreur lors du téléchargement de la vidéo Vimeo: {str(e)}")
 
 
@@ -0,0 +1,178 @@
+import os
+import shutil
+import threading
+import time
+import uuid
+from contextlib import contextmanager
+from config import Config
+
+
+def work_outtmpl(work_dir):
+    """Modèle de sortie yt-dlp déterministe à l'intérieur d'un dossier de travail"""
+    return os.path.join(work_dir, 'media.%(ext)s')
+
+
+def tree_size(path):
+    """Taille totale (octets) d'un fichier ou d'une arborescence"""
+    if os.path.isfile(path):
+        return os.path.getsize(path)
+    total = 0
+    for root, _, files in os.walk(path):
+        for name in files:
+            try:
+                total += os.path.getsize(os.path.join(root, name))
+            except OSError:
+                pass
+    return total
+
+
+class WorkspaceManager:
+    """
+    Dossiers de travail isolés par requête (sous DOWNLOAD_FOLDER/work) et janitor
+    qui récupère les orphelins et fait respecter un budget disque global.
+    """
+
+    def __init__(self, root=None, download_folder=None, budget_bytes=None, orphan_age=None):
+        self.root = os.path.abspath(root or Config.WORK_FOLDER)
+        self.download_folder = os.path.abspath(download_folder or Config.DOWNLOAD_FOLDER)
+        self.budget_bytes = Config.DISK_BUDGET_BYTES if budget_bytes is None else budget_bytes
+        self.orphan_age = Config.WORK_DIR_ORPHAN_AGE if orphan_age is None else orphan_age
+        self._lock = threading.Lock()
+        self._active = set()
+        self._janitor = None
+        self._usage = {
+            'used_bytes': 0,
+            'budget_bytes': self.budget_bytes,
+            'work_dirs': 0,
+            'active_work_dirs': 0,
+            'evicted_total': 0,
+            'last_sweep': None,
+        }
+
+    def create(self, prefix='job'):
+        """Crée et réserve un dossier de travail unique"""
+        path = os.path.join(self.root, f'{prefix}-{uuid.uuid4().hex}')
+        os.makedirs(path, exist_ok=True)
+        with self._lock:
+            self._active.add(path)
+        return path
+
+    @contextmanager
+    def scratch(self, prefix='job'):
+        """
+        Fournit un dossier de travail; supprimé si une exception survient,
+        conservé sinon (le fichier produit est libéré plus tard via release)
+        """
+        path = self.create(prefix)
+        try:
+            yield path
+        except BaseException:
+            self.release(path)
+            raise
+
+    def _work_dir_of(self, path):
+        """Dossier de travail contenant `path` (ou None s'il est hors de la racine)"""
+        relative = os.path.relpath(os.path.abspath(path), self.root)
+        if relative == os.curdir or relative.startswith(os.pardir):
+            return None
+        return os.path.join(self.root, relative.split(os.sep)[0])
+
+    def release(self, path):
+        """
+        Libère un fichier produit: supprime tout son dossier de travail
+        (ou le fichier seul s'il est hors des dossiers de travail)
+        """
+        work_dir = self._work_dir_of(path)
+        try:
+            if work_dir is None:
+                if os.path.exists(path):
+                    os.remove(path)
+                return
+            shutil.rmtree(work_dir, ignore_errors=True)
+        except Exception:
+            pass
+        finally:
+            if work_dir is not None:
+                with self._lock:
+                    self._active.discard(work_dir)
+
+    def sweep(self):
+        """
+        Passe du janitor: supprime les dossiers orphelins trop anciens puis, si le budget
+        disque est dépassé, les entrées inactives les plus anciennes d'abord.
+        Retourne le nombre d'octets libérés.
+        """
+        now = time.time()
+        entries = []
+        # Dossiers de travail + fichiers isolés à la racine (anciens téléchargements)
+        for folder, dirs_allowed in ((self.root, True), (self.download_folder, False)):
+            if not os.path.isdir(folder):
+                continue
+            for entry in os.scandir(folder):
+                if entry.is_dir(follow_symlinks=False) != dirs_allowed:
+                    continue
+                try:
+                    mtime = entry.stat(follow_symlinks=False).st_mtime
+                except OSError:
+                    continue
+                entries.append((mtime, entry.path, tree_size(entry.path)))
+
+        total = tree_size(self.download_folder) if os.path.isdir(self.download_folder) else 0
+        freed = 0
+        evicted = 0
+        with self._lock:
+            active = set(self._active)
+
+        # Plus ancien d'abord
+        entries.sort()
+        for mtime, path, size in entries:
+            if path in active:
+                continue
+            orphan = now - mtime > self.orphan_age
+            over_budget = self.budget_bytes and total - freed > self.budget_bytes
+            if not orphan and not over_budget:
+                continue
+            if os.path.isdir(path):
+                shutil.rmtree(path, ignore_errors=True)
+            else:
+                try:
+                    os.remove(path)
+                except OSError:
+                    continue
+            freed += size
+            evicted += 1
+
+        with self._lock:
+            self._usage.update({
+                'used_bytes': total - freed,
+                'work_dirs': sum(1 for _, path, _ in entries if os.path.isdir(path)),
+                'active_work_dirs': len(self._active),
+                'evicted_total': self._usage['evicted_total'] + evicted,
+                'last_sweep': now,
+            })
+        return freed
+
+    def usage(self):
+        """Utilisation disque mesurée lors du dernier passage du janitor"""
+        with self._lock:
+            return dict(self._usage)
+
+    def start_janitor(self, interval=None):
+        """Lance le janitor en arrière-plan (idempotent)"""
+        if self._janitor is not None:
+            return
+        interval = Config.JANITOR_INTERVAL if interval is None else interval
+
+        def loop():
+            while True:
+                try:
+                    self.sweep()
+                except Exception as e:
+                    print(f"Erreur du janitor: {str(e)}")
+                time.sleep(interval)
+
+        self._janitor = threading.Thread(target=loop, name='janitor', daemon=True)
+        self._janitor.start()
+
+
+workspaces = WorkspaceManager()
@@ -0,0 +1,105 @@
+import json
+import threading
+from contextlib import contextmanager
+from config import Config
+
+# Options propres à chaque appel, réappliquées sur l'instance prêtée (hors clé de profil)
+PER_CALL_OPTIONS = ('outtmpl', 'progress_hooks', 'http_headers')
+
+
+def _profile_key(opts):
+    """Clé de profil: toutes les options sauf celles propres à chaque appel"""
+    profile = {k: v for k, v in opts.items() if k not in PER_CALL_OPTIONS}
+    return json.dumps(profile, sort_keys=True, default=repr)
+
+
+def _has_cookie_header(opts):
+    return any(name.lower() == 'cookie' for name in (opts.get('http_headers') or {}))
+
+
+class YoutubeDLPool:
+    """
+    Pool thread-safe d'instances YoutubeDL réutilisables, par profil d'options.
+
+    Construire un YoutubeDL recharge les extracteurs, le cookie jar, les post-processeurs
+    et le sélecteur de format; une instance prêtée est réutilisée en ne réappliquant que
+    les options propres à l'appel (modèle de sortie, hooks de progression, en-têtes).
+    Une instance n'est prêtée qu'à un seul thread à la fois.
+
+    Un appel portant un en-tête Cookie n'utilise pas le pool: yt-dlp charge ces cookies
+    dans le cookie jar de l'instance, qui ne doit pas servir à un autre appel.
+    """
+
+    def __init__(self, max_idle_per_profile=None):
+        self.max_idle_per_profile = Config.YDL_POOL_SIZE if max_idle_per_profile is None else max_idle_per_profile
+        self._lock = threading.Lock()
+        self._idle = {}
+        self.created = 0
+        self.reused = 0
+        self.unpooled = 0
+
+    def _acquire(self, key, opts):
+        with self._lock:
+            idle = self._idle.get(key)
+            if idle:
+                self.reused += 1
+                return idle.pop()
+            self.created += 1
+        # Import différé: yt-dlp (extracteurs) n'est chargé qu'au premier téléchargement ou au préchauffage
+        import yt_dlp
+        return yt_dlp.YoutubeDL(dict(opts))
+
+    def _release(self, key, ydl):
+        ydl._progress_hooks = []
+        with self._lock:
+            idle = self._idle.setdefault(key, [])
+            if len(idle) < self.max_idle_per_profile:
+                idle.append(ydl)
+                return
+        ydl.close()
+
+    @contextmanager
+    def lease(self, opts):
+        """Prête une instance YoutubeDL configurée pour `opts`, rendue au pool à la sortie"""
+        from yt_dlp.utils.networking import HTTPHeaderDict, std_headers
+
+        if _has_cookie_header(opts):
+            import yt_dlp
+
+            with self._lock:
+                self.unpooled += 1
+            with yt_dlp.YoutubeDL(dict(opts)) as ydl:
+                yield ydl
+            return
+
+        key = _profile_key(opts)
+        ydl = self._acquire(key, opts)
+        try:
+            # Options propres à l'appel (une instance du pool a pu servir un autre appel)
+            ydl.params['outtmpl'] = opts.get('outtmpl')
+            ydl._parse_outtmpl()
+            ydl.params['http_headers'] = HTTPHeaderDict(std_headers, opts.get('http_headers'))
+            ydl._progress_hooks = list(opts.get('progress_hooks') or [])
+            ydl._download_retcode = 0
+            yield ydl
+        finally:
+            self._release(key, ydl)
+
+    def warm_up(self):
+        """Importe yt-dlp et charge ses extracteurs (préchauffage: le premier téléchargement n'en paie pas le coût)"""
+        import yt_dlp
+
+        yt_dlp.YoutubeDL({'quiet': True, 'no_warnings': True}).close()
+
+    def stats(self):
+        """Compteurs du pool (instances créées / réutilisées / au repos)"""
+        with self._lock:
+            return {
+                'created': self.created,
+                'reused': self.reused,
+                'unpooled': self.unpooled,
+                'idle': sum(len(idle) for idle in self._idle.values()),
+            }
+
+
+ydl_pool = YoutubeDLPool()